@@ -0,0 +1,13 @@
+from django.contrib import admin
+
+from .models import ApiToken
+
+
+@admin.register(ApiToken)
+class ApiTokenAdmin(admin.ModelAdmin):
+    list_display = ("name", "user", "prefix", "created", "last_used")
+    readonly_fields = ("prefix", "created", "last_used")
+
+    def has_add_permission(self, request):
+        # Keys are only shown on creation, so users create tokens on the tokens page
+        return False
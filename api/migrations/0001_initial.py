@@ -0,0 +1,33 @@
+# Generated by Django 5.0.14 on 2026-10-19 14:57
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApiToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='What will use this token?', max_length=100, verbose_name='name')),
+                ('prefix', models.CharField(editable=False, max_length=8, verbose_name='prefix')),
+                ('key_hash', models.CharField(editable=False, max_length=64, unique=True, verbose_name='key hash')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='created')),
+                ('last_used', models.DateTimeField(blank=True, editable=False, null=True, verbose_name='last used')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='api_tokens', to=settings.AUTH_USER_MODEL, verbose_name='user')),
+            ],
+            options={
+                'verbose_name': 'API token',
+                'verbose_name_plural': 'API tokens',
+            },
+        ),
+    ]
@@ -0,0 +1,69 @@
+import hashlib
+import secrets
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+# last_used is only updated when it is older than this, so that API reads don't each
+# cost a write.
+LAST_USED_RESOLUTION = timedelta(hours=1)
+
+
+def hash_key(key: str) -> str:
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+class ApiToken(models.Model):
+    """
+    A key that lets a program, such as an editor plugin, use the API as its user. Only
+    a hash of the key is stored: the key itself is shown once, when it is created.
+    """
+
+    class Meta:
+        verbose_name = _("API token")
+        verbose_name_plural = _("API tokens")
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        verbose_name=_("user"),
+        on_delete=models.CASCADE,
+        related_name="api_tokens",
+    )
+    name = models.CharField(
+        _("name"), max_length=100, help_text=_("What will use this token?")
+    )
+    prefix = models.CharField(_("prefix"), max_length=8, editable=False)
+    key_hash = models.CharField(_("key hash"), max_length=64, unique=True, editable=False)
+    created = models.DateTimeField(_("created"), auto_now_add=True)
+    last_used = models.DateTimeField(_("last used"), blank=True, null=True, editable=False)
+
+    def __str__(self):
+        return f"{self.name} ({self.prefix}…)"
+
+    @classmethod
+    def create(cls, user, name) -> tuple["ApiToken", str]:
+        """Create a token for the user. Returns the token and its key."""
+        key = secrets.token_urlsafe(32)
+        token = cls.objects.create(
+            user=user, name=name, prefix=key[:8], key_hash=hash_key(key)
+        )
+        return token, key
+
+    @classmethod
+    def authenticate(cls, key: str):
+        """Return the active token for the key, with its user and their wordtracker
+        profile loaded, or None."""
+        token = (
+            cls.objects.select_related("user__wordtracker_profile")
+            .filter(key_hash=hash_key(key), user__is_active=True)
+            .first()
+        )
+        if token is not None:
+            now = timezone.now()
+            if token.last_used is None or now - token.last_used > LAST_USED_RESOLUTION:
+                ApiToken.objects.filter(pk=token.pk).update(last_used=now)
+                token.last_used = now
+        return token
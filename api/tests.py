@@ -0,0 +1,148 @@
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from plotboard.models import Board, Card, Sequence
+from wordtracker.models import Project, WorkSession
+
+from .models import ApiToken
+
+
+class ApiTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(username="writer")
+        self.token, key = ApiToken.create(self.user, "Obsidian")
+        self.auth = {"HTTP_AUTHORIZATION": f"Bearer {key}"}
+        self.project = Project.objects.create(user=self.user, name="Novel", slug="novel")
+        WorkSession.objects.bulk_create(
+            WorkSession(
+                user=self.user,
+                project=self.project,
+                startdate=date(2024, 1, 1) + timedelta(days=n),
+                duration=timedelta(minutes=30),
+                wordcount=100 * n,
+            )
+            for n in range(5)
+        )
+
+    def get(self, name, *args, **params):
+        return self.client.get(reverse(f"api:{name}", args=args), params, **self.auth)
+
+    def post(self, name, data, *args):
+        return self.client.post(
+            reverse(f"api:{name}", args=args),
+            data,
+            content_type="application/json",
+            **self.auth,
+        )
+
+    def test_requires_token(self):
+        response = self.client.get(reverse("api:sessions"))
+        self.assertEqual(response.status_code, 401)
+        response = self.client.get(
+            reverse("api:sessions"), HTTP_AUTHORIZATION="Bearer nope"
+        )
+        self.assertEqual(response.status_code, 401)
+        # Only a hash of the key is stored
+        self.assertEqual(len(self.token.key_hash), 64)
+
+    def test_cursor_pagination_and_fields(self):
+        response = self.get("sessions", limit=2, fields="wordcount,duration")
+        page = response.json()
+        self.assertEqual(
+            page["results"],
+            [
+                {"id": page["results"][0]["id"], "wordcount": 0, "duration": 1800},
+                {"id": page["results"][1]["id"], "wordcount": 100, "duration": 1800},
+            ],
+        )
+        seen = [row["wordcount"] for row in page["results"]]
+        while page["next"]:
+            page = self.client.get(page["next"], **self.auth).json()
+            seen += [row["wordcount"] for row in page["results"]]
+        self.assertEqual(seen, [0, 100, 200, 300, 400])
+        self.assertEqual(self.get("sessions", fields="bogus").status_code, 400)
+        self.assertEqual(self.get("sessions", cursor="!!").status_code, 400)
+
+    def test_conditional_get(self):
+        response = self.get("sessions")
+        etag = response.headers["ETag"]
+        self.assertIn("Authorization", response.headers["Vary"])
+        # The version is in the database, shared by every process, not the cache
+        cache.clear()
+        with self.assertNumQueries(1):  # The token lookup
+            response = self.client.get(
+                reverse("api:sessions"), HTTP_IF_NONE_MATCH=etag, **self.auth
+            )
+        self.assertEqual(response.status_code, 304)
+        self.post("sessions", {"startdate": "2024-02-01", "activity": "drafting"})
+        response = self.client.get(
+            reverse("api:sessions"), HTTP_IF_NONE_MATCH=etag, **self.auth
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["results"]), 6)
+
+    def test_create_sessions(self):
+        response = self.post(
+            "sessions",
+            {
+                "startdate": "2024-02-01",
+                "activity": "drafting",
+                "duration": 2700,
+                "wordcount": 900,
+                "project": self.project.pk,
+            },
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["duration"], 2700)
+        self.assertEqual(response.json()["project_id"], self.project.pk)
+
+        bulk = [{"startdate": "2024-02-02", "activity": "drafting"}] * 3
+        response = self.post("sessions", bulk + [{"activity": "drafting"}])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("startdate", response.json()["errors"][3])
+        self.assertEqual(WorkSession.objects.count(), 6)
+        response = self.post("sessions", bulk)
+        self.assertEqual(len(response.json()["results"]), 3)
+
+    def test_projects_and_total(self):
+        rows = self.get("projects", fields="name,description,stats").json()["results"]
+        self.assertEqual(rows[0]["name"], "Novel")
+        self.assertEqual(rows[0]["description"], "")
+        self.assertEqual(rows[0]["stats"]["wordcount"], 1000)
+        response = self.post("project_total", {"total": 5000}, self.project.pk)
+        self.assertEqual(response.json()["total"], 5000)
+        detail = self.get("project_detail", self.project.pk).json()
+        self.assertEqual(detail["last_total"], 5000)
+        self.assertEqual(self.get("stats").json()["all_sessions"], 5)
+
+    def test_boards(self):
+        board = Board.objects.create(name="Plot", owner=self.user)
+        sequence = Sequence.objects.create(name="Act 1", board=board)
+        Card.objects.create(name="Meet", content="<p>Hi</p>", board=board, sequence=sequence)
+        other = get_user_model().objects.create_user(username="other")
+        Board.objects.create(name="Theirs", owner=other)
+
+        rows = self.get("boards").json()["results"]
+        self.assertEqual([row["name"] for row in rows], ["Plot"])
+        response = self.get("board_detail", board.pk, fields="name,excerpt")
+        self.assertEqual(response.json()["cards"][0]["excerpt"], "Hi")
+        self.assertNotIn("content", response.json()["cards"][0])
+        response = self.client.get(
+            reverse("api:board_detail", args=[board.pk]),
+            HTTP_IF_NONE_MATCH=response.headers["ETag"],
+            **self.auth,
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_token_page(self):
+        self.client.force_login(self.user)
+        response = self.client.post(reverse("api:tokens"), {"name": "VS Code"})
+        key = response.context["key"]
+        self.assertTrue(ApiToken.authenticate(key))
+        self.client.post(reverse("api:tokens"), {"revoke": self.token.pk})
+        self.assertFalse(ApiToken.objects.filter(pk=self.token.pk).exists())
@@ -0,0 +1,15 @@
+from django.urls import path
+
+from api import views
+
+app_name = "api"
+urlpatterns = [
+    path("tokens/", views.tokens, name="tokens"),
+    path("v1/sessions/", views.sessions, name="sessions"),
+    path("v1/stats/", views.stats, name="stats"),
+    path("v1/projects/", views.projects, name="projects"),
+    path("v1/projects/<int:pk>/", views.project_detail, name="project_detail"),
+    path("v1/projects/<int:pk>/total/", views.project_total, name="project_total"),
+    path("v1/boards/", views.boards, name="boards"),
+    path("v1/boards/<int:pk>/", views.board_detail, name="board_detail"),
+]
@@ -0,0 +1,403 @@
+"""
+JSON API for editor plugins and other integrations.
+
+Requests authenticate with an API token (see ApiToken) in an ``Authorization: Bearer
+<key>`` header. Session cookies are not accepted, so the API views need no CSRF
+protection. Rate limits are shared with the web views (see wordtracker/ratelimit.py).
+
+List endpoints return ``{"results": [...], "next": url}`` in id order; follow ``next``
+until it is null. ``?limit=`` sets the page size (at most MAX_LIMIT), and
+``?fields=a,b`` selects the fields returned (``id`` is always included). Durations are
+in seconds.
+
+GET responses carry an ETag. Send it back in If-None-Match, and an unchanged resource
+costs a 304 with no body, decided without touching the sessions table: wordtracker
+keeps a per-user data version in the cache that changes with every write.
+"""
+import base64
+import binascii
+import hashlib
+import json
+import zoneinfo
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.db import transaction
+from django.db.models import F
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404, redirect, render
+from django.utils import timezone
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.dateparse import parse_date
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition, require_http_methods
+
+from plotboard.models import Board
+from plotboard.views import BOARD_FIELDS, CARD_FIELDS, board_changes
+from wordtracker.forms import LogWorkForm, RecordTotalForm
+from wordtracker.models import Profile, Project, WorkSession, data_version
+from wordtracker.ratelimit import check_rate
+
+from .models import ApiToken
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+# Most sessions that can be created in one request
+MAX_BULK = 100
+
+SESSION_FIELDS = (
+    "id",
+    "project_id",
+    "activity",
+    "startdate",
+    "starttime",
+    "enddate",
+    "endtime",
+    "duration",
+    "wordcount",
+)
+PROJECT_FIELDS = (
+    "id",
+    "name",
+    "slug",
+    "status",
+    "description",
+    "target_wordcount",
+    "last_total",
+    "last_total_at",
+    "stats",
+)
+# API field names that differ from the model's
+PROJECT_RENAMES = {"description": "desciption"}
+
+
+class ApiError(Exception):
+    """Raised by API views to respond 400 Bad Request with the given errors."""
+
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def authenticate(request):
+    scheme, _, key = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() not in ("bearer", "token") or not key.strip():
+        return None
+    return ApiToken.authenticate(key.strip())
+
+
+def api_view(*methods, scope="read"):
+    """Make a view an API endpoint: token authentication, rate limiting for `scope`,
+    the user's time zone, JSON errors and private, revalidated caching."""
+
+    def decorator(view):
+        view = require_http_methods(methods)(view)
+
+        @csrf_exempt
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            token = authenticate(request)
+            if token is None:
+                response = JsonResponse(
+                    {"errors": {"token": ["A valid API token is required."]}},
+                    status=401,
+                )
+                response.headers["WWW-Authenticate"] = 'Bearer realm="api"'
+                return response
+            request.user = token.user
+            response = check_rate(request, scope)
+            if response is None:
+                try:
+                    tz = token.user.wordtracker_profile.timezone
+                except Profile.DoesNotExist:
+                    tz = settings.TIME_ZONE
+                with timezone.override(zoneinfo.ZoneInfo(tz)):
+                    try:
+                        response = view(request, *args, **kwargs)
+                    except ApiError as e:
+                        response = JsonResponse({"errors": e.errors}, status=400)
+            patch_vary_headers(response, ["Authorization"])
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def user_etag(request, *args, **kwargs):
+    """ETag for anything computed from the user's sessions and projects. Includes the
+    date, since the statistics windows move at midnight."""
+    version = data_version(request.user)
+    return f"{request.user.pk}-{version}-{timezone.localdate().isoformat()}"
+
+
+def parse_json(request):
+    try:
+        return json.loads(request.body)
+    except ValueError:
+        raise ApiError({"body": ["Expected a JSON body."]})
+
+
+def get_fields(request, allowed):
+    """Return the fields requested with ?fields=, or all of `allowed`."""
+    if not request.GET.get("fields"):
+        return list(allowed)
+    fields = [f.strip() for f in request.GET["fields"].split(",") if f.strip()]
+    unknown = set(fields) - set(allowed)
+    if unknown:
+        raise ApiError({"fields": [f"Unknown field: {f}" for f in sorted(unknown)]})
+    return ["id", *(f for f in fields if f != "id")]
+
+
+def select(queryset, fields, renames=None):
+    """values() for the API `fields`, some of which may be `renames` of model fields."""
+    renames = renames or {}
+    return queryset.values(
+        *(f for f in fields if f not in renames),
+        **{f: F(renames[f]) for f in fields if f in renames},
+    )
+
+
+def clean(rows):
+    """Make rows JSON friendly. Durations become seconds."""
+    for row in rows:
+        for name, value in row.items():
+            if isinstance(value, timedelta):
+                row[name] = int(value.total_seconds())
+    return rows
+
+
+def encode_cursor(pk):
+    return base64.urlsafe_b64encode(str(pk).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        return int(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, binascii.Error):
+        raise ApiError({"cursor": ["Invalid cursor."]})
+
+
+def paginate(request, queryset, fields, renames=None) -> dict:
+    """Return a page of `queryset` as rows of `fields`, after the ?cursor= given."""
+    try:
+        limit = min(int(request.GET.get("limit", DEFAULT_LIMIT)), MAX_LIMIT)
+    except ValueError:
+        raise ApiError({"limit": ["Must be an integer."]})
+    if limit < 1:
+        raise ApiError({"limit": ["Must be at least 1."]})
+    if request.GET.get("cursor"):
+        queryset = queryset.filter(pk__gt=decode_cursor(request.GET["cursor"]))
+    rows = list(select(queryset.order_by("pk"), fields, renames)[: limit + 1])
+    next_url = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        query = request.GET.copy()
+        query["cursor"] = encode_cursor(rows[-1]["id"])
+        next_url = request.build_absolute_uri(f"{request.path}?{query.urlencode()}")
+    return {"results": clean(rows), "next": next_url}
+
+
+@api_view("GET", "POST", scope="log_work")
+@condition(etag_func=user_etag)
+def sessions(request):
+    """
+    GET the user's WorkSessions. Filter with ?since=YYYY-MM-DD (start date on or after)
+    and ?project=id.
+
+    POST a session, or a list of up to MAX_BULK, with the fields of the log work form.
+    All are created, or none. Responds 201 with the new session, or list of them.
+    """
+    if request.method == "POST":
+        return create_sessions(request)
+    queryset = WorkSession.objects.filter(user=request.user)
+    if request.GET.get("since"):
+        since = parse_date(request.GET["since"])
+        if since is None:
+            raise ApiError({"since": ["Expected a date, YYYY-MM-DD."]})
+        queryset = queryset.filter(startdate__gte=since)
+    if request.GET.get("project"):
+        if not request.GET["project"].isdigit():
+            raise ApiError({"project": ["Must be a project id."]})
+        queryset = queryset.filter(project_id=request.GET["project"])
+    return JsonResponse(
+        paginate(request, queryset, get_fields(request, SESSION_FIELDS))
+    )
+
+
+def create_sessions(request):
+    data = parse_json(request)
+    single = not isinstance(data, list)
+    items = [data] if single else data
+    if not items or len(items) > MAX_BULK:
+        raise ApiError({"sessions": [f"Send from 1 to {MAX_BULK} sessions."]})
+    forms = []
+    for item in items:
+        if not isinstance(item, dict):
+            raise ApiError({"sessions": ["Each session must be an object."]})
+        item = dict(item)
+        # The API speaks seconds, the form minutes
+        if isinstance(item.get("duration"), (int, float)):
+            item["duration"] = round(item["duration"] / 60)
+        forms.append(LogWorkForm(data=item, user=request.user))
+    errors = [form.errors for form in forms]
+    if any(errors):
+        return JsonResponse({"errors": errors[0] if single else errors}, status=400)
+    created = []
+    with transaction.atomic():
+        for form in forms:
+            form.instance.user = request.user
+            created.append(form.save().pk)
+    rows = clean(
+        list(
+            WorkSession.objects.filter(pk__in=created)
+            .order_by("pk")
+            .values(*SESSION_FIELDS)
+        )
+    )
+    return JsonResponse(rows[0] if single else {"results": rows}, status=201)
+
+
+def with_stats(user, rows):
+    summary = WorkSession.objects.project_summary(
+        user, projects=[row["id"] for row in rows]
+    )
+    for row in rows:
+        row["stats"] = summary.get(row["id"])
+    return rows
+
+
+@api_view("GET")
+@condition(etag_func=user_etag)
+def projects(request):
+    """GET the user's projects. The `stats` field costs more: request it only if
+    needed."""
+    fields = get_fields(request, PROJECT_FIELDS)
+    page = paginate(
+        request,
+        Project.objects.filter(user=request.user),
+        [f for f in fields if f != "stats"],
+        PROJECT_RENAMES,
+    )
+    if "stats" in fields:
+        with_stats(request.user, page["results"])
+    return JsonResponse(page)
+
+
+@api_view("GET")
+@condition(etag_func=user_etag)
+def project_detail(request, pk):
+    """GET one project, with its statistics."""
+    fields = get_fields(request, PROJECT_FIELDS)
+    row = get_object_or_404(
+        select(
+            Project.objects.filter(user=request.user),
+            [f for f in fields if f != "stats"],
+            PROJECT_RENAMES,
+        ),
+        pk=pk,
+    )
+    if "stats" in fields:
+        with_stats(request.user, [row])
+    return JsonResponse(clean([row])[0])
+
+
+@api_view("POST", scope="record_total")
+def project_total(request, pk):
+    """POST a project's current manuscript total as {"total": n}, with an optional
+    "recorded_at" datetime. See Project.record_totals()."""
+    project = get_object_or_404(Project.objects.filter(user=request.user), pk=pk)
+    data = parse_json(request)
+    form = RecordTotalForm(data if isinstance(data, dict) else {})
+    if not form.is_valid():
+        return JsonResponse({"errors": form.errors}, status=400)
+    recorded_at = form.cleaned_data["recorded_at"] or timezone.now()
+    try:
+        snapshots = project.record_totals([(recorded_at, form.cleaned_data["total"])])
+    except ValueError as e:
+        return JsonResponse({"errors": {"recorded_at": [str(e)]}}, status=400)
+    return JsonResponse(
+        {
+            "total": project.last_total,
+            "delta": snapshots[0].delta if snapshots else 0,
+            "session": project.last_session_id,
+        }
+    )
+
+
+@api_view("GET")
+@condition(etag_func=user_etag)
+def stats(request):
+    """GET the user's 7 day, 30 day and all time totals. See user_summary()."""
+    summary = WorkSession.objects.user_summary(request.user)
+    return JsonResponse({k: v or 0 for k, v in summary.items()})
+
+
+def boards_etag(request):
+    versions = Board.objects.filter(owner=request.user).order_by("pk")
+    digest = hashlib.md5(
+        str(list(versions.values_list("pk", "version"))).encode(),
+        usedforsecurity=False,
+    )
+    return f"{request.user.pk}-{digest.hexdigest()}"
+
+
+@api_view("GET")
+@condition(etag_func=boards_etag)
+def boards(request):
+    """GET the user's plot boards."""
+    return JsonResponse(
+        paginate(
+            request,
+            Board.objects.filter(owner=request.user),
+            get_fields(request, BOARD_FIELDS),
+        )
+    )
+
+
+def board_etag(request, pk):
+    version = (
+        Board.objects.filter(owner=request.user, pk=pk)
+        .values_list("version", flat=True)
+        .first()
+    )
+    return None if version is None else f"{pk}-{version}"
+
+
+@api_view("GET")
+@condition(etag_func=board_etag)
+def board_detail(request, pk):
+    """GET a board with its sequences and cards, or with ?since=version only what
+    changed since (see plotboard's board_sync). ?fields= selects card fields."""
+    board = get_object_or_404(
+        Board.objects.filter(owner=request.user).values(*BOARD_FIELDS), pk=pk
+    )
+    try:
+        since = int(request.GET.get("since", 0))
+    except ValueError:
+        raise ApiError({"since": ["Must be an integer."]})
+    return JsonResponse(
+        board_changes(board, since, card_fields=get_fields(request, CARD_FIELDS))
+    )
+
+
+@login_required
+def tokens(request):
+    """Lets users create and revoke their API tokens. A new token's key is shown
+    once, here."""
+    key = None
+    if request.method == "POST":
+        if "revoke" in request.POST:
+            if request.POST["revoke"].isdigit():
+                ApiToken.objects.filter(
+                    user=request.user, pk=request.POST["revoke"]
+                ).delete()
+            return redirect("api:tokens")
+        name = request.POST.get("name", "").strip()[:100]
+        if name:
+            key = ApiToken.create(request.user, name)[1]
+    tokens = ApiToken.objects.filter(user=request.user).order_by("-created")
+    return render(request, "api/tokens.html", {"tokens": tokens, "key": key})
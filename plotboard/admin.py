@@ -1,3 +1,18 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import Board, Card, Sequence
+
+
+@admin.register(Board)
+class BoardAdmin(admin.ModelAdmin):
+    pass
+
+
+@admin.register(Sequence)
+class SequenceAdmin(admin.ModelAdmin):
+    pass
+
+
+@admin.register(Card)
+class CardAdmin(admin.ModelAdmin):
+    pass
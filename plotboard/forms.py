@@ -0,0 +1,21 @@
+from django import forms
+from django.utils.translation import gettext_lazy as _
+
+from .outline import parse_opml
+
+MAX_OUTLINE_SIZE = 5 * 1024 * 1024
+
+
+class ImportOutlineForm(forms.Form):
+    """Accepts an OPML outline to create a board from."""
+
+    file = forms.FileField(label=_("OPML file"))
+
+    def clean_file(self):
+        upload = self.cleaned_data["file"]
+        if upload.size > MAX_OUTLINE_SIZE:
+            raise forms.ValidationError(_("Outlines are limited to 5 MB."))
+        try:
+            return parse_opml(upload.read())
+        except ValueError as e:
+            raise forms.ValidationError(str(e))
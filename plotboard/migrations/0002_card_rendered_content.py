@@ -0,0 +1,49 @@
+# Generated by Django 5.0.14 on 2026-10-19 14:38
+
+import hashlib
+
+from django.db import migrations, models
+
+from plotboard.sanitize import excerpt, sanitize
+
+
+def render_cards(apps, schema_editor):
+    Card = apps.get_model("plotboard", "Card")
+    batch = []
+    for card in Card.objects.only("content").iterator(chunk_size=500):
+        card.rendered_content, text = sanitize(card.content)
+        card.excerpt = excerpt(text)
+        card.content_hash = hashlib.sha256(card.content.encode()).hexdigest()
+        batch.append(card)
+        if len(batch) == 500:
+            Card.objects.bulk_update(
+                batch, ["rendered_content", "excerpt", "content_hash"]
+            )
+            batch = []
+    Card.objects.bulk_update(batch, ["rendered_content", "excerpt", "content_hash"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plotboard', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='card',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64, verbose_name='content hash'),
+        ),
+        migrations.AddField(
+            model_name='card',
+            name='excerpt',
+            field=models.CharField(blank=True, editable=False, max_length=255, verbose_name='excerpt'),
+        ),
+        migrations.AddField(
+            model_name='card',
+            name='rendered_content',
+            field=models.TextField(blank=True, editable=False, verbose_name='rendered content'),
+        ),
+        migrations.RunPython(render_cards, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.0.14 on 2026-10-19 14:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plotboard', '0002_card_rendered_content'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Deletion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=20, verbose_name='model')),
+                ('object_id', models.BigIntegerField(verbose_name='object id')),
+                ('version', models.PositiveBigIntegerField(verbose_name='version')),
+            ],
+            options={
+                'verbose_name': 'deletion',
+                'verbose_name_plural': 'deletions',
+            },
+        ),
+        migrations.AddField(
+            model_name='board',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0, editable=False, verbose_name='version'),
+        ),
+        migrations.AddField(
+            model_name='card',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0, editable=False, verbose_name='version'),
+        ),
+        migrations.AddField(
+            model_name='sequence',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0, editable=False, verbose_name='version'),
+        ),
+        migrations.AddIndex(
+            model_name='card',
+            index=models.Index(fields=['board', 'version'], name='card_sync'),
+        ),
+        migrations.AddIndex(
+            model_name='sequence',
+            index=models.Index(fields=['board', 'version'], name='sequence_sync'),
+        ),
+        migrations.AddField(
+            model_name='deletion',
+            name='board',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='plotboard.board'),
+        ),
+        migrations.AddIndex(
+            model_name='deletion',
+            index=models.Index(fields=['board', 'version'], name='deletion_sync'),
+        ),
+    ]
@@ -1,12 +1,26 @@
+import hashlib
+
 import django.core.validators as v
-from django.db import models
+from django.db import models, transaction
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 from tinymce.models import HTMLField
 
+from .sanitize import excerpt, sanitize
+
+
+class StaleVersion(Exception):
+    """A conditional update found the object changed since the expected version."""
+
 
 class Board(models.Model):
-    """Represents a story board or plot board."""
+    """Represents a story board or plot board.
+
+    Each board has a version number, incremented by every change to the board, its
+    sequences or its cards. Sequences and cards record the board version at which they
+    last changed, and deletions leave a Deletion record, so that clients can fetch only
+    what changed since the version they last saw.
+    """
 
     class Meta:
         verbose_name = _("board")
@@ -20,34 +34,81 @@ class Board(models.Model):
         default=2,
     )
     owner = models.ForeignKey("auth.user", on_delete=models.CASCADE)
+    version = models.PositiveBigIntegerField(_("version"), default=0, editable=False)
 
     def __str__(self):
         return self.name
 
     def get_absolute_url(self):
-        return reverse("board_detail", kwargs={"pk": self.pk})
-
-
-class Sequence(models.Model):
+        return reverse("plotboard:board_detail", kwargs={"pk": self.pk})
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            if self.pk:
+                self.version = Board.next_version(self.pk)
+                if kwargs.get("update_fields") is not None:
+                    kwargs["update_fields"] = {*kwargs["update_fields"], "version"}
+            super().save(*args, **kwargs)
+
+    @staticmethod
+    def next_version(board_id) -> int:
+        """Increment the board's version number and return the new value. Must be
+        called in a transaction: the update locks the board row until it ends, so
+        concurrent writers get distinct, increasing versions."""
+        Board.objects.filter(pk=board_id).update(version=models.F("version") + 1)
+        return Board.objects.filter(pk=board_id).values_list("version", flat=True).get()
+
+
+class Versioned:
+    """Model mixin for objects within a Board, which carry the board version at which
+    they last changed in a `version` field."""
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            self.version = Board.next_version(self.board_id)
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = {*kwargs["update_fields"], "version"}
+            super().save(*args, **kwargs)
+
+    @classmethod
+    def update_versioned(cls, pk, version, **changes) -> int:
+        """Apply `changes` to the object only if it is still at `version`, and return
+        its new version. Raises StaleVersion if someone else changed it first, or
+        DoesNotExist if it was deleted."""
+        with transaction.atomic():
+            board_id = cls.objects.filter(pk=pk).values_list("board_id", flat=True).get()
+            new_version = Board.next_version(board_id)
+            updated = cls.objects.filter(pk=pk, version=version).update(
+                version=new_version, **changes
+            )
+            if not updated:
+                raise StaleVersion(f"{cls.__name__} {pk} has changed since {version}")
+        return new_version
+
+
+class Sequence(Versioned, models.Model):
     """A Sequence is a container for Cards within a Board."""
 
     class Meta:
         verbose_name = _("sequence")
         verbose_name_plural = _("sequences")
+        indexes = [models.Index(fields=("board", "version"), name="sequence_sync")]
 
     name = models.CharField(_("name"), max_length=255)
     description = models.TextField(_("description"), blank=True, max_length=4000)
     board = models.ForeignKey(Board, on_delete=models.CASCADE)
+    version = models.PositiveBigIntegerField(_("version"), default=0, editable=False)
 
     def __str__(self):
         return self.name
 
 
-class Card(models.Model):
+class Card(Versioned, models.Model):
     class Meta:
         verbose_name = _("card")
         verbose_name_plural = _("cards")
         order_with_respect_to = "sequence"
+        indexes = [models.Index(fields=("board", "version"), name="card_sync")]
 
     name = models.CharField(_("name"), max_length=255, blank=True)
     description = models.TextField(_("description"), blank=True, max_length=4000)
@@ -56,9 +117,64 @@ class Card(models.Model):
     sequence = models.ForeignKey(
         Sequence, on_delete=models.SET_NULL, blank=True, null=True
     )
+    # Derived from `content` on save, so that views never parse user HTML.
+    rendered_content = models.TextField(_("rendered content"), blank=True, editable=False)
+    excerpt = models.CharField(_("excerpt"), max_length=255, blank=True, editable=False)
+    content_hash = models.CharField(
+        _("content hash"), max_length=64, blank=True, editable=False
+    )
+    version = models.PositiveBigIntegerField(_("version"), default=0, editable=False)
+
+    RENDERED_FIELDS = ("rendered_content", "excerpt", "content_hash")
 
     def __str__(self):
         return self.name
 
     def get_absolute_url(self):
-        return reverse("card_detail", kwargs={"pk": self.pk})
+        return reverse("plotboard:card_detail", kwargs={"pk": self.pk})
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or "content" in update_fields:
+            if self.render() and update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, *self.RENDERED_FIELDS}
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def update_versioned(cls, pk, version, **changes) -> int:
+        if "content" in changes:
+            card = cls(content=changes["content"])
+            card.render()
+            changes.update({f: getattr(card, f) for f in cls.RENDERED_FIELDS})
+        return super().update_versioned(pk, version, **changes)
+
+    def render(self) -> bool:
+        """Sanitize `content` into the rendered fields, unless it is unchanged since
+        the last render. Returns True if the rendered fields were updated.
+
+        Called by save(). Call it yourself before bulk_create().
+        """
+        content_hash = hashlib.sha256(self.content.encode()).hexdigest()
+        if content_hash == self.content_hash:
+            return False
+        self.rendered_content, text = sanitize(self.content)
+        self.excerpt = excerpt(text)
+        self.content_hash = content_hash
+        return True
+
+
+class Deletion(models.Model):
+    """Records the board version at which a Sequence or Card was deleted."""
+
+    class Meta:
+        verbose_name = _("deletion")
+        verbose_name_plural = _("deletions")
+        indexes = [models.Index(fields=("board", "version"), name="deletion_sync")]
+
+    board = models.ForeignKey(Board, on_delete=models.CASCADE)
+    model = models.CharField(_("model"), max_length=20)
+    object_id = models.BigIntegerField(_("object id"))
+    version = models.PositiveBigIntegerField(_("version"))
+
+    def __str__(self):
+        return f"{self.model} {self.object_id} @ {self.version}"
@@ -0,0 +1,273 @@
+"""
+Export a board as an outline (Markdown, OPML or HTML), and import a board from OPML.
+
+Sequences become headings, or top level outline items, and their cards follow in order.
+Exports are generators of text chunks, for a StreamingHttpResponse: cards are read with
+one ordered query, in chunks, so that a large board's content is never all in memory
+at once. Card text comes from `rendered_content`, already sanitized.
+
+The HTML export is a plain, self-contained document with real headings, which word
+processors open as a document outline (and pandoc or LibreOffice convert to DOCX).
+"""
+import re
+import xml.etree.ElementTree as ET
+from html import escape
+from html.parser import HTMLParser
+from xml.sax.saxutils import quoteattr
+
+from django.db import models, transaction
+from django.utils.translation import gettext as _
+
+from .models import Board, Card, Sequence
+from .sanitize import sanitize
+
+FORMATS = {
+    "md": "text/markdown; charset=utf-8",
+    "opml": "text/x-opml; charset=utf-8",
+    "html": "text/html; charset=utf-8",
+}
+CARD_CHUNK_SIZE = 100
+
+
+def outline(board):
+    """Yield (sequence, cards) for the board in order, where `cards` is an iterator.
+    Sequences are dicts of id, name and description; unsequenced cards come last, under
+    a sequence of None."""
+    sequences = list(
+        board.sequence_set.order_by("pk").values("id", "name", "description")
+    )
+    # Cards come in sequence id order, the same order as the sequences.
+    cards = (
+        Card.objects.filter(board=board)
+        .only("name", "description", "rendered_content", "sequence_id", "_order")
+        .order_by(models.F("sequence_id").asc(nulls_last=True), "_order", "pk")
+        .iterator(chunk_size=CARD_CHUNK_SIZE)
+    )
+    pending = next(cards, None)
+
+    def cards_in(sequence_id):
+        nonlocal pending
+        while pending is not None and pending.sequence_id == sequence_id:
+            yield pending
+            pending = next(cards, None)
+
+    for sequence in sequences:
+        section = cards_in(sequence["id"])
+        yield sequence, section
+        # Skip anything the caller didn't consume, to stay in step
+        for _card in section:
+            pass
+    if pending is not None:
+        yield None, cards_in(None)
+
+
+class _Markdown(HTMLParser):
+    """Converts sanitized card HTML to Markdown."""
+
+    INLINE = {"b": "**", "strong": "**", "i": "*", "em": "*", "code": "`"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.out = []
+        self.lists = []
+        self.href = None
+        self.quote = 0
+        self.line_start = True
+
+    def block(self):
+        self.out.append("\n\n" + "> " * self.quote)
+        self.line_start = True
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.INLINE:
+            self.out.append(self.INLINE[tag])
+        elif tag in ("p", "div", "pre", "table", "tr"):
+            self.block()
+        elif tag[0] == "h" and tag[1:].isdigit():
+            self.block()
+            self.out.append("#" * min(int(tag[1:]) + 3, 6) + " ")
+        elif tag in ("ul", "ol"):
+            self.lists.append([tag, 0])
+            self.block()
+        elif tag == "li":
+            indent = "  " * (len(self.lists) - 1)
+            kind = self.lists[-1] if self.lists else ["ul", 0]
+            kind[1] += 1
+            bullet = f"{kind[1]}. " if kind[0] == "ol" else "- "
+            self.out.append(f"\n{indent}{bullet}")
+            self.line_start = True
+        elif tag == "blockquote":
+            self.quote += 1
+            self.block()
+        elif tag == "br":
+            self.out.append("\\\n")
+            self.line_start = True
+        elif tag == "hr":
+            self.block()
+            self.out.append("---")
+        elif tag == "a":
+            self.href = dict(attrs).get("href")
+            self.out.append("[")
+
+    def handle_endtag(self, tag):
+        if tag in self.INLINE:
+            self.out.append(self.INLINE[tag])
+        elif tag in ("ul", "ol") and self.lists:
+            self.lists.pop()
+        elif tag == "blockquote":
+            self.quote = max(self.quote - 1, 0)
+        elif tag == "a":
+            self.out.append(f"]({self.href})" if self.href else "]")
+            self.href = None
+
+    def handle_data(self, data):
+        text = re.sub(r"\s+", " ", data)
+        if self.line_start:
+            text = text.lstrip()
+        self.line_start = self.line_start and not text
+        self.out.append(text)
+
+
+def to_markdown(html: str) -> str:
+    parser = _Markdown()
+    parser.feed(html)
+    parser.close()
+    text = re.sub(r"[ \t]+\n", "\n", "".join(parser.out).strip())
+    return re.sub(r"\n{3,}", "\n\n", text)
+
+
+def export_markdown(board):
+    yield f"# {board.name}\n\n"
+    if board.description:
+        yield f"{board.description}\n\n"
+    for sequence, cards in outline(board):
+        name = sequence["name"] if sequence else _("Unsequenced")
+        yield f"## {name}\n\n"
+        if sequence and sequence["description"]:
+            yield f"{sequence['description']}\n\n"
+        for card in cards:
+            yield f"### {card.name or _('Untitled')}\n\n"
+            for text in (card.description, to_markdown(card.rendered_content)):
+                if text:
+                    yield f"{text}\n\n"
+
+
+def _opml_item(text, note, close=True):
+    attrs = f"text={quoteattr(text)}"
+    if note:
+        attrs += f" _note={quoteattr(note)}"
+    return f"<outline {attrs}{' />' if close else '>'}"
+
+
+def export_opml(board):
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n<opml version="2.0">\n'
+    yield f"<head><title>{escape(board.name)}</title></head>\n<body>\n"
+    for sequence, cards in outline(board):
+        name = sequence["name"] if sequence else _("Unsequenced")
+        note = sequence["description"] if sequence else ""
+        yield _opml_item(name, note, close=False) + "\n"
+        for card in cards:
+            text = sanitize(card.rendered_content)[1]
+            note = "\n\n".join(t for t in (card.description, text) if t)
+            yield "  " + _opml_item(card.name or _("Untitled"), note) + "\n"
+        yield "</outline>\n"
+    yield "</body>\n</opml>\n"
+
+
+def export_html(board):
+    yield (
+        '<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8">\n'
+        f"<title>{escape(board.name)}</title>\n</head>\n<body>\n"
+        f"<h1>{escape(board.name)}</h1>\n"
+    )
+    if board.description:
+        yield f"<p>{escape(board.description)}</p>\n"
+    for sequence, cards in outline(board):
+        name = sequence["name"] if sequence else _("Unsequenced")
+        yield f"<h2>{escape(name)}</h2>\n"
+        if sequence and sequence["description"]:
+            yield f"<p>{escape(sequence['description'])}</p>\n"
+        for card in cards:
+            yield f"<h3>{escape(card.name or _('Untitled'))}</h3>\n"
+            if card.description:
+                yield f"<p><em>{escape(card.description)}</em></p>\n"
+            yield f"{card.rendered_content}\n"
+    yield "</body>\n</html>\n"
+
+
+EXPORTERS = {"md": export_markdown, "opml": export_opml, "html": export_html}
+
+
+def _note_html(note):
+    paragraphs = (p.strip() for p in note.replace("\r\n", "\n").split("\n\n"))
+    return "".join(f"<p>{escape(p)}</p>" for p in paragraphs if p)
+
+
+def _nested_html(element):
+    """Render outline items below card level as nested lists."""
+    items = element.findall("outline")
+    if not items:
+        return ""
+    return (
+        "<ul>"
+        + "".join(
+            f"<li>{escape(item.get('text', ''))}"
+            f"{_note_html(item.get('_note', ''))}{_nested_html(item)}</li>"
+            for item in items
+        )
+        + "</ul>"
+    )
+
+
+def parse_opml(content: bytes) -> tuple[str, list]:
+    """Parse an OPML document, returning its title and top level outline elements.
+    Raises ValueError if it can't be read."""
+    if b"<!DOCTYPE" in content[:1024].upper() or b"<!ENTITY" in content.upper():
+        raise ValueError(_("Outlines with a DOCTYPE or entities are not supported."))
+    try:
+        root = ET.fromstring(content)
+    except ET.ParseError as e:
+        raise ValueError(_("Not a valid OPML file: %(error)s") % {"error": e})
+    body = root.find("body")
+    if root.tag != "opml" or body is None:
+        raise ValueError(_("Not a valid OPML file: no outline body."))
+    return root.findtext("head/title") or _("Imported outline"), body.findall("outline")
+
+
+def import_outline(owner, title, items) -> Board:
+    """Create a board from parsed OPML (see parse_opml()): top level items become
+    sequences, and their children become cards. Deeper items are kept as lists in card
+    content."""
+    with transaction.atomic():
+        board = Board.objects.create(name=title[:255], owner=owner)
+        # Bulk created objects skip Versioned.save(), so stamp them all with one new
+        # board version, for sync clients.
+        version = Board.next_version(board.pk)
+        board.version = version
+        sequences = Sequence.objects.bulk_create(
+            Sequence(
+                name=item.get("text", "")[:255] or _("Untitled"),
+                description=item.get("_note", "")[:4000],
+                board=board,
+                version=version,
+            )
+            for item in items
+        )
+        if any(sequence.pk is None for sequence in sequences):
+            # Backends that don't return ids from bulk inserts
+            sequences = list(board.sequence_set.order_by("pk"))
+        cards = []
+        for sequence, item in zip(sequences, items):
+            for order, child in enumerate(item.findall("outline")):
+                card = Card(
+                    name=child.get("text", "")[:255],
+                    content=_note_html(child.get("_note", "")) + _nested_html(child),
+                    board=board,
+                    sequence=sequence,
+                    version=version,
+                    _order=order,
+                )
+                card.render()
+                cards.append(card)
+        Card.objects.bulk_create(cards, batch_size=500)
+    return board
@@ -0,0 +1,32 @@
+from django.db.models.signals import post_delete, pre_delete
+from django.dispatch import receiver
+
+from .models import Board, Card, Deletion, Sequence
+
+
+def _deleted_directly(origin):
+    """True if the deletion started from a Sequence or Card (or a queryset of them),
+    rather than cascading from a Board or its owner, which take the whole board."""
+    model = getattr(origin, "model", type(origin))
+    return model in (Sequence, Card)
+
+
+@receiver(pre_delete, sender=Sequence)
+def touch_sequence_cards(sender, instance, origin=None, **kwargs):
+    # The sequence's cards are about to be moved out of it by SET_NULL, which does not
+    # call save(), so mark them as changed here.
+    if _deleted_directly(origin):
+        version = Board.next_version(instance.board_id)
+        Card.objects.filter(sequence=instance).update(version=version)
+
+
+@receiver(post_delete, sender=Sequence)
+@receiver(post_delete, sender=Card)
+def record_deletion(sender, instance, origin=None, **kwargs):
+    if _deleted_directly(origin):
+        Deletion.objects.create(
+            board_id=instance.board_id,
+            model=sender._meta.model_name,
+            object_id=instance.pk,
+            version=Board.next_version(instance.board_id),
+        )
@@ -1,3 +1,247 @@
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from .models import Board, Card, Deletion, Sequence
+from .outline import export_markdown, export_opml, to_markdown
+from .sanitize import sanitize
+
+
+class SanitizeTest(TestCase):
+    def test_strips_unsafe_markup(self):
+        html, text = sanitize(
+            '<p onclick="x()">Hi <b>there</b><script>alert(1)</script></p>'
+            '<a href="javascript:alert(1)">link</a><a href="/ok" style="x">ok</a>'
+        )
+        self.assertEqual(
+            html, "<p>Hi <b>there</b></p><a>link</a><a href=\"/ok\">ok</a>"
+        )
+        self.assertEqual(text, "Hi there linkok")
+
+    def test_balances_and_escapes(self):
+        html, text = sanitize("<ul><li>a &lt;b&gt;<li>c</ul></i><em>open")
+        self.assertEqual(html, "<ul><li>a &lt;b&gt;<li>c</li></li></ul><em>open</em>")
+        self.assertEqual(text, "a <b> c open")
+
+
+class CardRenderTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create(username="writer")
+        cls.board = Board.objects.create(name="Novel", owner=cls.user)
+        cls.sequence = Sequence.objects.create(name="Act 1", board=cls.board)
+
+    def test_render_on_save(self):
+        card = Card.objects.create(
+            board=self.board,
+            sequence=self.sequence,
+            content="<p>The <em>hero</em> leaves home.</p><img src=x onerror=y>",
+        )
+        self.assertEqual(
+            card.rendered_content,
+            '<p>The <em>hero</em> leaves home.</p><img src="x">',
+        )
+        self.assertEqual(card.excerpt, "The hero leaves home.")
+        self.assertEqual(len(card.content_hash), 64)
+
+    def test_render_only_when_content_changes(self):
+        card = Card.objects.create(board=self.board, content="<p>One</p>")
+        self.assertFalse(card.render())
+        card.content = "<p>Two</p>"
+        card.save(update_fields=["content"])
+        card.refresh_from_db()
+        self.assertEqual(card.excerpt, "Two")
+
+    def test_board_view_uses_excerpts(self):
+        Card.objects.create(
+            board=self.board, sequence=self.sequence, name="Opening", content="<p>Go</p>"
+        )
+        self.client.force_login(self.user)
+        with self.assertNumQueries(5):
+            resp = self.client.get(self.board.get_absolute_url())
+        self.assertContains(resp, "Opening")
+        self.assertContains(resp, "Act 1")
+
+    def test_board_view_is_private(self):
+        other = get_user_model().objects.create(username="other")
+        self.client.force_login(other)
+        resp = self.client.get(reverse("plotboard:board_detail", args=[self.board.pk]))
+        self.assertEqual(resp.status_code, 404)
+
+
+class BoardSyncTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create(username="writer")
+        cls.board = Board.objects.create(name="Novel", owner=cls.user)
+        cls.act1 = Sequence.objects.create(name="Act 1", board=cls.board)
+        cls.act2 = Sequence.objects.create(name="Act 2", board=cls.board)
+        cls.card = Card.objects.create(board=cls.board, sequence=cls.act1, name="Hook")
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def sync(self, since):
+        url = reverse("plotboard:board_sync", args=[self.board.pk])
+        return self.client.get(url, {"since": since}).json()
+
+    def update(self, kind, pk, **data):
+        return self.client.post(
+            reverse(f"plotboard:update_{kind}", args=[pk]),
+            data,
+            content_type="application/json",
+        )
+
+    def test_versions_increase(self):
+        self.assertEqual(self.card.version, 3)
+        self.board.refresh_from_db()
+        self.assertEqual(self.board.version, 3)
+
+    def test_delta_sync(self):
+        full = self.sync(0)
+        self.assertEqual(len(full["sequences"]), 2)
+        self.assertEqual(len(full["cards"]), 1)
+        self.assertEqual(self.sync(full["version"]), {"version": 3, "changed": False})
+
+        self.act2.name = "Act Two"
+        self.act2.save()
+        delta = self.sync(full["version"])
+        self.assertEqual([s["name"] for s in delta["sequences"]], ["Act Two"])
+        self.assertEqual(delta["cards"], [])
+
+        act1_id = self.act1.pk
+        self.act1.delete()
+        delta = self.sync(delta["version"])
+        self.assertEqual(delta["deleted"]["sequence"], [act1_id])
+        self.assertEqual(delta["cards"][0]["sequence_id"], None)
+
+    def test_new_board_full_sync(self):
+        board = Board.objects.create(name="Empty", owner=self.user)
+        url = reverse("plotboard:board_sync", args=[board.pk])
+        full = self.client.get(url, {"since": 0}).json()
+        self.assertEqual((full["version"], full["changed"]), (0, True))
+        self.assertEqual(full["board"]["name"], "Empty")
+
+    def test_conditional_update(self):
+        resp = self.update("card", self.card.pk, version=3, content="<p>Hi<script>")
+        self.assertEqual(resp.status_code, 200)
+        new_version = resp.json()["version"]
+        self.card.refresh_from_db()
+        self.assertEqual(self.card.rendered_content, "<p>Hi</p>")
+        self.assertEqual(self.card.version, new_version)
+
+        # A second client still holding version 3 is rejected
+        resp = self.update("card", self.card.pk, version=3, name="Stale")
+        self.assertEqual(resp.status_code, 409)
+        self.assertEqual(resp.json()["current"]["version"], new_version)
+        self.card.refresh_from_db()
+        self.assertEqual(self.card.name, "Hook")
+
+    def test_update_validation(self):
+        resp = self.update("card", self.card.pk, version=3, board_id=99)
+        self.assertEqual(resp.status_code, 400)
+        resp = self.update("sequence", self.act1.pk, name="No version")
+        self.assertEqual(resp.status_code, 400)
+        resp = self.update("sequence", self.act1.pk, version=None)
+        self.assertEqual(resp.status_code, 400)
+        url = reverse("plotboard:update_card", args=[self.card.pk])
+        resp = self.client.post(url, [3], content_type="application/json")
+        self.assertEqual(resp.status_code, 400)
+        other = Sequence.objects.create(board=Board.objects.create(owner=self.user))
+        for bad in ({"name": "x" * 256}, {"sequence_id": "x"}, {"sequence_id": other.pk}):
+            resp = self.update("card", self.card.pk, version=3, **bad)
+            self.assertEqual(resp.status_code, 400, bad)
+        resp = self.update("sequence", self.act1.pk, version=1, name=None)
+        self.assertEqual(resp.status_code, 400)
+        self.card.refresh_from_db()
+        self.assertEqual((self.card.name, self.card.version), ("Hook", 3))
+
+    def test_deleting_board_leaves_no_records(self):
+        self.board.delete()
+        self.assertFalse(Deletion.objects.exists())
+
+
+class OutlineTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create(username="writer")
+        cls.board = Board.objects.create(name="Novel", owner=cls.user)
+        act1 = Sequence.objects.create(name="Act 1", board=cls.board)
+        Sequence.objects.create(name="Act 2", board=cls.board)
+        for name in ("Hook", "Inciting incident"):
+            Card.objects.create(
+                board=cls.board,
+                sequence=act1,
+                name=name,
+                content=f"<p>The <em>{name.lower()}</em> &amp; more.</p>",
+            )
+        Card.objects.create(board=cls.board, name="Loose end")
+
+    def test_markdown(self):
+        self.assertEqual(
+            to_markdown('<p>A <a href="/x">link</a></p><ol><li>one</li><li>two</li></ol>'),
+            "A [link](/x)\n\n1. one\n2. two",
+        )
+        with self.assertNumQueries(2):
+            text = "".join(export_markdown(self.board))
+        self.assertEqual(
+            text,
+            "# Novel\n\n## Act 1\n\n"
+            "### Hook\n\nThe *hook* & more.\n\n"
+            "### Inciting incident\n\nThe *inciting incident* & more.\n\n"
+            "## Act 2\n\n## Unsequenced\n\n### Loose end\n\n",
+        )
+
+    def test_export_view(self):
+        self.client.force_login(self.user)
+        resp = self.client.get(
+            reverse("plotboard:board_export", args=[self.board.pk, "opml"])
+        )
+        self.assertTrue(resp.streaming)
+        self.assertEqual(
+            resp.headers["Content-Disposition"], 'attachment; filename="novel.opml"'
+        )
+        self.assertIn(
+            '<outline text="Hook" _note="The hook &amp; more." />',
+            b"".join(resp.streaming_content).decode(),
+        )
+        resp = self.client.get(
+            reverse("plotboard:board_export", args=[self.board.pk, "exe"])
+        )
+        self.assertEqual(resp.status_code, 404)
+
+    def test_opml_round_trip(self):
+        self.client.force_login(self.user)
+        opml = "".join(export_opml(self.board)).encode()
+        resp = self.client.post(
+            reverse("plotboard:board_import"),
+            {"file": SimpleUploadedFile("novel.opml", opml)},
+        )
+        board = Board.objects.exclude(pk=self.board.pk).get()
+        self.assertRedirects(resp, board.get_absolute_url())
+        self.assertEqual(board.version, 1)
+        self.assertEqual(
+            [s.name for s in board.sequence_set.order_by("pk")],
+            ["Act 1", "Act 2", "Unsequenced"],
+        )
+        cards = Card.objects.filter(board=board).order_by("sequence", "_order")
+        self.assertEqual(
+            [(c.name, c.rendered_content, c.version) for c in cards],
+            [
+                ("Hook", "<p>The hook &amp; more.</p>", 1),
+                ("Inciting incident", "<p>The inciting incident &amp; more.</p>", 1),
+                ("Loose end", "", 1),
+            ],
+        )
+
+    def test_import_rejects_entities(self):
+        self.client.force_login(self.user)
+        opml = b'<?xml version="1.0"?><!DOCTYPE x [<!ENTITY a "b">]><opml><body/></opml>'
+        resp = self.client.post(
+            reverse("plotboard:board_import"),
+            {"file": SimpleUploadedFile("bad.opml", opml)},
+        )
+        self.assertEqual(resp.status_code, 200)
+        self.assertContains(resp, "DOCTYPE")
+        self.assertEqual(Board.objects.count(), 1)
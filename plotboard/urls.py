@@ -0,0 +1,29 @@
+from django.urls import path
+
+from plotboard import views
+
+app_name = "plotboard"
+urlpatterns = [
+    path("board/<int:pk>/", views.BoardDetailView.as_view(), name="board_detail"),
+    path("board/<int:pk>/sync/", views.board_sync, name="board_sync"),
+    path(
+        "board/<int:pk>/export/<str:format>/",
+        views.board_export,
+        name="board_export",
+    ),
+    path("board/import/", views.board_import, name="board_import"),
+    path("card/<int:pk>/", views.CardDetailView.as_view(), name="card_detail"),
+    path(
+        "card/<int:pk>/update/",
+        views.update_item,
+        {"model": "card"},
+        name="update_card",
+    ),
+    path(
+        "sequence/<int:pk>/update/",
+        views.update_item,
+        {"model": "sequence"},
+        name="update_sequence",
+    ),
+    path("", views.BoardListView.as_view(), name="board_list"),
+]
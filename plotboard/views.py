@@ -1,3 +1,196 @@
-from django.shortcuts import render
+import json
 
-# Create your views here.
+from django.contrib.auth.decorators import login_required
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.forms import modelform_factory
+from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.text import slugify
+from django.views.decorators.http import require_GET, require_POST
+from django.views.generic import DetailView, ListView
+
+from writertools.replica import ReportingMixin, reporting
+
+from .forms import ImportOutlineForm
+from .models import Board, Card, Deletion, Sequence, StaleVersion
+from .outline import EXPORTERS, FORMATS, import_outline
+
+BOARD_FIELDS = ("id", "name", "description", "per_row", "version")
+SEQUENCE_FIELDS = ("id", "name", "description", "version")
+CARD_FIELDS = (
+    "id",
+    "name",
+    "description",
+    "content",
+    "excerpt",
+    "sequence_id",
+    "_order",
+    "version",
+)
+# Fields a client may change with a conditional update
+EDITABLE_FIELDS = {
+    Sequence: {"name", "description"},
+    Card: {"name", "description", "content", "sequence_id"},
+}
+
+
+class BoardListView(LoginRequiredMixin, ReportingMixin, ListView):
+    model = Board
+
+    def get_queryset(self):
+        return super().get_queryset().filter(owner=self.request.user)
+
+
+class BoardDetailView(LoginRequiredMixin, ReportingMixin, DetailView):
+    model = Board
+
+    def get_queryset(self):
+        return super().get_queryset().filter(owner=self.request.user)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # Previews use the excerpt cached on each card, so the (potentially large)
+        # HTML content is never loaded or parsed here.
+        cards = (
+            Card.objects.filter(board=self.object)
+            .only("id", "name", "excerpt", "sequence_id")
+            .order_by("sequence", "_order")
+        )
+        by_sequence = {}
+        for card in cards:
+            by_sequence.setdefault(card.sequence_id, []).append(card)
+        sequences = list(self.object.sequence_set.all())
+        for sequence in sequences:
+            sequence.cards = by_sequence.get(sequence.id, [])
+        context["sequences"] = sequences
+        context["unsequenced_cards"] = by_sequence.get(None, [])
+        return context
+
+
+class CardDetailView(LoginRequiredMixin, ReportingMixin, DetailView):
+    model = Card
+
+    def get_queryset(self):
+        return (
+            super()
+            .get_queryset()
+            .filter(board__owner=self.request.user)
+            .defer("content")
+        )
+
+
+@login_required
+@require_GET
+def board_sync(request, pk):
+    """
+    Return what changed on a board since the version given in the `since` query
+    parameter, as JSON: the board itself, sequences and cards changed since then, and
+    ids of those deleted. Clients store the returned `version` and pass it next time.
+    Omit `since` (or pass 0) to fetch the whole board.
+    """
+    board = get_object_or_404(
+        Board.objects.filter(owner=request.user).values(*BOARD_FIELDS), pk=pk
+    )
+    try:
+        since = int(request.GET.get("since", 0))
+    except ValueError:
+        return JsonResponse({"errors": {"since": ["Must be an integer."]}}, status=400)
+    return JsonResponse(board_changes(board, since))
+
+
+def board_changes(board, since, card_fields=CARD_FIELDS) -> dict:
+    """Return the sync payload for `board` (a dict of BOARD_FIELDS) since the version
+    `since`. See board_sync()."""
+    if since and since >= board["version"]:
+        return {"version": board["version"], "changed": False}
+
+    changed = {"board": board["id"], "version__gt": since}
+    deleted = {"sequence": [], "card": []}
+    for model, object_id in Deletion.objects.filter(**changed).values_list(
+        "model", "object_id"
+    ):
+        deleted[model].append(object_id)
+    return {
+        "version": board["version"],
+        "changed": True,
+        "board": board,
+        "sequences": list(Sequence.objects.filter(**changed).values(*SEQUENCE_FIELDS)),
+        "cards": list(Card.objects.filter(**changed).values(*card_fields)),
+        "deleted": deleted,
+    }
+
+
+@login_required
+@require_POST
+def update_item(request, model, pk):
+    """
+    Conditionally update a sequence or card. The JSON body holds the fields to change
+    and the `version` of the object the client last saw. Responds 409 Conflict with the
+    current object if it has changed since, otherwise with the new version.
+    """
+    model = {"sequence": Sequence, "card": Card}[model]
+    item = get_object_or_404(model.objects.filter(board__owner=request.user), pk=pk)
+    try:
+        data = json.loads(request.body)
+        version = int(data.pop("version"))
+    except (ValueError, KeyError, AttributeError, TypeError):
+        return JsonResponse({"errors": {"version": ["Required."]}}, status=400)
+    unknown = set(data) - EDITABLE_FIELDS[model]
+    if unknown:
+        return JsonResponse(
+            {"errors": {f: ["Not editable."] for f in sorted(unknown)}}, status=400
+        )
+    # Validate and convert the values with a form: update() bypasses save(), though
+    # Card.update_versioned() sanitizes new content as Card.save() does.
+    names = {model._meta.get_field(f).name: f for f in data}
+    form = modelform_factory(model, fields=list(names))(
+        {name: data[f] for name, f in names.items()},
+        instance=model(board_id=item.board_id),
+    )
+    if "sequence" in form.fields:
+        form.fields["sequence"].queryset = Sequence.objects.filter(board_id=item.board_id)
+    if not form.is_valid():
+        return JsonResponse(
+            {"errors": {names.get(f, f): e for f, e in form.errors.items()}},
+            status=400,
+        )
+    data = {f: getattr(form.instance, f) for f in data}
+
+    fields = SEQUENCE_FIELDS if model is Sequence else CARD_FIELDS
+    try:
+        new_version = model.update_versioned(pk, version, **data)
+    except StaleVersion:
+        current = model.objects.filter(pk=pk).values(*fields).first()
+        return JsonResponse({"conflict": True, "current": current}, status=409)
+    except model.DoesNotExist:
+        return JsonResponse({"conflict": True, "current": None}, status=409)
+    return JsonResponse({"version": new_version})
+
+
+@login_required
+@require_GET
+@reporting
+def board_export(request, pk, format):
+    """Download the board as an outline, in a format from outline.FORMATS. The
+    response streams out as cards are read."""
+    if format not in FORMATS:
+        raise Http404("Unknown export format")
+    board = get_object_or_404(
+        Board.objects.filter(owner=request.user).only("name", "description"), pk=pk
+    )
+    response = StreamingHttpResponse(
+        EXPORTERS[format](board), content_type=FORMATS[format]
+    )
+    filename = f"{slugify(board.name) or 'board'}.{format}"
+    response.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+@login_required
+def board_import(request):
+    """Create a board from an uploaded OPML outline."""
+    form = ImportOutlineForm(request.POST or None, request.FILES or None)
+    if request.method == "POST" and form.is_valid():
+        board = import_outline(request.user, *form.cleaned_data["file"])
+        return redirect(board)
+    return render(request, "plotboard/board_import.html", {"form": form})
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Project, WorkSession
+from .models import Profile, Project, SessionArchive, WordCountSnapshot, WorkSession
 
 
 @admin.register(Project)
@@ -11,3 +11,18 @@ class ProjectAdmin(admin.ModelAdmin):
 @admin.register(WorkSession)
 class WorkSessionAdmin(admin.ModelAdmin):
     pass
+
+
+@admin.register(WordCountSnapshot)
+class WordCountSnapshotAdmin(admin.ModelAdmin):
+    pass
+
+
+@admin.register(SessionArchive)
+class SessionArchiveAdmin(admin.ModelAdmin):
+    pass
+
+
+@admin.register(Profile)
+class ProfileAdmin(admin.ModelAdmin):
+    pass
@@ -0,0 +1,195 @@
+"""
+Statistics over a user's whole session history that the database can't aggregate for
+us, such as rolling averages, medians and distributions.
+
+Rather than model instances, only the needed columns are read, with
+values_list().iterator(), into compact arrays of 32 bit integers: 12 bytes per session,
+so 100,000 sessions take a little over 1MB. When NumPy is installed the arrays are
+wrapped without copying and the computations are vectorized; otherwise the same results
+are computed with the standard library.
+
+These cover live sessions only. Sessions moved to cold storage (see archive.py) are
+counted in totals, but not in distributions.
+"""
+import math
+from array import array
+from datetime import date
+from itertools import accumulate
+
+from django.utils import timezone
+
+from .models import WorkSession
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+PERCENTILES = (25, 50, 75, 90)
+
+
+class SessionColumns:
+    """A user's sessions as columns, ordered by start date. `day` is the start date as
+    a proleptic Gregorian ordinal, `duration` is in seconds and `wordcount` in words.
+    Missing durations and word counts are 0."""
+
+    NAMES = ("day", "duration", "wordcount")
+
+    def __init__(self):
+        for name in self.NAMES:
+            setattr(self, name, array("i"))
+
+    def __len__(self):
+        return len(self.day)
+
+    @classmethod
+    def load(cls, user, start=None, end=None, project=None):
+        """Load the user's sessions starting on or after `start` and before `end`,
+        optionally for one project."""
+        sessions = WorkSession.objects.filter(user=user)
+        if start:
+            sessions = sessions.filter(startdate__gte=start)
+        if end:
+            sessions = sessions.filter(startdate__lt=end)
+        if project:
+            sessions = sessions.filter(project=project)
+        columns = cls()
+        rows = (
+            sessions.order_by("startdate")
+            .values_list("startdate", "duration", "wordcount")
+            .iterator(chunk_size=2000)
+        )
+        for startdate, duration, wordcount in rows:
+            columns.day.append(startdate.toordinal())
+            columns.duration.append(int(duration.total_seconds()) if duration else 0)
+            columns.wordcount.append(wordcount or 0)
+        return columns
+
+    def column(self, name):
+        """Return a column as a NumPy array sharing its memory, or the array itself
+        without NumPy."""
+        values = getattr(self, name)
+        return np.frombuffer(values, dtype=np.intc) if np is not None else values
+
+    @property
+    def nbytes(self):
+        return sum(len(a) * a.itemsize for a in (getattr(self, n) for n in self.NAMES))
+
+
+def daily_totals(columns, first: int, last: int):
+    """Return words written on each day from ordinal `first` to `last` inclusive."""
+    days = last - first + 1
+    if np is not None:
+        day = columns.column("day")
+        wanted = (day >= first) & (day <= last)
+        return np.bincount(
+            day[wanted] - first,
+            weights=columns.column("wordcount")[wanted],
+            minlength=days,
+        ).astype(np.int64)
+    totals = array("q", bytes(8 * days))
+    for day, words in zip(columns.day, columns.wordcount):
+        if first <= day <= last:
+            totals[day - first] += words
+    return totals
+
+
+def rolling_mean(values, window: int):
+    """Return the mean of each value and the `window - 1` values before it. The first
+    few means are of however many values there are so far."""
+    if not len(values):
+        return []
+    if np is not None:
+        sums = np.cumsum(values, dtype=np.float64)
+        sums[window:] = sums[window:] - sums[:-window]
+        return sums / np.minimum(np.arange(1, len(values) + 1), window)
+    sums = list(accumulate(values))
+    return [
+        (total - (sums[i - window] if i >= window else 0)) / min(i + 1, window)
+        for i, total in enumerate(sums)
+    ]
+
+
+def percentiles(values, ps=PERCENTILES) -> dict:
+    """Return the given percentiles of `values`, interpolating linearly between the
+    closest ranks like numpy.percentile(). Empty input gives None for each."""
+    if not len(values):
+        return {p: None for p in ps}
+    if np is not None:
+        return dict(zip(ps, np.percentile(values, ps).tolist()))
+    ordered = sorted(values)
+    result = {}
+    for p in ps:
+        rank = (len(ordered) - 1) * p / 100
+        low, high = math.floor(rank), math.ceil(rank)
+        result[p] = ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+    return result
+
+
+def timed_durations(columns):
+    """Return the durations, in seconds, of sessions that have one."""
+    if np is not None:
+        duration = columns.column("duration")
+        return duration[duration > 0]
+    return array("i", (d for d in columns.duration if d > 0))
+
+
+def words_per_minute(columns):
+    """Return the writing rate of each timed session."""
+    if np is not None:
+        duration = columns.column("duration")
+        timed = duration > 0
+        return columns.column("wordcount")[timed] * 60.0 / duration[timed]
+    return array(
+        "d",
+        (
+            words * 60 / duration
+            for words, duration in zip(columns.wordcount, columns.duration)
+            if duration > 0
+        ),
+    )
+
+
+def streak(columns, last: int) -> int:
+    """Return the number of consecutive days, ending on ordinal `last`, with at least
+    one session."""
+    days = 0
+    # Columns are in date order, so walk back from the end.
+    for day in reversed(columns.day):
+        if day > last - days:
+            continue
+        if day < last - days:
+            break
+        days += 1
+    return days
+
+
+def session_patterns(user, today: date = None) -> dict:
+    """Summarize the shape of the user's writing habit, excluding the current day.
+    Days are those of the current time zone: the user's, within requests.
+
+        {
+            'sessions': 412,
+            'streak': 5,
+            'duration': {25: 1800.0, 50: 2700.0, 75: 4500.0, 90: 6300.0},
+            'words_per_minute': {25: 9.5, 50: 14.0, 75: 19.2, 90: 24.0},
+            'sevenday_daily_words': 812.4,
+            'thirtyday_daily_words': 640.1,
+        }
+
+    Durations are in seconds. Daily averages include days without any writing.
+    """
+    today = today or timezone.localdate()
+    columns = SessionColumns.load(user, end=today)
+    if not len(columns):
+        return {}
+    last = today.toordinal() - 1
+    daily = daily_totals(columns, min(columns.day[0], last - 29), last)
+    return {
+        "sessions": len(columns),
+        "streak": streak(columns, last),
+        "duration": percentiles(timed_durations(columns)),
+        "words_per_minute": percentiles(words_per_minute(columns)),
+        "sevenday_daily_words": float(rolling_mean(daily, 7)[-1]),
+        "thirtyday_daily_words": float(rolling_mean(daily, 30)[-1]),
+    }
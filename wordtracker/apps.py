@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class WordtrackerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'wordtracker'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,176 @@
+"""
+Cold storage for old WorkSessions.
+
+Archiving moves a user's sessions older than a cutoff out of the WorkSession table, into
+one gzipped JSON Lines file per user and year in the default file storage (MEDIA_ROOT,
+unless configured otherwise), plus a SessionArchive row of totals per project and year.
+Statistics combine those totals with the live sessions, so archiving does not change
+what users see, but it keeps the hot table and its indexes small.
+
+Archiving is idempotent: rows are merged into any existing file by id, and the live rows
+are deleted only after the file has been written. Restoring a year puts the rows back
+with their original ids and removes the archive.
+"""
+import gzip
+import json
+from datetime import timedelta
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models.functions import ExtractYear
+from django.utils import timezone
+
+from .models import (
+    Project,
+    SessionArchive,
+    WorkSession,
+    bump_data_version,
+    invalidate_forecasts,
+)
+
+# Sessions inside the 30 day statistics window must stay live.
+MIN_ARCHIVE_AGE = timedelta(days=31)
+FIELDS = [field.attname for field in WorkSession._meta.concrete_fields]
+
+
+def archive_name(user, year):
+    return f"wordtracker/archive/{user.pk}/{year}.jsonl.gz"
+
+
+def read_archive(user, year) -> dict:
+    """Return the archived session rows for the user and year, keyed by id."""
+    name = archive_name(user, year)
+    if not default_storage.exists(name):
+        # A write that failed after removing the old file leaves the new one here
+        name = pending_name(name)
+        if not default_storage.exists(name):
+            return {}
+    with default_storage.open(name, "rb") as f:
+        lines = gzip.decompress(f.read()).decode().splitlines()
+    rows = (json.loads(line) for line in lines if line)
+    return {row["id"]: row for row in rows}
+
+
+def pending_name(name):
+    return f"{name}.new"
+
+
+def write_archive(user, year, rows: dict):
+    """Replace the archive file for the user and year with `rows`. Storages can't
+    rename files, so the new file is saved under a pending name first, and the old one
+    is only removed once that has succeeded."""
+    name = archive_name(user, year)
+    pending = pending_name(name)
+    content = "".join(
+        json.dumps(row, cls=DjangoJSONEncoder) + "\n"
+        for _, row in sorted(rows.items())
+    )
+    content = gzip.compress(content.encode(), mtime=0)
+    if default_storage.exists(pending):
+        default_storage.delete(pending)
+    default_storage.save(pending, ContentFile(content))
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    default_storage.save(name, ContentFile(content))
+    default_storage.delete(pending)
+
+
+def summarize(user, year, rows: dict):
+    """Replace the SessionArchive totals for the user and year with totals of `rows`."""
+    projects = set(Project.objects.filter(user=user).values_list("id", flat=True))
+    totals = {}
+    for row in map(to_python, rows.values()):
+        # The project may have been deleted since the row was archived
+        project = row["project_id"] if row["project_id"] in projects else None
+        start, end = row["startdate"], row["enddate"] or row["startdate"]
+        archive = totals.get(project)
+        if archive is None:
+            archive = totals[project] = SessionArchive(
+                user=user,
+                year=year,
+                project_id=project,
+                first_date=start,
+                last_date=end,
+            )
+        archive.sessions += 1
+        archive.wordcount += row["wordcount"] or 0
+        if row["duration"] is not None:
+            archive.duration += row["duration"]
+            archive.timed_wordcount += row["wordcount"] or 0
+        archive.first_date = min(archive.first_date, start)
+        archive.last_date = max(archive.last_date, end)
+    SessionArchive.objects.filter(user=user, year=year).delete()
+    SessionArchive.objects.bulk_create(totals.values())
+
+
+def to_python(row):
+    return {
+        name: WorkSession._meta.get_field(name).to_python(value)
+        for name, value in row.items()
+    }
+
+
+def archive_sessions(user, before, progress=None) -> int:
+    """Archive the user's sessions that started before the date `before`. Returns
+    the number of sessions archived. If given, `progress` is called with the number
+    of years done and the total after each year is archived."""
+    if before > timezone.localdate() - MIN_ARCHIVE_AGE:
+        raise ValueError(
+            f"Only sessions older than {MIN_ARCHIVE_AGE.days} days can be archived"
+        )
+    sessions = WorkSession.objects.filter(user=user, startdate__lt=before)
+    years = (
+        sessions.order_by()
+        .values_list(ExtractYear("startdate"), flat=True)
+        .distinct()
+    )
+    years = sorted(years)
+    count = 0
+    for done, year in enumerate(years, start=1):
+        in_year = sessions.filter(startdate__year=year)
+        rows = read_archive(user, year)
+        new_ids = []
+        for row in in_year.values(*FIELDS).iterator(chunk_size=2000):
+            rows[row["id"]] = row
+            new_ids.append(row["id"])
+        # Write the file before deleting anything, so a failure loses nothing.
+        write_archive(user, year, rows)
+        with transaction.atomic():
+            summarize(user, year, rows)
+            # Deleting through the queryset sends post_delete for each session, which
+            # invalidates its project's forecast and bumps the data version.
+            for start in range(0, len(new_ids), 500):
+                WorkSession.objects.filter(id__in=new_ids[start : start + 500]).delete()
+        count += len(new_ids)
+        if progress:
+            progress(done, len(years))
+    return count
+
+
+def restore_sessions(user, year) -> int:
+    """Move the user's archived sessions for `year` back into the WorkSession table.
+    Returns the number of sessions restored."""
+    rows = read_archive(user, year)
+    projects = set(Project.objects.filter(user=user).values_list("id", flat=True))
+    sessions = []
+    for row in map(to_python, rows.values()):
+        if row["project_id"] not in projects:
+            row["project_id"] = None
+        sessions.append(WorkSession(**row))
+    with transaction.atomic():
+        existing = set(
+            WorkSession.objects.filter(id__in=list(rows)).values_list("id", flat=True)
+        )
+        WorkSession.objects.bulk_create(
+            [s for s in sessions if s.id not in existing], batch_size=500
+        )
+        SessionArchive.objects.filter(user=user, year=year).delete()
+        # bulk_create() sends no signals
+        invalidate_forecasts(*(s.project_id for s in sessions))
+        bump_data_version(user.pk)
+    for name in (archive_name(user, year), pending_name(archive_name(user, year))):
+        if default_storage.exists(name):
+            default_storage.delete(name)
+    return len(sessions)
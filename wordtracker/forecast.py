@@ -0,0 +1,130 @@
+"""
+"At this pace you'll finish on..." projections for projects with a target word count.
+
+A forecast needs only the project's words per day over the last 30 days, which come
+from one grouped query returning at most 30 rows, plus the project's current length.
+Neither depends on how long the project's history is. Forecasts are cached per project
+until midnight in the current (the user's) time zone, and dropped whenever one of the
+project's sessions is written (see invalidate_forecasts()).
+"""
+from datetime import datetime, time, timedelta
+
+from django.core.cache import cache
+from django.db import models
+from django.utils import timezone
+
+from .models import SessionArchive, WorkSession, forecast_cache_key
+
+WINDOW = 30
+
+
+def daily_words(project, today, days=WINDOW) -> list:
+    """Return words written on the project on each of the `days` days before today,
+    oldest first."""
+    start = today - timedelta(days=days)
+    totals = dict(
+        WorkSession.objects.filter(
+            project=project, startdate__gte=start, startdate__lt=today
+        )
+        .order_by()
+        .values_list("startdate")
+        .annotate(models.Sum("wordcount"))
+    )
+    return [totals.get(start + timedelta(days=n)) or 0 for n in range(days)]
+
+
+def project_length(project) -> int:
+    """Return the project's current length: its last recorded manuscript total if it
+    has one, else the sum of its sessions, archived or not."""
+    if project.last_total is not None:
+        return project.last_total
+    live = WorkSession.objects.filter(project=project).aggregate(
+        words=models.Sum("wordcount")
+    )
+    archived = SessionArchive.objects.filter(project=project).aggregate(
+        words=models.Sum("wordcount")
+    )
+    return (live["words"] or 0) + (archived["words"] or 0)
+
+
+def fit_line(values) -> tuple[float, float]:
+    """Least squares fit of values[x] = intercept + slope * x. Returns (intercept,
+    slope)."""
+    n = len(values)
+    mean_x = (n - 1) / 2
+    mean_y = sum(values) / n
+    variance = sum((x - mean_x) ** 2 for x in range(n))
+    slope = (
+        sum((x - mean_x) * (y - mean_y) for x, y in enumerate(values)) / variance
+        if variance
+        else 0.0
+    )
+    return mean_y - slope * mean_x, slope
+
+
+def compute_forecast(project, today) -> dict:
+    daily = daily_words(project, today)
+    intercept, slope = fit_line(daily)
+    written = project_length(project)
+    target = project.target_wordcount
+    remaining = max(target - written, 0) if target else None
+    # Project forward at the trend's rate for today. A trend that has fallen to
+    # nothing says little about the future, so use the plain 30 day average instead.
+    pace = intercept + slope * len(daily)
+    if pace <= 0:
+        pace = sum(daily) / len(daily)
+    if remaining is None or pace <= 0:
+        finish_date = None
+    else:
+        finish_date = today + timedelta(days=-(-remaining // pace))
+    return {
+        "written": written,
+        "target": target,
+        "remaining": remaining,
+        "sevenday_rate": sum(daily[-7:]) / 7,
+        "thirtyday_rate": sum(daily) / len(daily),
+        "trend": slope,
+        "pace": pace,
+        "finish_date": finish_date,
+    }
+
+
+def seconds_until_midnight() -> int:
+    now = timezone.localtime()
+    midnight = datetime.combine(now.date() + timedelta(days=1), time(), now.tzinfo)
+    # Compare timestamps: differences within one zone ignore DST changes
+    return max(int(midnight.timestamp() - now.timestamp()), 1)
+
+
+def project_forecasts(projects, today=None) -> dict:
+    """Return forecasts for the projects, keyed by project id, computing those not in
+    the cache. Rates are in words per day, and exclude today. `trend` is the change in
+    the daily rate per day.
+
+        {
+            12: {
+                'written': 52000,
+                'target': 80000,
+                'remaining': 28000,
+                'sevenday_rate': 850.0,
+                'thirtyday_rate': 610.5,
+                'trend': 12.4,
+                'pace': 795.3,
+                'finish_date': datetime.date(2024, 7, 6),
+            }
+        }
+
+    `finish_date` is None when the project is not making progress, and `remaining`
+    and `finish_date` are None for projects without a target.
+    """
+    today = today or timezone.localdate()
+    keys = {forecast_cache_key(project.pk, today): project for project in projects}
+    cached = cache.get_many(keys)
+    forecasts = {keys[key].pk: forecast for key, forecast in cached.items()}
+    missing = {}
+    for key, project in keys.items():
+        if key not in cached:
+            forecasts[project.pk] = missing[key] = compute_forecast(project, today)
+    if missing:
+        cache.set_many(missing, seconds_until_midnight())
+    return forecasts
@@ -1,8 +1,19 @@
+import zoneinfo
 from datetime import datetime, timedelta
+
 from django import forms
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
-from .models import Project, ProjectStatus, StandardActivityChoices, WorkSession
+from .archive import MIN_ARCHIVE_AGE
+from .models import (
+    Profile,
+    Project,
+    ProjectStatus,
+    StandardActivityChoices,
+    WorkSession,
+)
+from .tasks import parse_totals
 
 
 time_message = _(
@@ -89,13 +100,66 @@ class LogWorkForm(forms.ModelForm):
     def clean(self):
         data = super().clean()
         # TODO: Attempt to calculate duration from start and end
-        if not data["duration"]:
-            startdate = data["startdate"]
-            starttime = data["starttime"]
-            enddate = data["enddate"]
-            endtime = data["endtime"]
+        if not data.get("duration"):
+            startdate = data.get("startdate")
+            starttime = data.get("starttime")
+            enddate = data.get("enddate")
+            endtime = data.get("endtime")
             if startdate and starttime and enddate and endtime and starttime != endtime:
                 start = datetime.fromisoformat(f"{startdate}T{starttime}")
                 end = datetime.fromisoformat(f"{enddate}T{endtime}")
                 data["duration"] = str(end - start)
         return data
+
+
+class RecordTotalForm(forms.Form):
+    """Accepts the total word count of a project's manuscript."""
+
+    total = forms.IntegerField(label=_("total word count").title(), min_value=0)
+    recorded_at = forms.DateTimeField(
+        label=_("recorded at").title(),
+        required=False,
+        help_text=_("When the total was counted. Defaults to now."),
+    )
+
+
+class BackfillTotalsForm(forms.Form):
+    """Accepts a CSV file of 'timestamp,total' rows for a project's history."""
+
+    file = forms.FileField(label=_("CSV file"))
+
+    def clean_file(self):
+        content = self.cleaned_data["file"].read().decode("utf-8-sig", "replace")
+        try:
+            return parse_totals(content.splitlines())
+        except ValueError as e:
+            raise forms.ValidationError(str(e))
+
+
+class ArchiveSessionsForm(forms.Form):
+    """Accepts the date before which to archive the user's sessions."""
+
+    before = forms.DateField(label=_("archive sessions before"))
+
+    def clean_before(self):
+        before = self.cleaned_data["before"]
+        if before > timezone.localdate() - MIN_ARCHIVE_AGE:
+            raise forms.ValidationError(
+                _("Only sessions older than %(days)d days can be archived."),
+                params={"days": MIN_ARCHIVE_AGE.days},
+            )
+        return before
+
+
+class ProfileForm(forms.ModelForm):
+    """Accepts the user's wordtracker preferences."""
+
+    class Meta:
+        model = Profile
+        fields = ("timezone",)
+
+    timezone = forms.ChoiceField(
+        label=_("time zone").title(),
+        choices=[(name, name) for name in sorted(zoneinfo.available_timezones())],
+        help_text=_("Sessions are dated, and each day ends, in this time zone."),
+    )
@@ -0,0 +1,64 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from wordtracker.archive import archive_sessions, restore_sessions
+from wordtracker.models import SessionArchive, WorkSession
+
+
+class Command(BaseCommand):
+    help = (
+        "Move old WorkSessions into compressed per-user yearly archives, or restore "
+        "an archived year with --restore."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than",
+            type=int,
+            default=730,
+            metavar="DAYS",
+            help="Archive sessions that started more than DAYS days ago.",
+        )
+        parser.add_argument(
+            "--user", help="Only archive (or restore) sessions for this username."
+        )
+        parser.add_argument(
+            "--restore",
+            type=int,
+            metavar="YEAR",
+            help="Restore the archived sessions for YEAR instead. Requires --user.",
+        )
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        if options["user"]:
+            try:
+                users = [User.objects.get(username=options["user"])]
+            except User.DoesNotExist:
+                raise CommandError(f"No user named {options['user']}")
+        elif options["restore"]:
+            raise CommandError("--restore requires --user")
+        else:
+            before = timezone.localdate() - timedelta(days=options["older_than"])
+            users = User.objects.filter(
+                id__in=WorkSession.objects.filter(startdate__lt=before).values("user")
+            )
+
+        if options["restore"]:
+            year = options["restore"]
+            if not SessionArchive.objects.filter(user=users[0], year=year).exists():
+                raise CommandError(f"{users[0]} has no archived sessions for {year}")
+            count = restore_sessions(users[0], year)
+            self.stdout.write(f"Restored {count} sessions for {users[0]} in {year}.")
+            return
+
+        before = timezone.localdate() - timedelta(days=options["older_than"])
+        for user in users:
+            try:
+                count = archive_sessions(user, before)
+            except ValueError as e:
+                raise CommandError(str(e))
+            self.stdout.write(f"Archived {count} sessions for {user}.")
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from wordtracker.models import Project
+from wordtracker.tasks import parse_totals
+
+
+class Command(BaseCommand):
+    help = (
+        "Backfill a project's word count history from a CSV file of "
+        "'timestamp,total' rows (ISO 8601 timestamps, local time if naive)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("project_id", type=int)
+        parser.add_argument("csv_file")
+
+    def handle(self, *args, **options):
+        try:
+            project = Project.objects.get(pk=options["project_id"])
+        except Project.DoesNotExist:
+            raise CommandError(f"No project with id {options['project_id']}")
+
+        with open(options["csv_file"], newline="") as f:
+            try:
+                points = parse_totals(f)
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        try:
+            snapshots = project.record_totals(points)
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(
+            f"Recorded {len(snapshots)} snapshots for {project}; "
+            f"last total {project.last_total}."
+        )
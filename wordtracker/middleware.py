@@ -0,0 +1,32 @@
+"""
+Activates each logged in user's time zone (see Profile), so that "today" and local
+dates and times mean the same thing to the user and to every view.
+"""
+import zoneinfo
+
+from django.utils import timezone
+
+from .models import user_timezone
+
+# The time zone name is kept in the session, set at login (see signals.py).
+SESSION_KEY = "wordtracker_timezone"
+
+
+class TimezoneMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            name = request.session.get(SESSION_KEY)
+            if name is None:
+                name = request.session[SESSION_KEY] = user_timezone(user).key
+            try:
+                timezone.activate(zoneinfo.ZoneInfo(name))
+            except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+                del request.session[SESSION_KEY]
+                timezone.deactivate()
+        else:
+            timezone.deactivate()
+        return self.get_response(request)
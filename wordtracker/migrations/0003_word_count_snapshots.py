@@ -0,0 +1,46 @@
+# Generated by Django 5.0.14 on 2026-10-19 14:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wordtracker', '0002_auto_20230211_1223'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='last_session',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='wordtracker.worksession', verbose_name='last snapshot session'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='last_total',
+            field=models.IntegerField(blank=True, null=True, verbose_name='last total word count'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='last_total_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='last total recorded at'),
+        ),
+        migrations.CreateModel(
+            name='WordCountSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recorded_at', models.DateTimeField(verbose_name='recorded at')),
+                ('total', models.IntegerField(verbose_name='total word count')),
+                ('delta', models.IntegerField(verbose_name='change in word count')),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='wordtracker.project', verbose_name='project')),
+                ('session', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='wordtracker.worksession', verbose_name='work session')),
+            ],
+            options={
+                'verbose_name': 'word count snapshot',
+                'verbose_name_plural': 'word count snapshots',
+                'ordering': ('project', 'recorded_at'),
+                'indexes': [models.Index(fields=['project', 'recorded_at'], name='snapshot_project_at')],
+            },
+        ),
+    ]
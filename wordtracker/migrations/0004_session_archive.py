@@ -0,0 +1,39 @@
+# Generated by Django 5.0.14 on 2026-10-19 14:42
+
+import datetime
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wordtracker', '0003_word_count_snapshots'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SessionArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField(verbose_name='year')),
+                ('sessions', models.PositiveIntegerField(default=0, verbose_name='sessions')),
+                ('wordcount', models.IntegerField(default=0, verbose_name='word count')),
+                ('duration', models.DurationField(default=datetime.timedelta, verbose_name='duration')),
+                ('first_date', models.DateField(verbose_name='first date')),
+                ('last_date', models.DateField(verbose_name='last date')),
+                ('project', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='wordtracker.project', verbose_name='project')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to=settings.AUTH_USER_MODEL, verbose_name='user')),
+            ],
+            options={
+                'verbose_name': 'session archive',
+                'verbose_name_plural': 'session archives',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='sessionarchive',
+            constraint=models.UniqueConstraint(fields=('user', 'year', 'project'), name='unique_archive_year'),
+        ),
+    ]
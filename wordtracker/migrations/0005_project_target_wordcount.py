@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-19 14:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wordtracker', '0004_session_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='target_wordcount',
+            field=models.PositiveIntegerField(blank=True, help_text='How long do you expect it to be? Used to forecast a finish date.', null=True, verbose_name='target word count'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.14 on 2026-10-19 14:54
+
+import django.db.models.deletion
+import wordtracker.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wordtracker', '0005_project_target_wordcount'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Profile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timezone', models.CharField(default=wordtracker.models.default_timezone, max_length=64, validators=[wordtracker.models.validate_timezone], verbose_name='time zone')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='wordtracker_profile', to=settings.AUTH_USER_MODEL, verbose_name='user')),
+            ],
+            options={
+                'verbose_name': 'profile',
+                'verbose_name_plural': 'profiles',
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.0.14 on 2026-10-19 15:34
+
+from datetime import timedelta
+
+from django.db import migrations, models
+
+
+def count_timed_words(apps, schema_editor):
+    # The archive files have the rows, but existing totals only say whether any
+    # session recorded time; assume those that did cover all the words.
+    SessionArchive = apps.get_model("wordtracker", "SessionArchive")
+    SessionArchive.objects.filter(duration__gt=timedelta()).update(
+        timed_wordcount=models.F("wordcount")
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wordtracker', '0007_profile_data_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sessionarchive',
+            name='timed_wordcount',
+            field=models.IntegerField(default=0, verbose_name='timed word count'),
+        ),
+        migrations.RunPython(count_timed_words, migrations.RunPython.noop),
+    ]
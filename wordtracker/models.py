@@ -1,9 +1,52 @@
-from datetime import datetime, timedelta
+import zoneinfo
+from datetime import datetime, time, timedelta
 
 from django.conf import settings
-from django.db import models
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models.functions import Coalesce, TruncDate
+from django.urls import reverse
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+# Word count snapshots further apart than this start a new WorkSession.
+SNAPSHOT_SESSION_GAP = timedelta(minutes=30)
+
+
+def forecast_cache_key(project_id, day):
+    return f"wordtracker:forecast:{project_id}:{day.isoformat()}"
+
+
+def invalidate_forecasts(*project_ids):
+    """Drop today's cached forecasts for the projects, once the current transaction
+    commits. See forecast.py. Saving or deleting a Project or WorkSession does this
+    (see signals.py); code writing sessions in bulk must call it itself."""
+    today = timezone.localdate()
+    keys = [forecast_cache_key(pk, today) for pk in set(project_ids) if pk is not None]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def data_version(user) -> int:
+    """Return a number that changes whenever the user's sessions or projects change,
+    for ETags. It is kept on the user's Profile, so every process sees the same value,
+    and costs no query when the profile is already loaded with the user."""
+    try:
+        return user.wordtracker_profile.data_version
+    except Profile.DoesNotExist:
+        return 0
+
+
+def bump_data_version(user_id):
+    """Change the user's data version, as part of the current transaction. Like
+    invalidate_forecasts(), this is left to code writing sessions in bulk."""
+    bumped = Profile.objects.filter(user_id=user_id).update(
+        data_version=models.F("data_version") + 1
+    )
+    if not bumped:
+        Profile.objects.get_or_create(user_id=user_id, defaults={"data_version": 1})
+
 
 class ProjectStatus(models.TextChoices):
     IN_PROGRESS = "IN_PROGRESS", _("Work in progress")
@@ -49,6 +92,24 @@ class Project(models.Model):
         ),
     )
     desciption = models.TextField(_("description"), blank=True)
+    target_wordcount = models.PositiveIntegerField(
+        _("target word count"),
+        blank=True,
+        null=True,
+        help_text=_("How long do you expect it to be? Used to forecast a finish date."),
+    )
+    # State of word count snapshot tracking. See record_totals()
+    last_total = models.IntegerField(_("last total word count"), blank=True, null=True)
+    last_total_at = models.DateTimeField(_("last total recorded at"), blank=True, null=True)
+    last_session = models.ForeignKey(
+        "wordtracker.WorkSession",
+        verbose_name=_("last snapshot session"),
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name="+",
+        editable=False,
+    )
 
     class Meta:
         verbose_name = _("project")
@@ -57,6 +118,97 @@ class Project(models.Model):
     def __str__(self):
         return self.name
 
+    def get_absolute_url(self):
+        return reverse("wordtracker:project_detail", kwargs={"pk": self.pk})
+
+    def record_totals(self, points):
+        """Record manuscript total word counts for this project, and update the
+        project's WorkSessions with the change in words.
+
+        `points` is an iterable of (datetime, total) pairs, which must all be later than
+        the last recorded total. Pass one point for a live update, or a whole series to
+        backfill history. The cost of a live update does not depend on how much history
+        the project has: the last known total is kept on the project itself.
+
+        The first total ever recorded is a baseline, with a change of zero. Changes
+        within SNAPSHOT_SESSION_GAP of the previous point are added to the same
+        WorkSession, extending it; a change after a longer gap starts a new one.
+        Unchanged totals are not stored, but do keep the current session open.
+
+        Returns the list of WordCountSnapshots created.
+        """
+        points = sorted(points)
+        with transaction.atomic():
+            project = Project.objects.select_for_update().get(pk=self.pk)
+            last_total, last_at = project.last_total, project.last_total_at
+            session = project.last_session
+            if points and last_at and points[0][0] <= last_at:
+                raise ValueError(
+                    f"Totals must be recorded after {last_at.isoformat()}"
+                )
+
+            new_sessions, snapshots, touched = [], [], None
+            for at, total in points:
+                delta = 0 if last_total is None else total - last_total
+                within_gap = last_at is not None and at - last_at <= SNAPSHOT_SESSION_GAP
+                if not within_gap:
+                    session = None
+                if session is not None:
+                    session.enddate, session.endtime = _local_date_time(at)
+                    session.duration = (session.duration or timedelta()) + (at - last_at)
+                    session.wordcount = (session.wordcount or 0) + delta
+                    if session.pk:
+                        touched = session
+                elif delta:
+                    start = last_at if within_gap else at
+                    startdate, starttime = _local_date_time(start)
+                    enddate, endtime = _local_date_time(at)
+                    session = WorkSession(
+                        user_id=project.user_id,
+                        project=project,
+                        activity=StandardActivityChoices.DRAFTING,
+                        startdate=startdate,
+                        starttime=starttime,
+                        enddate=enddate,
+                        endtime=endtime,
+                        duration=at - start,
+                        wordcount=delta,
+                    )
+                    new_sessions.append(session)
+                if delta or last_total is None:
+                    snapshots.append(
+                        WordCountSnapshot(
+                            project=project,
+                            recorded_at=at,
+                            total=total,
+                            delta=delta,
+                            session=session,
+                        )
+                    )
+                last_total, last_at = total, at
+
+            if touched:
+                touched.save(
+                    update_fields=["enddate", "endtime", "duration", "wordcount"]
+                )
+            WorkSession.objects.bulk_create(new_sessions)
+            WordCountSnapshot.objects.bulk_create(snapshots)
+            project.last_total, project.last_total_at = last_total, last_at
+            project.last_session = session
+            # Also drops the forecast and bumps the data version
+            project.save(update_fields=["last_total", "last_total_at", "last_session"])
+        self.last_total, self.last_total_at = last_total, last_at
+        self.last_session = session
+        return snapshots
+
+
+def _local_date_time(dt):
+    """Split an aware datetime into local date and time, as WorkSession stores them.
+    Local means the current time zone: the user's, within requests. Elsewhere, use
+    timezone.override(user_timezone(user))."""
+    local = timezone.localtime(dt)
+    return local.date(), local.time()
+
 
 class WorkSessionQuerySet(models.QuerySet):
     def user_summary_date_range(self, user, start: str, end: str):
@@ -81,6 +233,84 @@ class WorkSessionQuerySet(models.QuerySet):
             stats["duration"] = int(stats["duration"].total_seconds())
         return stats
 
+    def project_summary(self, user, projects=None):
+        """Return statistics for each of the user's projects, computed in a single
+        grouped query. The result is a dict keyed by project id (None collects sessions
+        not assigned to a project). Pass `projects` to limit it to those projects.
+        Duration is in seconds; words per hour counts only the sessions with a duration,
+        and is None when no time was recorded.
+
+            {
+                12: {
+                    'sessions': 31,
+                    'wordcount': 40210,
+                    'duration': 101400,
+                    'first_date': datetime.date(2023, 1, 2),
+                    'last_date': datetime.date(2023, 2, 11),
+                    'words_per_hour': 1427,
+                }
+            }
+        """
+        sessions = self.filter(user=user)
+        archives = SessionArchive.objects.filter(user=user)
+        if projects is not None:
+            sessions = sessions.filter(project__in=projects)
+            archives = archives.filter(project__in=projects)
+        rows = (
+            sessions.order_by()
+            .values("project")
+            .annotate(
+                # Before wordcount and duration, which shadow the fields
+                timed_wordcount=models.Sum(
+                    "wordcount", filter=models.Q(duration__isnull=False)
+                ),
+                sessions=models.Count("id"),
+                wordcount=models.Sum("wordcount"),
+                duration=models.Sum("duration"),
+                first_date=models.Min("startdate"),
+                last_date=models.Max(Coalesce("enddate", "startdate")),
+            )
+        )
+        # Sessions moved to cold storage are counted from their yearly aggregates.
+        archived_rows = (
+            archives.order_by()
+            .values("project")
+            .annotate(
+                sessions=models.Sum("sessions"),
+                wordcount=models.Sum("wordcount"),
+                timed_wordcount=models.Sum("timed_wordcount"),
+                duration=models.Sum("duration"),
+                first_date=models.Min("first_date"),
+                last_date=models.Max("last_date"),
+            )
+        )
+        summary = {}
+        for row in [*archived_rows, *rows]:
+            project = row.pop("project")
+            row["wordcount"] = row["wordcount"] or 0
+            row["timed_wordcount"] = row["timed_wordcount"] or 0
+            row["duration"] = (
+                int(row["duration"].total_seconds()) if row["duration"] else 0
+            )
+            stats = summary.get(project)
+            if stats is None:
+                summary[project] = row
+                continue
+            stats["sessions"] += row["sessions"]
+            stats["wordcount"] += row["wordcount"]
+            stats["timed_wordcount"] += row["timed_wordcount"]
+            stats["duration"] += row["duration"]
+            stats["first_date"] = min(stats["first_date"], row["first_date"])
+            stats["last_date"] = max(stats["last_date"], row["last_date"])
+        for stats in summary.values():
+            timed_wordcount = stats.pop("timed_wordcount")
+            stats["words_per_hour"] = (
+                round(timed_wordcount * 3600 / stats["duration"])
+                if stats["duration"]
+                else None
+            )
+        return summary
+
     def user_summary(self, user):
         """Return a data structure summarizing statistics for the user.
 
@@ -100,8 +330,9 @@ class WorkSessionQuerySet(models.QuerySet):
                 'all_duration': 6600
             }
         """
-        # TODO: Cache user summary until end of calendar day
-        today = datetime.now().date()
+        # Dates are stored in the user's time zone, so the windows are plain date
+        # ranges on the indexed startdate, once "today" is known in that zone.
+        today = timezone.localdate()
         seven_days_ago = today - timedelta(days=7)
         seven_days = models.Q(startdate__lt=today, startdate__gte=seven_days_ago)
         thirty_days_ago = today - timedelta(days=30)
@@ -137,6 +368,22 @@ class WorkSessionQuerySet(models.QuerySet):
             all_wordcount=models.Sum("wordcount", filter=all),
             all_duration=models.Sum("duration", filter=all),
         )
+        # Archived sessions are always older than the 7 and 30 day windows, so they
+        # only count toward the all time totals.
+        archived = SessionArchive.objects.filter(user=user).aggregate(
+            sessions=models.Sum("sessions"),
+            wordcount=models.Sum("wordcount"),
+            duration=models.Sum("duration"),
+        )
+        if archived["sessions"]:
+            stats["all_sessions"] += archived["sessions"]
+            stats["all_wordcount"] = (stats["all_wordcount"] or 0) + (
+                archived["wordcount"] or 0
+            )
+            if archived["duration"]:
+                stats["all_duration"] = (
+                    stats["all_duration"] or timedelta()
+                ) + archived["duration"]
         if stats["all_duration"]:
             stats["all_duration"] = int(stats["all_duration"].total_seconds())
         if stats["sevenday_duration"]:
@@ -202,3 +449,160 @@ class WorkSession(models.Model):
 
     def __str__(self):
         return f"{self.startdate.isoformat()} ({self.user.username})"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the project, so a session moved between projects invalidates both
+        instance._loaded_project_id = instance.__dict__.get("project_id")
+        return instance
+
+
+class SessionArchive(models.Model):
+    """
+    Totals for a year of a user's WorkSessions on one project, whose rows have been
+    moved out of the WorkSession table into a compressed archive file. See
+    wordtracker.archive. Statistics combine these with the live sessions.
+    """
+
+    class Meta:
+        verbose_name = _("session archive")
+        verbose_name_plural = _("session archives")
+        constraints = [
+            models.UniqueConstraint(
+                fields=("user", "year", "project"), name="unique_archive_year"
+            )
+        ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, verbose_name=_("user"), on_delete=models.PROTECT
+    )
+    year = models.PositiveSmallIntegerField(_("year"))
+    project = models.ForeignKey(
+        Project,
+        verbose_name=_("project"),
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+    )
+    sessions = models.PositiveIntegerField(_("sessions"), default=0)
+    wordcount = models.IntegerField(_("word count"), default=0)
+    duration = models.DurationField(_("duration"), default=timedelta)
+    # Words written in the sessions that recorded a duration, for words per hour
+    timed_wordcount = models.IntegerField(_("timed word count"), default=0)
+    first_date = models.DateField(_("first date"))
+    last_date = models.DateField(_("last date"))
+
+    def __str__(self):
+        return f"{self.year} {self.project or '-'} ({self.user})"
+
+
+class WordCountSnapshotQuerySet(models.QuerySet):
+    def daily_progress(self, project, days=14):
+        """Return the words added to the project on each of the last `days` days,
+        including today, that had any change. Days are bucketed by the database in the
+        current time zone, in one grouped query over the project's recent snapshots.
+
+            [{'day': datetime.date(2024, 3, 1), 'words': 812, 'total': 40210}, ...]
+
+        `total` is the highest total recorded that day.
+        """
+        tz = timezone.get_current_timezone()
+        start = timezone.localdate() - timedelta(days=days - 1)
+        return (
+            self.filter(
+                project=project,
+                recorded_at__gte=datetime.combine(start, time(), tzinfo=tz),
+            )
+            .order_by()
+            .values(day=TruncDate("recorded_at", tzinfo=tz))
+            .annotate(words=models.Sum("delta"), total=models.Max("total"))
+            .order_by("day")
+        )
+
+
+class WordCountSnapshot(models.Model):
+    """
+    The total word count of a project's manuscript at a point in time, as reported by
+    the user or an editor plugin. `delta` is the change since the previous snapshot.
+    See Project.record_totals()
+    """
+
+    class Meta:
+        verbose_name = _("word count snapshot")
+        verbose_name_plural = _("word count snapshots")
+        indexes = [
+            models.Index(fields=("project", "recorded_at"), name="snapshot_project_at")
+        ]
+        ordering = ("project", "recorded_at")
+
+    project = models.ForeignKey(
+        Project,
+        verbose_name=_("project"),
+        on_delete=models.CASCADE,
+        related_name="snapshots",
+    )
+    recorded_at = models.DateTimeField(_("recorded at"))
+    total = models.IntegerField(_("total word count"))
+    delta = models.IntegerField(_("change in word count"))
+    session = models.ForeignKey(
+        WorkSession,
+        verbose_name=_("work session"),
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+    )
+
+    objects = WordCountSnapshotQuerySet.as_manager()
+
+    def __str__(self):
+        return f"{self.project} {self.total} ({self.recorded_at.isoformat()})"
+
+
+def default_timezone():
+    return settings.TIME_ZONE
+
+
+def validate_timezone(value):
+    if value not in zoneinfo.available_timezones():
+        raise ValidationError(_("Unknown time zone %(value)s"), params={"value": value})
+
+
+class Profile(models.Model):
+    """
+    A user's wordtracker preferences. Their time zone decides which day a session falls
+    on, the bounds of the 7 and 30 day windows, and when cached daily figures expire.
+    Sessions store local dates and times, so changing it does not move past sessions.
+    """
+
+    class Meta:
+        verbose_name = _("profile")
+        verbose_name_plural = _("profiles")
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        verbose_name=_("user"),
+        on_delete=models.CASCADE,
+        related_name="wordtracker_profile",
+    )
+    timezone = models.CharField(
+        _("time zone"),
+        max_length=64,
+        default=default_timezone,
+        validators=[validate_timezone],
+    )
+    # Changed by every write to the user's sessions and projects. See data_version()
+    data_version = models.PositiveBigIntegerField(
+        _("data version"), default=0, editable=False
+    )
+
+    def __str__(self):
+        return str(self.user)
+
+
+def user_timezone(user) -> zoneinfo.ZoneInfo:
+    """Return the user's time zone, or the site's if they haven't chosen one."""
+    name = (
+        Profile.objects.filter(user=user).values_list("timezone", flat=True).first()
+    )
+    return zoneinfo.ZoneInfo(name or settings.TIME_ZONE)
@@ -0,0 +1,143 @@
+"""
+Per-user token bucket rate limiting for wordtracker views.
+
+Limits are DEFAULT_RATE_LIMITS, a dict of scope name to a rate like ``"30/m"``
+(requests per second, minute, hour or day), with any scopes in
+``settings.WORDTRACKER_RATE_LIMITS`` overriding them. Unsafe requests are
+limited by the scope of the view; safe (GET/HEAD) requests share the ``"read"`` limit.
+A rate of None disables limiting for that scope.
+
+Buckets live in the default cache so that all web workers share them. If the cache is a
+DummyCache or is unavailable, buckets fall back to process memory. Updates are not
+atomic, so under heavy contention a few extra requests may slip through; this is a
+guard against runaway clients, not an accounting system.
+"""
+import logging
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.dummy import DummyCache
+from django.http import HttpResponse
+from django.utils.translation import gettext as _
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+DEFAULT_RATE_LIMITS = {
+    "read": "120/m",
+    "log_work": "30/m",
+    "session_timer": "6/m",
+    "record_total": "12/m",
+    "backfill_totals": "10/h",
+    "archive": "6/h",
+    "settings": "10/m",
+}
+
+_local_buckets = {}
+_local_lock = threading.Lock()
+
+
+def parse_rate(rate: str) -> tuple[int, int]:
+    """Parse "30/m" into (30, 60): number of requests allowed per period seconds."""
+    count, _, period = rate.partition("/")
+    return int(count), PERIODS[period.strip()[0].lower()]
+
+
+def get_rate(scope: str):
+    limits = {**DEFAULT_RATE_LIMITS, **getattr(settings, "WORDTRACKER_RATE_LIMITS", {})}
+    rate = limits.get(scope)
+    return parse_rate(rate) if rate else None
+
+
+def _load(key):
+    if not isinstance(cache, DummyCache):
+        try:
+            return cache.get(key)
+        except Exception:
+            logger.warning("Rate limit cache unavailable, using local memory")
+    with _local_lock:
+        bucket = _local_buckets.get(key)
+    return bucket[0] if bucket and bucket[1] > time.time() else None
+
+
+def _store(key, state, timeout):
+    if not isinstance(cache, DummyCache):
+        try:
+            cache.set(key, state, timeout)
+            return
+        except Exception:
+            pass
+    now = time.time()
+    with _local_lock:
+        if len(_local_buckets) > 10000:
+            for stale in [k for k, v in _local_buckets.items() if v[1] <= now]:
+                del _local_buckets[stale]
+        _local_buckets[key] = (state, now + timeout)
+
+
+def take_token(key: str, capacity: int, period: int) -> float:
+    """Take a token from the bucket at `key`, which holds at most `capacity` tokens
+    and refills completely over `period` seconds.
+
+    Returns 0 if a token was available, else the seconds until one will be.
+    """
+    now = time.time()
+    state = _load(key)
+    tokens, stamp = state if state else (capacity, now)
+    tokens = min(capacity, tokens + (now - stamp) * capacity / period)
+    if tokens < 1:
+        return (1 - tokens) * period / capacity
+    _store(key, (tokens - 1, now), period)
+    return 0
+
+
+def check_rate(request, scope: str):
+    """Return a 429 response if the request exceeds its limit, else None."""
+    if request.method in SAFE_METHODS:
+        scope = "read"
+    rate = get_rate(scope)
+    if rate is None:
+        return None
+    if request.user.is_authenticated:
+        ident = f"user:{request.user.pk}"
+    else:
+        ident = f"ip:{request.META.get('REMOTE_ADDR')}"
+    wait = take_token(f"wordtracker:ratelimit:{scope}:{ident}", *rate)
+    if not wait:
+        return None
+    response = HttpResponse(
+        _("Too many requests. Please wait a moment and try again."),
+        status=429,
+        content_type="text/plain",
+    )
+    response.headers["Retry-After"] = str(int(wait) + 1)
+    return response
+
+
+def ratelimit(scope: str):
+    """Decorator for function views, applying the limit for `scope`."""
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            return check_rate(request, scope) or view(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class RateLimitMixin:
+    """Mixin for class-based views, applying the limit for `ratelimit_scope`. List it
+    after LoginRequiredMixin so that limits are keyed on the logged in user."""
+
+    ratelimit_scope = None
+
+    def dispatch(self, request, *args, **kwargs):
+        return check_rate(request, self.ratelimit_scope) or super().dispatch(
+            request, *args, **kwargs
+        )
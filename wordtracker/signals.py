@@ -0,0 +1,40 @@
+from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .middleware import SESSION_KEY
+from .models import (
+    Project,
+    WorkSession,
+    bump_data_version,
+    invalidate_forecasts,
+    user_timezone,
+)
+
+
+@receiver(user_logged_in)
+def remember_timezone(sender, request, user, **kwargs):
+    """Look up the user's time zone as they log in, while the session is being written
+    anyway, so TimezoneMiddleware needn't."""
+    if request is not None and hasattr(request, "session"):
+        request.session[SESSION_KEY] = user_timezone(user).key
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def project_changed(sender, instance, **kwargs):
+    # The target word count and last total feed the forecast
+    invalidate_forecasts(instance.pk)
+    bump_data_version(instance.user_id)
+
+
+@receiver(post_save, sender=WorkSession)
+@receiver(post_delete, sender=WorkSession)
+def session_changed(sender, instance, **kwargs):
+    """Also runs for each session deleted through a queryset, as by the admin's bulk
+    delete. Bulk creates and updates send no signals: see invalidate_forecasts()."""
+    invalidate_forecasts(
+        instance.project_id, getattr(instance, "_loaded_project_id", None)
+    )
+    bump_data_version(instance.user_id)
+    instance._loaded_project_id = instance.project_id
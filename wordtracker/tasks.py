@@ -0,0 +1,60 @@
+"""Background tasks for wordtracker. See writertools.tasks"""
+import csv
+from datetime import date, datetime
+
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from writertools.tasks import task
+
+from .archive import archive_sessions, restore_sessions
+from .models import Project, user_timezone
+
+
+def parse_totals(lines):
+    """Parse 'timestamp,total' CSV lines into a list of (datetime, total) points.
+    Naive timestamps are taken to be in the current time zone. Blank lines and lines
+    starting with # are skipped. Raises ValueError for malformed lines."""
+    points = []
+    for lineno, row in enumerate(csv.reader(lines), start=1):
+        if not row or row[0].startswith("#"):
+            continue
+        try:
+            at = datetime.fromisoformat(row[0].strip())
+            total = int(row[1])
+        except (IndexError, ValueError):
+            raise ValueError(f"Line {lineno}: expected 'timestamp,total'")
+        if timezone.is_naive(at):
+            at = timezone.make_aware(at)
+        points.append((at, total))
+    return points
+
+
+@task
+def backfill_totals(job, project_id, rows):
+    """Record a series of [isoformat timestamp, total] rows for a project."""
+    project = Project.objects.get(pk=project_id)
+    points = [(datetime.fromisoformat(at), total) for at, total in rows]
+    job.progress(0, len(points))
+    # Sessions are dated in the owner's time zone, as they would be in a request
+    with timezone.override(user_timezone(project.user_id)):
+        snapshots = project.record_totals(points)
+    job.progress(len(points), len(points))
+    return {"snapshots": len(snapshots), "total": project.last_total}
+
+
+@task
+def archive_user_sessions(job, user_id, before):
+    """Archive a user's sessions older than the isoformat date `before`."""
+    user = get_user_model().objects.get(pk=user_id)
+    with timezone.override(user_timezone(user)):
+        count = archive_sessions(
+            user, date.fromisoformat(before), progress=job.progress
+        )
+    return {"archived": count}
+
+
+@task
+def restore_user_sessions(job, user_id, year):
+    user = get_user_model().objects.get(pk=user_id)
+    return {"restored": restore_sessions(user, year)}
@@ -0,0 +1,12 @@
+from django import template
+
+register = template.Library()
+
+
+@register.filter
+def hours_minutes(seconds):
+    """Format a duration in seconds as H:MM."""
+    if seconds is None or seconds == "":
+        return ""
+    minutes = int(seconds) // 60
+    return f"{minutes // 60}:{minutes % 60:02d}"
@@ -1,6 +1,23 @@
-from django.test import TestCase
+import tempfile
+import time
+import zoneinfo
+from array import array
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import RequestFactory, TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
+
+from . import analytics
+from .archive import archive_sessions, read_archive, restore_sessions
+from .forecast import project_forecasts
+from .models import Profile, Project, SessionArchive, WordCountSnapshot, WorkSession
+from .ratelimit import check_rate, parse_rate
 
 
 class AdminSmokeTest(TestCase):
@@ -29,3 +46,501 @@ class AdminSmokeTest(TestCase):
             with self.subTest(view=view):
                 resp = self.client.get(reverse(view))
                 self.assertEqual(resp.status_code, 200)
+
+
+class RateLimitTest(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.user = get_user_model().objects.create(username="writer")
+        return super().setUpTestData()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate("30/m"), (30, 60))
+        self.assertEqual(parse_rate("1000/day"), (1000, 86400))
+
+    @override_settings(WORDTRACKER_RATE_LIMITS={"session_timer": "2/m"})
+    def test_session_timer_throttled(self):
+        self.client.force_login(self.user)
+        url = reverse("wordtracker:session_timer")
+        for _ in range(2):
+            self.assertEqual(self.client.post(url).status_code, 302)
+        resp = self.client.post(url)
+        self.assertEqual(resp.status_code, 429)
+        self.assertIn("Retry-After", resp)
+        self.assertEqual(WorkSession.objects.filter(user=self.user).count(), 2)
+        # Reads are limited separately
+        self.assertEqual(self.client.get(reverse("wordtracker:dashboard")).status_code, 200)
+
+    @override_settings(WORDTRACKER_RATE_LIMITS={"log_work": None})
+    def test_limit_can_be_disabled(self):
+        request = RequestFactory().post("/")
+        request.user = self.user
+        for _ in range(50):
+            self.assertIsNone(check_rate(request, "log_work"))
+
+    def test_overhead(self):
+        request = RequestFactory().post("/")
+        request.user = self.user
+        start = time.perf_counter()
+        for _ in range(200):
+            check_rate(request, "log_work")
+            check_rate(request, "session_timer")
+        self.assertLess((time.perf_counter() - start) / 400, 0.001)
+
+
+class WordCountSnapshotTest(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.user = get_user_model().objects.create(username="writer")
+        cls.project = Project.objects.create(user=cls.user, name="Novel", slug="novel")
+        return super().setUpTestData()
+
+    def at(self, minutes):
+        start = datetime(2024, 3, 1, 14, 0, tzinfo=dt_timezone.utc)
+        return start + timedelta(minutes=minutes)
+
+    def test_backfill_series(self):
+        snapshots = self.project.record_totals(
+            [
+                (self.at(0), 1000),
+                (self.at(5), 1100),
+                (self.at(10), 1100),  # unchanged, not stored
+                (self.at(20), 1150),
+                (self.at(180), 1170),  # after the gap, a new session
+            ]
+        )
+        self.assertEqual([s.delta for s in snapshots], [0, 100, 50, 20])
+        first, second = WorkSession.objects.filter(project=self.project).order_by(
+            "startdate", "starttime"
+        )
+        self.assertEqual(first.wordcount, 150)
+        self.assertEqual(first.duration, timedelta(minutes=20))
+        self.assertEqual(second.wordcount, 20)
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.last_total, 1170)
+        self.assertEqual(self.project.last_session, second)
+
+    def test_live_update_is_constant_cost(self):
+        self.project.record_totals(
+            [(self.at(i), 1000 + i * 10) for i in range(0, 100, 2)]
+        )
+        with self.assertNumQueries(9):
+            self.project.record_totals([(self.at(101), 2000)])
+        session = self.project.last_session
+        session.refresh_from_db()
+        self.assertEqual(session.wordcount, 1000)
+        self.assertEqual(WorkSession.objects.count(), 1)
+
+    def test_totals_must_move_forward(self):
+        self.project.record_totals([(self.at(10), 500)])
+        with self.assertRaises(ValueError):
+            self.project.record_totals([(self.at(5), 600)])
+        self.assertEqual(WordCountSnapshot.objects.count(), 1)
+
+    def test_record_total_view(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        url = reverse("wordtracker:record_total", args=[self.project.pk])
+        self.assertEqual(self.client.post(url, {"total": 100}).json()["delta"], 0)
+        resp = self.client.post(url, {"total": 250})
+        self.assertEqual(resp.json()["delta"], 150)
+        self.assertEqual(self.client.post(url, {"total": -1}).status_code, 400)
+        other = get_user_model().objects.create(username="other")
+        self.client.force_login(other)
+        self.assertEqual(self.client.post(url, {"total": 1}).status_code, 404)
+
+
+class ProjectSummaryTest(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.user = get_user_model().objects.create(username="writer")
+        cls.novel = Project.objects.create(user=cls.user, name="Novel", slug="novel")
+        cls.story = Project.objects.create(user=cls.user, name="Story", slug="story")
+        for day, words, minutes in ((1, 1000, 60), (3, 500, 30), (9, 600, 0)):
+            WorkSession.objects.create(
+                user=cls.user,
+                project=cls.novel,
+                startdate=date(2024, 1, day),
+                wordcount=words,
+                duration=timedelta(minutes=minutes) if minutes else None,
+            )
+        return super().setUpTestData()
+
+    def test_project_summary(self):
+        with self.assertNumQueries(2):
+            summary = WorkSession.objects.project_summary(self.user)
+        self.assertEqual(
+            summary,
+            {
+                self.novel.id: {
+                    "sessions": 3,
+                    "wordcount": 2100,
+                    "duration": 5400,
+                    "first_date": date(2024, 1, 1),
+                    "last_date": date(2024, 1, 9),
+                    "words_per_hour": 1000,
+                }
+            },
+        )
+
+    def test_project_pages(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        resp = self.client.get(reverse("wordtracker:project_list"))
+        self.assertContains(resp, "Story")
+        self.assertContains(resp, "1:30")
+        resp = self.client.get(self.novel.get_absolute_url())
+        self.assertEqual(resp.context["stats"]["sessions"], 3)
+        self.assertEqual(len(resp.context["recent_sessions"]), 3)
+
+
+class ArchiveTest(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.user = get_user_model().objects.create(username="writer")
+        cls.novel = Project.objects.create(user=cls.user, name="Novel", slug="novel")
+        for year in (2020, 2021):
+            for month in (1, 6):
+                WorkSession.objects.create(
+                    user=cls.user,
+                    project=cls.novel,
+                    startdate=date(year, month, 2),
+                    wordcount=100 * month,
+                    duration=timedelta(minutes=30),
+                )
+        return super().setUpTestData()
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = override_settings(MEDIA_ROOT=media.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_archive_keeps_statistics(self):
+        # A session without a duration doesn't count towards words per hour
+        WorkSession.objects.create(
+            user=self.user, project=self.novel, startdate=date(2020, 9, 2), wordcount=50
+        )
+        before = WorkSession.objects.project_summary(self.user)
+        all_time = WorkSession.objects.user_summary(self.user)
+        self.assertEqual(archive_sessions(self.user, date(2021, 3, 1)), 4)
+        self.assertEqual(WorkSession.objects.count(), 1)
+        self.assertEqual(SessionArchive.objects.filter(year=2020).get().sessions, 3)
+        self.assertEqual(WorkSession.objects.project_summary(self.user), before)
+        self.assertEqual(WorkSession.objects.user_summary(self.user), all_time)
+        # Archiving again merges into the same files and totals
+        archive_sessions(self.user, date(2022, 1, 1))
+        self.assertEqual(SessionArchive.objects.get(year=2021).wordcount, 700)
+        self.assertEqual(WorkSession.objects.project_summary(self.user), before)
+
+    def test_deleted_project(self):
+        archive_sessions(self.user, date(2021, 3, 1))
+        self.novel.delete()
+        WorkSession.objects.create(user=self.user, startdate=date(2020, 9, 1))
+        archive_sessions(self.user, date(2021, 3, 1))
+        archive = SessionArchive.objects.get(year=2020)
+        self.assertIsNone(archive.project_id)
+        self.assertEqual(archive.sessions, 3)
+
+    def test_restore(self):
+        ids = set(WorkSession.objects.values_list("id", flat=True))
+        archive_sessions(self.user, date(2022, 1, 1))
+        self.assertEqual(restore_sessions(self.user, 2020), 2)
+        restore_sessions(self.user, 2021)
+        self.assertEqual(set(WorkSession.objects.values_list("id", flat=True)), ids)
+        self.assertFalse(SessionArchive.objects.exists())
+        session = WorkSession.objects.get(startdate=date(2020, 6, 2))
+        self.assertEqual(session.duration, timedelta(minutes=30))
+        self.assertEqual(session.project, self.novel)
+
+    def test_failed_write_keeps_archived_rows(self):
+        archive_sessions(self.user, date(2020, 3, 1))
+        WorkSession.objects.create(user=self.user, startdate=date(2020, 9, 1))
+        save = default_storage.save
+
+        def fail_final_save(name, content, **kwargs):
+            if not name.endswith(".new"):
+                raise OSError("disk full")
+            return save(name, content, **kwargs)
+
+        with mock.patch.object(default_storage, "save", fail_final_save):
+            with self.assertRaises(OSError):
+                archive_sessions(self.user, date(2021, 1, 1))
+        # Nothing is lost: the rows are in the pending file, or still live
+        self.assertEqual(len(read_archive(self.user, 2020)), 3)
+        self.assertEqual(WorkSession.objects.filter(startdate__year=2020).count(), 2)
+        self.assertEqual(archive_sessions(self.user, date(2021, 1, 1)), 2)
+        self.assertEqual(len(read_archive(self.user, 2020)), 3)
+        self.assertEqual(restore_sessions(self.user, 2020), 3)
+
+    def test_recent_sessions_stay_live(self):
+        with self.assertRaises(ValueError):
+            archive_sessions(self.user, date.today())
+
+    @override_settings(TASKS_EXECUTOR="inline")
+    def test_archive_and_restore_in_background(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        archive = reverse("wordtracker:archive_sessions")
+        resp = self.client.post(archive, {"before": date.today().isoformat()})
+        self.assertEqual(resp.status_code, 400)
+        resp = self.client.post(archive, {"before": "2021-03-01"})
+        self.assertEqual(resp.status_code, 202)
+        status = self.client.get(resp.json()["status_url"]).json()
+        self.assertEqual(status["result"], {"archived": 3})
+
+        restore = reverse("wordtracker:restore_sessions", args=[2021])
+        self.assertEqual(self.client.post(restore).status_code, 202)
+        self.assertEqual(self.client.post(restore).status_code, 404)
+        self.assertEqual(WorkSession.objects.filter(startdate__year=2021).count(), 2)
+
+
+@override_settings(TASKS_EXECUTOR="inline")
+class BackfillUploadTest(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.user = get_user_model().objects.create(username="writer")
+        cls.project = Project.objects.create(user=cls.user, name="Novel", slug="novel")
+        return super().setUpTestData()
+
+    def test_upload_runs_in_background(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        csv = b"# history\n2024-01-01T10:00:00,100\n2024-01-01T10:10:00,400\n"
+        resp = self.client.post(
+            reverse("wordtracker:backfill_totals", args=[self.project.pk]),
+            {"file": SimpleUploadedFile("totals.csv", csv)},
+        )
+        self.assertEqual(resp.status_code, 202)
+        status = self.client.get(resp.json()["status_url"]).json()
+        self.assertEqual(status["result"], {"snapshots": 2, "total": 400})
+        self.assertEqual(WorkSession.objects.get(project=self.project).wordcount, 300)
+
+    def test_bad_csv_rejected(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        resp = self.client.post(
+            reverse("wordtracker:backfill_totals", args=[self.project.pk]),
+            {"file": SimpleUploadedFile("totals.csv", b"yesterday,lots\n")},
+        )
+        self.assertEqual(resp.status_code, 400)
+
+
+class AnalyticsTest(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="writer")
+        self.today = date(2024, 5, 31)
+        for day, minutes, words in [
+            (1, 30, 600),
+            (1, None, 100),
+            (3, 60, 900),
+            (10, 90, 900),
+            (30, 120, 3000),
+        ]:
+            WorkSession.objects.create(
+                user=self.user,
+                startdate=self.today - timedelta(days=day),
+                duration=timedelta(minutes=minutes) if minutes else None,
+                wordcount=words,
+            )
+        # Today's sessions are excluded
+        WorkSession.objects.create(user=self.user, startdate=self.today, wordcount=5)
+
+    def check_patterns(self):
+        patterns = analytics.session_patterns(self.user, today=self.today)
+        self.assertEqual(patterns["sessions"], 5)
+        self.assertEqual(patterns["duration"][50], 75 * 60)
+        self.assertEqual(patterns["duration"][25], 52.5 * 60)
+        self.assertEqual(patterns["words_per_minute"][50], 17.5)
+        self.assertAlmostEqual(patterns["sevenday_daily_words"], 1600 / 7)
+        self.assertAlmostEqual(patterns["thirtyday_daily_words"], 5500 / 30)
+
+    def test_session_patterns(self):
+        self.check_patterns()
+
+    def test_session_patterns_without_numpy(self):
+        with mock.patch.object(analytics, "np", None):
+            self.check_patterns()
+
+    def test_rolling_mean(self):
+        self.assertEqual(
+            list(analytics.rolling_mean(array("q", [2, 4, 6, 8]), 2)), [2, 3, 5, 7]
+        )
+        with mock.patch.object(analytics, "np", None):
+            self.assertEqual(
+                analytics.rolling_mean(array("q", [2, 4, 6, 8]), 3), [2, 3, 4, 6]
+            )
+
+    def test_columns_are_compact(self):
+        columns = analytics.SessionColumns.load(self.user)
+        self.assertEqual(len(columns), 6)
+        self.assertEqual(columns.nbytes, 6 * 3 * columns.day.itemsize)
+
+    def test_stats_page(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("wordtracker:view_stats"))
+        self.assertContains(response, "Habits")
+
+
+class ForecastTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(username="writer")
+        self.project = Project.objects.create(
+            user=self.user, name="Novel", slug="novel", target_wordcount=10000
+        )
+        self.today = timezone.localdate()
+        sessions = [
+            WorkSession(
+                user=self.user,
+                project=self.project,
+                startdate=self.today - timedelta(days=n),
+                wordcount=100,
+            )
+            for n in range(1, 31)
+        ]
+        # Old history doesn't change the queries needed
+        sessions += [
+            WorkSession(
+                user=self.user,
+                project=self.project,
+                startdate=self.today - timedelta(days=400 + n),
+                wordcount=20,
+            )
+            for n in range(100)
+        ]
+        WorkSession.objects.bulk_create(sessions)
+
+    def test_forecast(self):
+        with self.assertNumQueries(3):
+            forecast = project_forecasts([self.project])[self.project.pk]
+        self.assertEqual(forecast["written"], 5000)
+        self.assertEqual(forecast["remaining"], 5000)
+        self.assertEqual(forecast["sevenday_rate"], 100)
+        self.assertAlmostEqual(forecast["trend"], 0)
+        self.assertEqual(forecast["finish_date"], self.today + timedelta(days=50))
+
+    def test_trend(self):
+        WorkSession.objects.filter(project=self.project).delete()
+        self.project.last_total = 9000
+        WorkSession.objects.bulk_create(
+            WorkSession(
+                user=self.user,
+                project=self.project,
+                startdate=self.today - timedelta(days=30 - n),
+                wordcount=10 * n,
+            )
+            for n in range(30)
+        )
+        forecast = project_forecasts([self.project])[self.project.pk]
+        self.assertAlmostEqual(forecast["trend"], 10)
+        self.assertAlmostEqual(forecast["pace"], 300)
+        self.assertEqual(forecast["written"], 9000)
+        self.assertEqual(forecast["finish_date"], self.today + timedelta(days=4))
+
+    def test_cached_until_session_written(self):
+        project_forecasts([self.project])
+        with self.assertNumQueries(0):
+            project_forecasts([self.project])
+        with self.captureOnCommitCallbacks(execute=True):
+            WorkSession.objects.create(
+                user=self.user,
+                project=self.project,
+                startdate=self.today - timedelta(days=1),
+                wordcount=3000,
+            )
+        forecast = project_forecasts([self.project])[self.project.pk]
+        self.assertEqual(forecast["written"], 8000)
+
+    def test_cached_until_sessions_deleted_in_bulk(self):
+        week_ago = self.today - timedelta(days=7)
+        project_forecasts([self.project])
+        version = Profile.objects.get_or_create(user=self.user)[0].data_version
+        with self.captureOnCommitCallbacks(execute=True):
+            WorkSession.objects.filter(startdate__gte=week_ago).delete()
+        forecast = project_forecasts([self.project])[self.project.pk]
+        self.assertEqual(forecast["sevenday_rate"], 0)
+        profile = Profile.objects.get(user=self.user)
+        self.assertGreater(profile.data_version, version)
+
+    def test_cached_until_target_changed(self):
+        project_forecasts([self.project])
+        self.project.target_wordcount = 8000
+        with self.captureOnCommitCallbacks(execute=True):
+            self.project.save()
+        project = Project.objects.get(pk=self.project.pk)
+        forecast = project_forecasts([project])[project.pk]
+        self.assertEqual(forecast["remaining"], 3000)
+        self.assertEqual(forecast["finish_date"], self.today + timedelta(days=30))
+
+    def test_dashboard(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("wordtracker:dashboard"))
+        self.assertContains(response, "At this pace")
+
+
+@override_settings(TIME_ZONE="UTC")
+class TimezoneTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(username="writer")
+        # UTC-11 and UTC+14 are never on the same date
+        Profile.objects.create(user=self.user, timezone="Pacific/Pago_Pago")
+        self.client.force_login(self.user)
+
+    def local_today(self, name="Pacific/Pago_Pago"):
+        return timezone.localdate(timezone=zoneinfo.ZoneInfo(name))
+
+    def test_session_dated_in_user_timezone(self):
+        self.client.post(reverse("wordtracker:session_timer"))
+        session = WorkSession.objects.get(user=self.user)
+        self.assertEqual(session.startdate, self.local_today())
+
+    def test_summary_windows_use_user_timezone(self):
+        WorkSession.objects.create(
+            user=self.user,
+            startdate=self.local_today() - timedelta(days=1),
+            wordcount=500,
+        )
+        response = self.client.get(reverse("wordtracker:view_stats"))
+        self.assertEqual(response.context["user_summary"]["sevenday_wordcount"], 500)
+        self.assertEqual(response.context["patterns"]["streak"], 1)
+
+    def test_settings_change_timezone(self):
+        self.client.get(reverse("wordtracker:dashboard"))
+        response = self.client.post(
+            reverse("wordtracker:settings"), {"timezone": "Pacific/Kiritimati"}
+        )
+        self.assertRedirects(response, reverse("wordtracker:dashboard"))
+        self.assertEqual(
+            Profile.objects.get(user=self.user).timezone, "Pacific/Kiritimati"
+        )
+        self.client.post(reverse("wordtracker:session_timer"))
+        session = WorkSession.objects.get(user=self.user)
+        self.assertEqual(session.startdate, self.local_today("Pacific/Kiritimati"))
+
+    def test_invalid_timezone(self):
+        response = self.client.post(
+            reverse("wordtracker:settings"), {"timezone": "Mars/Olympus_Mons"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            Profile.objects.get(user=self.user).timezone, "Pacific/Pago_Pago"
+        )
+
+    def test_snapshots_bucketed_by_local_day(self):
+        project = Project.objects.create(user=self.user, name="Novel", slug="novel")
+        now = timezone.now()
+        project.record_totals([(now - timedelta(minutes=5), 100), (now, 150)])
+        tz = zoneinfo.ZoneInfo("Pacific/Pago_Pago")
+        with timezone.override(tz):
+            with self.assertNumQueries(1):
+                days = list(WordCountSnapshot.objects.daily_progress(project))
+        self.assertEqual(
+            days,
+            [{"day": timezone.localdate(now, tz), "words": 50, "total": 150}],
+        )
@@ -8,5 +8,20 @@ urlpatterns = [
     path("stats/", views.WorkSessionListView.as_view(), name="view_stats"),
     path("session/", views.session_timer, name="session_timer"),
     path("session/<int:ws_id>/", views.session_timer, name="session_timer"),
+    path("projects/", views.ProjectListView.as_view(), name="project_list"),
+    path("project/<int:pk>/", views.ProjectDetailView.as_view(), name="project_detail"),
+    path("project/<int:pk>/total/", views.record_total, name="record_total"),
+    path(
+        "project/<int:pk>/backfill/",
+        views.backfill_totals_upload,
+        name="backfill_totals",
+    ),
+    path("archive/", views.archive_old_sessions, name="archive_sessions"),
+    path(
+        "archive/<int:year>/restore/",
+        views.restore_archived_sessions,
+        name="restore_sessions",
+    ),
+    path("settings/", views.ProfileUpdateView.as_view(), name="settings"),
     path("", views.DashboardView.as_view(), name="dashboard"),
 ]
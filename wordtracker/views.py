@@ -1,28 +1,65 @@
 import logging
-from datetime import datetime
 
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.http import HttpResponseRedirect
+from django.http import HttpResponseRedirect, JsonResponse
 from django.shortcuts import get_object_or_404, render
 from django.urls import reverse, reverse_lazy
 from django.utils import timezone
 from django.utils.translation import gettext as _
-from django.views.generic import ListView, TemplateView
-from django.views.generic.edit import CreateView
+from django.views.decorators.http import require_POST
+from django.views.generic import DetailView, ListView, TemplateView
+from django.views.generic.edit import CreateView, UpdateView
 
-from .forms import LogWorkForm
-from .models import Project, ProjectStatus, WorkSession
+from writertools.replica import ReportingMixin
+from writertools.tasks import enqueue
+
+from .analytics import session_patterns
+from .forecast import project_forecasts
+from .forms import (
+    ArchiveSessionsForm,
+    BackfillTotalsForm,
+    LogWorkForm,
+    ProfileForm,
+    RecordTotalForm,
+)
+from .middleware import SESSION_KEY as TIMEZONE_SESSION_KEY
+from .models import (
+    Profile,
+    Project,
+    ProjectStatus,
+    SessionArchive,
+    WordCountSnapshot,
+    WorkSession,
+)
+from .ratelimit import RateLimitMixin, ratelimit
+from .tasks import archive_user_sessions, backfill_totals, restore_user_sessions
 
 logger = logging.getLogger(__name__)
 
 
-class DashboardView(LoginRequiredMixin, TemplateView):
+class DashboardView(LoginRequiredMixin, RateLimitMixin, TemplateView):
     template_name = "wordtracker/index.html"
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        projects = list(
+            Project.objects.filter(
+                user=self.request.user,
+                status=ProjectStatus.IN_PROGRESS,
+                target_wordcount__isnull=False,
+            ).order_by("name")
+        )
+        forecasts = project_forecasts(projects)
+        for project in projects:
+            project.forecast = forecasts[project.pk]
+        context["forecast_projects"] = projects
+        return context
+
 
-class WorkSessionCreateView(LoginRequiredMixin, CreateView):
+class WorkSessionCreateView(LoginRequiredMixin, RateLimitMixin, CreateView):
     model = WorkSession
+    ratelimit_scope = "log_work"
     template_name = "wordtracker/log_work.html"
     form_class = LogWorkForm
     success_url = reverse_lazy("wordtracker:dashboard")
@@ -38,7 +75,7 @@ class WorkSessionCreateView(LoginRequiredMixin, CreateView):
 
     def get_initial(self):
         init = super().get_initial() or {}
-        now = datetime.now()
+        now = timezone.localtime()
         init["startdate"] = now.date()
         init["enddate"] = now.date()
         init["starttime"] = now.time().isoformat(timespec="minutes")
@@ -52,6 +89,7 @@ class WorkSessionCreateView(LoginRequiredMixin, CreateView):
 
 
 @login_required
+@ratelimit("session_timer")
 def session_timer(request, ws_id=None):
     """
     Displays the session timer page.
@@ -64,7 +102,7 @@ def session_timer(request, ws_id=None):
     saved and permanently close out the WorkSession.
     """
     if request.method == "POST" and not ws_id:
-        now = timezone.now()
+        now = timezone.localtime()
         ws = WorkSession.objects.create(
             startdate=now.date(),
             starttime=now.time(),
@@ -83,19 +121,160 @@ def session_timer(request, ws_id=None):
     )
 
 
-class WorkSessionListView(ListView):
+@login_required
+@ratelimit("record_total")
+@require_POST
+def record_total(request, pk):
+    """
+    Record the current total word count of a project's manuscript, e.g. from an editor
+    plugin. The change since the last total is added to the project's WorkSessions.
+    See Project.record_totals(). Responds with JSON.
+    """
+    project = get_object_or_404(Project.objects.filter(user=request.user), pk=pk)
+    form = RecordTotalForm(request.POST)
+    if not form.is_valid():
+        return JsonResponse({"errors": form.errors}, status=400)
+    recorded_at = form.cleaned_data["recorded_at"] or timezone.now()
+    try:
+        snapshots = project.record_totals([(recorded_at, form.cleaned_data["total"])])
+    except ValueError as e:
+        return JsonResponse({"errors": {"recorded_at": [str(e)]}}, status=400)
+    return JsonResponse(
+        {
+            "total": project.last_total,
+            "delta": snapshots[0].delta if snapshots else 0,
+            "session": project.last_session_id,
+        }
+    )
+
+
+def task_accepted(job_id):
+    return JsonResponse(
+        {"task": job_id, "status_url": reverse("task_status", args=[job_id])},
+        status=202,
+    )
+
+
+@login_required
+@ratelimit("backfill_totals")
+@require_POST
+def backfill_totals_upload(request, pk):
+    """
+    Accept a CSV file of 'timestamp,total' rows and record them for the project in
+    the background. Responds with the task id and a URL to poll for its status.
+    """
+    project = get_object_or_404(Project.objects.filter(user=request.user), pk=pk)
+    form = BackfillTotalsForm(request.POST, request.FILES)
+    if not form.is_valid():
+        return JsonResponse({"errors": form.errors}, status=400)
+    rows = [[at.isoformat(), total] for at, total in form.cleaned_data["file"]]
+    return task_accepted(enqueue(backfill_totals, project.pk, rows, user=request.user))
+
+
+@login_required
+@ratelimit("archive")
+@require_POST
+def archive_old_sessions(request):
+    """
+    Move the user's sessions from before the posted date into the archive, in the
+    background. Responds with the task id and a URL to poll for its status.
+    """
+    form = ArchiveSessionsForm(request.POST)
+    if not form.is_valid():
+        return JsonResponse({"errors": form.errors}, status=400)
+    before = form.cleaned_data["before"].isoformat()
+    return task_accepted(
+        enqueue(archive_user_sessions, request.user.pk, before, user=request.user)
+    )
+
+
+@login_required
+@ratelimit("archive")
+@require_POST
+def restore_archived_sessions(request, year):
+    """Restore the user's archived sessions for a year, in the background."""
+    if not SessionArchive.objects.filter(user=request.user, year=year).exists():
+        return JsonResponse({"errors": {"year": [_("Nothing archived.")]}}, status=404)
+    return task_accepted(
+        enqueue(restore_user_sessions, request.user.pk, year, user=request.user)
+    )
+
+
+class WorkSessionListView(
+    LoginRequiredMixin, RateLimitMixin, ReportingMixin, ListView
+):
     model = WorkSession
     template_name = "wordtracker/stats.html"
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["user_summary"] = WorkSession.objects.user_summary(self.request.user)
+        context["patterns"] = session_patterns(self.request.user)
         return context
 
     def get_queryset(self):
         return super().get_queryset().filter(user=self.request.user)
 
 
+class ProjectListView(LoginRequiredMixin, RateLimitMixin, ReportingMixin, ListView):
+    model = Project
+    template_name = "wordtracker/project_list.html"
+    paginate_by = 50
+
+    def get_queryset(self):
+        return Project.objects.filter(user=self.request.user).order_by("name")
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        projects = context["object_list"]
+        summary = WorkSession.objects.project_summary(
+            self.request.user, projects=projects
+        )
+        for project in projects:
+            project.stats = summary.get(project.id)
+        return context
+
+
+class ProjectDetailView(
+    LoginRequiredMixin, RateLimitMixin, ReportingMixin, DetailView
+):
+    model = Project
+    template_name = "wordtracker/project_detail.html"
+    recent_sessions = 20
+
+    def get_queryset(self):
+        return Project.objects.filter(user=self.request.user)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["stats"] = WorkSession.objects.project_summary(
+            self.request.user, projects=[self.object]
+        ).get(self.object.id)
+        context["recent_sessions"] = WorkSession.objects.filter(
+            user=self.request.user, project=self.object
+        ).order_by("-startdate", "-starttime")[: self.recent_sessions]
+        context["daily_progress"] = WordCountSnapshot.objects.daily_progress(
+            self.object
+        )
+        return context
+
+
+class ProfileUpdateView(LoginRequiredMixin, RateLimitMixin, UpdateView):
+    model = Profile
+    ratelimit_scope = "settings"
+    template_name = "wordtracker/profile_form.html"
+    form_class = ProfileForm
+    success_url = reverse_lazy("wordtracker:dashboard")
+
+    def get_object(self, queryset=None):
+        return Profile.objects.get_or_create(user=self.request.user)[0]
+
+    def form_valid(self, form):
+        response = super().form_valid(form)
+        self.request.session[TIMEZONE_SESSION_KEY] = self.object.timezone
+        return response
+
+
 @login_required
 def view_stats(request):
     return render(request, "wordtracker/stats.html")
@@ -0,0 +1,5 @@
+try:
+    # Make sure the Celery app is loaded when Django starts, so that tasks use it.
+    from .celery import app as celery_app
+except ImportError:
+    celery_app = None
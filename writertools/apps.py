@@ -0,0 +1,27 @@
+from django.apps import AppConfig
+from django.core import checks
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+
+
+class WritertoolsConfig(AppConfig):
+    name = 'writertools'
+
+    def ready(self):
+        from django.contrib.auth import get_user_model
+        from easy_thumbnails.signals import saved_file
+
+        from . import thumbnails
+        from .auth import invalidate_user
+        from .checks import check_shared_cache
+        from .pagecache import content_changed
+
+        for signal in (post_save, post_delete, m2m_changed):
+            signal.connect(content_changed, dispatch_uid="writertools.pagecache")
+        pre_save.connect(thumbnails.find_uncommitted, dispatch_uid="writertools.thumbs")
+        post_save.connect(
+            thumbnails.signal_committed, dispatch_uid="writertools.thumbs"
+        )
+        saved_file.connect(thumbnails.queue_aliases, dispatch_uid="writertools.thumbs")
+        for signal in (post_save, post_delete):
+            signal.connect(invalidate_user, sender=get_user_model())
+        checks.register(check_shared_cache, deploy=True)
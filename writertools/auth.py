@@ -1,6 +1,58 @@
 from allauth.account.adapter import DefaultAccountAdapter
+from allauth.account.auth_backends import AuthenticationBackend
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+from django.db import transaction
 
 
 class ProjectAuthAdapter(DefaultAccountAdapter):
     def is_open_for_signup(self, request):
         return True
+
+
+def user_cache_key(user_id):
+    return f"auth:user:{user_id}"
+
+
+def user_cache():
+    """Users are cached alongside the sessions that refer to them."""
+    return caches[settings.SESSION_CACHE_ALIAS]
+
+
+def invalidate_user(sender, instance, **kwargs):
+    """post_save/post_delete receiver for the user model."""
+    key = user_cache_key(instance.pk)
+    transaction.on_commit(lambda: user_cache().delete(key))
+
+
+class CachedUserMixin:
+    """
+    Authentication backend mixin keeping logged in users in the sessions' cache
+    (SESSION_CACHE_ALIAS) for AUTH_USER_CACHE_TIMEOUT seconds, so that requests needn't
+    load them from the database. Users are dropped from the cache whenever they are
+    saved (including the last_login update at each login) or deleted. Changes made with
+    update() are not seen until the timeout, so keep it short.
+    """
+
+    def get_user(self, user_id):
+        timeout = settings.AUTH_USER_CACHE_TIMEOUT
+        if not timeout:
+            return super().get_user(user_id)
+        key = user_cache_key(user_id)
+        user = user_cache().get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                user_cache().set(key, user, timeout)
+        elif not self.user_can_authenticate(user):
+            return None
+        return user
+
+
+class CachedModelBackend(CachedUserMixin, ModelBackend):
+    pass
+
+
+class CachedAuthenticationBackend(CachedUserMixin, AuthenticationBackend):
+    pass
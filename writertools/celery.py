@@ -0,0 +1,17 @@
+"""
+Celery application for writertools. Only used when the celery package is installed and
+TASKS_EXECUTOR is "celery". Start a worker with:
+
+    celery -A writertools worker -B
+"""
+import os
+
+from celery import Celery
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "writertools.settings")
+
+app = Celery("writertools")
+app.config_from_object("django.conf:settings", namespace="CELERY")
+app.autodiscover_tasks()
+# QueuedEmailBackend's task
+app.autodiscover_tasks(["writertools"], related_name="mail")
@@ -0,0 +1,44 @@
+"""
+System checks for settings that work on one process but not across several. These
+are deployment checks, run by `manage.py check --deploy`.
+"""
+from django.conf import settings
+from django.core.checks import Warning
+
+LOCAL_CACHES = {
+    "django.core.cache.backends.dummy.DummyCache",
+    "django.core.cache.backends.locmem.LocMemCache",
+}
+
+
+def shared_state_users():
+    """Return descriptions of the features configured to keep state in the default
+    cache that every web (and worker) process must see."""
+    users = []
+    if settings.TASKS_EXECUTOR != "inline":
+        users.append("background task status (TASKS_EXECUTOR)")
+    if settings.PAGECACHE_TIMEOUT or settings.PAGECACHE_STALE_TIMEOUT:
+        users.append("the page and feed cache content generation (PAGECACHE_TIMEOUT)")
+    return users
+
+
+def check_shared_cache(app_configs, **kwargs):
+    """Warn if the default cache is local to each process while something relies on
+    it being shared. Development servers run a single process, so DEBUG skips this."""
+    backend = settings.CACHES["default"]["BACKEND"]
+    if settings.DEBUG or backend not in LOCAL_CACHES:
+        return []
+    users = shared_state_users()
+    if not users:
+        return []
+    return [
+        Warning(
+            f"The default cache ({backend}) is not shared between processes.",
+            hint=(
+                "Set CACHE_URL to a shared cache such as Redis or Memcached. "
+                f"Otherwise these return stale or missing data whenever requests "
+                f"reach different processes: {', '.join(users)}."
+            ),
+            id="writertools.W001",
+        )
+    ]
@@ -0,0 +1,199 @@
+"""
+An email backend that sends mail in the background, so that requests which send mail
+(signup, email confirmation, password reset) don't wait on the mail server.
+
+With TASKS_EXECUTOR = "celery", QueuedEmailBackend serializes each message and sends
+it from a Celery task, so mail survives web process restarts. Otherwise it puts
+messages on an in-process queue and returns at once. A single daemon thread takes them
+off in batches of up to BATCH_SIZE, and sends each batch over one connection of the
+real backend, settings.QUEUED_EMAIL_BACKEND. Either way, the real backend gets the
+keyword arguments the QueuedEmailBackend was created with (see get_connection()).
+
+A message the mail server refuses is logged and dropped. If the connection itself
+fails, the rest of the batch is put back on the queue once, after RETRY_DELAY seconds,
+and dropped if it fails again; so an unreachable server can't hold up the queue for
+long. Messages still queued when the process exits are lost, after waiting up to
+EXIT_TIMEOUT seconds for them to go.
+"""
+import atexit
+import base64
+import logging
+import queue
+import smtplib
+import threading
+import time
+from email import message_from_bytes
+from email.header import decode_header, make_header
+from email.message import Message
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.mail.message import MIMEMixin
+
+from .tasks import shared_task
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 50
+RETRY_DELAY = 2.0
+EXIT_TIMEOUT = 10.0
+# Failures of one message, rather than of the connection
+MESSAGE_ERRORS = (
+    smtplib.SMTPRecipientsRefused,
+    smtplib.SMTPSenderRefused,
+    smtplib.SMTPDataError,
+)
+
+# Items are (message, connection kwargs, whether it may be retried)
+_queue = queue.Queue()
+_worker = None
+_worker_lock = threading.Lock()
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+    def __init__(self, fail_silently=False, **kwargs):
+        super().__init__(fail_silently=fail_silently)
+        self.connection_kwargs = {"fail_silently": fail_silently, **kwargs}
+
+    def send_messages(self, email_messages):
+        messages = list(email_messages)
+        if settings.TASKS_EXECUTOR == "celery":
+            for message in messages:
+                send_serialized_task.delay(
+                    *serialize(message), connection_kwargs=self.connection_kwargs
+                )
+            return len(messages)
+        for message in messages:
+            _queue.put((message, self.connection_kwargs, True))
+        if messages:
+            start_worker()
+        return len(messages)
+
+
+class _ParsedMessage(MIMEMixin, Message):
+    """A parsed message that backends can format as they format their own."""
+
+
+class SerializedEmailMessage(EmailMessage):
+    """A message rebuilt from serialize()'s output, for sending by any backend."""
+
+    def __init__(self, from_email, recipients, data):
+        super().__init__(from_email=from_email, to=recipients)
+        self.data = data
+        subject = self.message().get("Subject", "")
+        self.subject = str(make_header(decode_header(subject)))
+
+    def message(self):
+        return message_from_bytes(self.data, _class=_ParsedMessage)
+
+
+def serialize(message):
+    """Return the message as JSON serializable task arguments for send_serialized."""
+    data = base64.b64encode(message.message().as_bytes()).decode("ascii")
+    return message.from_email, message.recipients(), data
+
+
+def send_serialized(from_email, recipients, data, connection_kwargs=None):
+    message = SerializedEmailMessage(from_email, recipients, base64.b64decode(data))
+    connection_kwargs = connection_kwargs or {}
+    connection = get_connection(settings.QUEUED_EMAIL_BACKEND, **connection_kwargs)
+    return connection.send_messages([message])
+
+
+if shared_task is not None:
+    # A plain Celery task rather than a @task: nobody polls for a message's job status.
+    send_serialized_task = shared_task(name="writertools.mail.send_serialized")(
+        send_serialized
+    )
+else:
+    send_serialized_task = None
+
+
+def start_worker():
+    global _worker
+    with _worker_lock:
+        # Also restarts the worker in processes forked from one that had started it
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=deliver_forever, name="mail", daemon=True)
+            _worker.start()
+
+
+def deliver_forever():
+    while True:
+        batch = [_queue.get()]
+        while len(batch) < BATCH_SIZE:
+            try:
+                batch.append(_queue.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            unsent, retry = 0, []
+            for connection_kwargs, items in _by_connection(batch):
+                sent = deliver([message for message, *_ in items], **connection_kwargs)
+                unsent += len(items) - sent
+                retry += [item for item in items[sent:] if item[2]]
+            if len(retry) < unsent:
+                logger.error("Gave up sending %d email messages", unsent - len(retry))
+            if retry:
+                time.sleep(RETRY_DELAY)
+                for message, connection_kwargs, _retry in retry:
+                    _queue.put((message, connection_kwargs, False))
+        except Exception:
+            logger.exception("Failed to send %d email messages", len(batch))
+        finally:
+            for _item in batch:
+                _queue.task_done()
+
+
+def _by_connection(batch):
+    """Split the queue items into runs that can share a connection."""
+    runs = []
+    for item in batch:
+        if runs and runs[-1][0] == item[1]:
+            runs[-1][1].append(item)
+        else:
+            runs.append((item[1], [item]))
+    return runs
+
+
+def deliver(messages, **connection_kwargs) -> int:
+    """Send the messages over one connection to the real backend. Returns how many
+    were dealt with (sent, or refused by the server) before the connection failed, if
+    it did."""
+    done = 0
+    connection = get_connection(settings.QUEUED_EMAIL_BACKEND, **connection_kwargs)
+    try:
+        connection.open()
+        for message in messages:
+            try:
+                connection.send_messages([message])
+            except MESSAGE_ERRORS:
+                logger.exception("Email to %s refused", message.recipients())
+            done += 1
+    except Exception:
+        logger.warning(
+            "Email connection failed after %d of %d messages",
+            done,
+            len(messages),
+            exc_info=True,
+        )
+    finally:
+        connection.close()
+    return done
+
+
+def flush(timeout=None) -> bool:
+    """Wait until every queued message has been sent, or given up on. Returns False if
+    `timeout` seconds passed first."""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    with _queue.all_tasks_done:
+        while _queue.unfinished_tasks:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            _queue.all_tasks_done.wait(remaining)
+    return True
+
+
+atexit.register(flush, EXIT_TIMEOUT)
@@ -0,0 +1,133 @@
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, OperationalError
+from django.db.utils import ConnectionHandler
+
+PROFILES = {
+    "default": "django.db.backends.sqlite3",
+    "tuned": "writertools.sqlite",
+}
+
+SCHEMA = """
+CREATE TABLE bench_session (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    startdate TEXT NOT NULL,
+    wordcount INTEGER
+)
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark concurrent writers against a scratch SQLite database, comparing "
+        "the stock backend with the tuned one enabled by SQLITE_TUNING."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--writers", type=int, default=8, help="Number of writer threads."
+        )
+        parser.add_argument(
+            "--transactions",
+            type=int,
+            default=200,
+            help="Transactions per writer thread.",
+        )
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=5.0,
+            help="SQLite busy timeout in seconds.",
+        )
+        parser.add_argument(
+            "--profile",
+            choices=["both", *PROFILES],
+            default="both",
+            help="Which backend(s) to benchmark.",
+        )
+
+    def handle(self, *args, **options):
+        profiles = PROFILES if options["profile"] == "both" else [options["profile"]]
+        self.stdout.write(
+            f"{options['writers']} writers x {options['transactions']} transactions"
+        )
+        self.stdout.write(f"{'profile':<10}{'commits':>10}{'locked':>10}{'tx/s':>12}")
+        for profile in profiles:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                result = self.run_profile(
+                    PROFILES[profile],
+                    Path(tmpdir) / "bench.sqlite3",
+                    options["writers"],
+                    options["transactions"],
+                    options["timeout"],
+                )
+            self.stdout.write(
+                f"{profile:<10}{result['commits']:>10}{result['locked']:>10}"
+                f"{result['throughput']:>12.1f}"
+            )
+
+    def run_profile(self, engine, path, writers, transactions, timeout):
+        handler = ConnectionHandler(
+            {
+                DEFAULT_DB_ALIAS: {
+                    "ENGINE": engine,
+                    "NAME": str(path),
+                    "OPTIONS": {"timeout": timeout},
+                }
+            }
+        )
+        setup = handler.create_connection(DEFAULT_DB_ALIAS)
+        with setup.cursor() as cursor:
+            cursor.execute(SCHEMA)
+        setup.close()
+
+        counts = {"commits": 0, "locked": 0}
+        lock = threading.Lock()
+        start = threading.Barrier(writers + 1)
+
+        def writer(user_id):
+            conn = handler.create_connection(DEFAULT_DB_ALIAS)
+            conn.ensure_connection()
+            commits = locked = 0
+            start.wait()
+            for i in range(transactions):
+                # Mirror what an atomic() block does: read, then write.
+                try:
+                    conn._start_transaction_under_autocommit()
+                    with conn.cursor() as cursor:
+                        cursor.execute(
+                            "SELECT COUNT(*) FROM bench_session WHERE user_id = %s",
+                            [user_id],
+                        )
+                        cursor.execute(
+                            "INSERT INTO bench_session (user_id, startdate, wordcount) "
+                            "VALUES (%s, date('now'), %s)",
+                            [user_id, i],
+                        )
+                    conn.commit()
+                    commits += 1
+                except OperationalError:
+                    conn.rollback()
+                    locked += 1
+            conn.close()
+            with lock:
+                counts["commits"] += commits
+                counts["locked"] += locked
+
+        threads = [
+            threading.Thread(target=writer, args=(n,)) for n in range(writers)
+        ]
+        for thread in threads:
+            thread.start()
+        start.wait()
+        began = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - began
+        counts["throughput"] = counts["commits"] / elapsed if elapsed else 0.0
+        return counts
@@ -0,0 +1,171 @@
+import random
+from datetime import date, datetime, time, timedelta
+
+from allauth.account.models import EmailAddress
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from plotboard.models import Board, Card, Sequence
+from wordtracker.models import Project, StandardActivityChoices, WorkSession
+
+WORDS = (
+    "the storm broke over the harbor as she ran toward the lighthouse carrying "
+    "a letter that nobody was supposed to read and the keeper waited at the door "
+    "with a lantern and an old grudge while the ships pulled at their moorings"
+).split()
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate users with realistic work session histories, projects and plot "
+        "boards, for performance testing. Output is reproducible for a given seed "
+        "and end date."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10)
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument(
+            "--days", type=int, default=365, help="Days of history per user."
+        )
+        parser.add_argument(
+            "--end-date",
+            type=date.fromisoformat,
+            default=date.today(),
+            help="Last day of generated history (default today).",
+        )
+        parser.add_argument("--boards", type=int, default=2, help="Boards per user.")
+        parser.add_argument(
+            "--prefix",
+            default="loadtest",
+            help="Usernames are PREFIX00001, PREFIX00002, and so on.",
+        )
+        parser.add_argument(
+            "--password",
+            default="loadtest",
+            help="Password for all generated users.",
+        )
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        prefix = options["prefix"]
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(
+                f"Users named {prefix}* already exist. Choose another --prefix."
+            )
+        rng = random.Random(options["seed"])
+        password = make_password(options["password"])
+
+        with transaction.atomic():
+            User.objects.bulk_create(
+                User(
+                    username=f"{prefix}{n:05d}",
+                    email=f"{prefix}{n:05d}@example.com",
+                    password=password,
+                )
+                for n in range(1, options["users"] + 1)
+            )
+            # bulk_create does not return ids on every backend, so re-read them.
+            users = list(
+                User.objects.filter(username__startswith=prefix).order_by("id")
+            )
+            EmailAddress.objects.bulk_create(
+                EmailAddress(user=u, email=u.email, verified=True, primary=True)
+                for u in users
+            )
+            self.make_projects(rng, users)
+            sessions = self.make_sessions(
+                rng, users, options["days"], options["end_date"]
+            )
+            cards = self.make_boards(rng, users, options["boards"])
+
+        self.stdout.write(
+            f"Created {len(users)} users, {sessions} work sessions and {cards} cards."
+        )
+
+    def make_projects(self, rng, users):
+        Project.objects.bulk_create(
+            Project(user=user, name=f"Project {n}", slug=f"project-{n}")
+            for user in users
+            for n in range(1, rng.randint(1, 5) + 1)
+        )
+
+    def make_sessions(self, rng, users, days, end_date):
+        projects = {}
+        for project_id, user_id in Project.objects.filter(user__in=users).values_list(
+            "id", "user_id"
+        ):
+            projects.setdefault(user_id, []).append(project_id)
+
+        count = 0
+        batch = []
+        for user in users:
+            # Some writers are daily, some are weekend warriors.
+            habit = rng.uniform(0.2, 0.95)
+            pace = rng.randint(300, 1500)
+            for offset in range(days, 0, -1):
+                day = end_date - timedelta(days=offset - 1)
+                if rng.random() > habit:
+                    continue
+                for _ in range(rng.choice((1, 1, 1, 2, 3))):
+                    minutes = rng.randint(10, 150)
+                    start = datetime.combine(day, time(rng.randint(5, 22)))
+                    end = start + timedelta(minutes=minutes)
+                    batch.append(
+                        WorkSession(
+                            user=user,
+                            project_id=rng.choice(projects[user.id]),
+                            activity=rng.choice(StandardActivityChoices.values),
+                            startdate=start.date(),
+                            starttime=start.time(),
+                            enddate=end.date(),
+                            endtime=end.time(),
+                            duration=timedelta(minutes=minutes),
+                            wordcount=max(
+                                -500, int(rng.gauss(pace * minutes / 60, pace / 3))
+                            ),
+                        )
+                    )
+            if len(batch) >= 5000:
+                WorkSession.objects.bulk_create(batch, batch_size=1000)
+                count += len(batch)
+                batch = []
+        WorkSession.objects.bulk_create(batch, batch_size=1000)
+        return count + len(batch)
+
+    def make_boards(self, rng, users, per_user):
+        Board.objects.bulk_create(
+            # Everything starts at version 1, so that a full sync (since=0) sees it
+            Board(
+                name=f"Board {n}", owner=user, per_row=rng.randint(2, 4), version=1
+            )
+            for user in users
+            for n in range(1, per_user + 1)
+        )
+        boards = list(Board.objects.filter(owner__in=users).order_by("id"))
+        Sequence.objects.bulk_create(
+            Sequence(name=f"Act {n}", board=board, version=1)
+            for board in boards
+            for n in range(1, rng.randint(2, 6) + 1)
+        )
+        cards = []
+        for sequence in Sequence.objects.filter(board__in=boards).order_by("id"):
+            for order in range(rng.randint(3, 12)):
+                paragraphs = "".join(
+                    f"<p>{' '.join(rng.choices(WORDS, k=rng.randint(20, 80)))}</p>"
+                    for _ in range(rng.randint(1, 4))
+                )
+                card = Card(
+                    name=" ".join(rng.choices(WORDS, k=3)).title(),
+                    content=paragraphs,
+                    board_id=sequence.board_id,
+                    sequence=sequence,
+                    version=1,
+                    _order=order,
+                )
+                card.render()
+                cards.append(card)
+        Card.objects.bulk_create(cards, batch_size=500)
+        return len(cards)
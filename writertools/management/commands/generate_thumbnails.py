@@ -0,0 +1,72 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from writertools.thumbnails import image_fields, make_aliases
+
+
+def init_worker():
+    # Needed where worker processes are spawned rather than forked. Either way,
+    # don't share the parent's database connections.
+    django.setup()
+    connections.close_all()
+
+
+def generate(item, replace=False):
+    try:
+        return make_aliases(*item, replace=replace), None
+    except Exception as e:
+        return 0, f"{item[0]} {item[1]}: {e}"
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate the thumbnail aliases for every uploaded image, in parallel. "
+        "Existing thumbnails are kept unless --replace is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="Number of worker processes. Defaults to the number of CPUs.",
+        )
+        parser.add_argument(
+            "--replace",
+            action="store_true",
+            help="Delete and regenerate existing thumbnails.",
+        )
+
+    def handle(self, *args, **options):
+        items = [
+            (model._meta.label, pk, field)
+            for model, field in image_fields()
+            for pk in model._default_manager.exclude(**{field: ""})
+            .exclude(**{f"{field}__isnull": True})
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        ]
+        work = partial(generate, replace=options["replace"])
+        began = time.perf_counter()
+        if options["workers"] > 1 and len(items) > 1:
+            connections.close_all()
+            with ProcessPoolExecutor(options["workers"], initializer=init_worker) as pool:
+                chunksize = max(len(items) // (options["workers"] * 4), 1)
+                results = list(pool.map(work, items, chunksize=chunksize))
+        else:
+            results = [work(item) for item in items]
+        elapsed = time.perf_counter() - began
+
+        for _count, error in results:
+            if error:
+                self.stderr.write(error)
+        self.stdout.write(
+            f"{sum(count for count, _error in results)} thumbnails for {len(items)} "
+            f"files in {elapsed:.1f}s"
+        )
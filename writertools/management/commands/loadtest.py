@@ -0,0 +1,238 @@
+import math
+import random
+import threading
+import time
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode, urljoin
+from urllib.request import HTTPCookieProcessor, Request, build_opener
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from django.utils import timezone
+
+from plotboard.models import Board
+from wordtracker.models import Project, StandardActivityChoices
+
+# Relative frequency of each scenario in the mix. Dashboard and board views dominate,
+# as they do for real writers; heartbeats are what an editor plugin sends while the
+# user types.
+SCENARIOS = {
+    "dashboard": 4,
+    "stats": 2,
+    "board": 3,
+    "log_work": 1,
+    "timer": 1,
+    "heartbeat": 3,
+}
+
+
+def percentile(values, p):
+    """Return the `p`th percentile of sorted `values`, by the nearest rank method."""
+    if not values:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(values)))
+    return values[rank - 1]
+
+
+class VirtualUser:
+    """One simulated writer, with their own cookies and random choices."""
+
+    def __init__(self, base_url, user, projects, boards, password, seed):
+        self.base_url = base_url
+        self.user = user
+        self.projects = projects
+        self.boards = boards
+        self.password = password
+        self.rng = random.Random(seed)
+        self.cookies = CookieJar()
+        self.opener = build_opener(HTTPCookieProcessor(self.cookies))
+        self.total = self.rng.randint(1000, 50000)
+
+    def cookie(self, name):
+        for cookie in self.cookies:
+            if cookie.name == name:
+                return cookie.value
+        return ""
+
+    def request(self, path, data=None):
+        url = urljoin(self.base_url, path)
+        headers = {"Referer": url}
+        if data is not None:
+            data = urlencode(data).encode()
+            headers["X-CSRFToken"] = self.cookie(settings.CSRF_COOKIE_NAME)
+        try:
+            with self.opener.open(Request(url, data, headers), timeout=30) as response:
+                response.read()
+                return response.status, response.url
+        except HTTPError as e:
+            return e.code, url
+
+    def login(self):
+        path = reverse("account_login")
+        try:
+            self.request(path)
+        except URLError as e:
+            raise CommandError(f"Could not connect to {self.base_url}: {e.reason}")
+        self.request(path, {"login": self.user.username, "password": self.password})
+        if not self.cookie(settings.SESSION_COOKIE_NAME):
+            raise CommandError(f"Could not log in as {self.user.username}")
+
+    def run(self, scenario):
+        return getattr(self, f"do_{scenario}")()
+
+    def do_dashboard(self):
+        return self.request(reverse("wordtracker:dashboard"))[0]
+
+    def do_stats(self):
+        return self.request(reverse("wordtracker:view_stats"))[0]
+
+    def do_board(self):
+        if not self.boards:
+            return self.do_dashboard()
+        pk = self.rng.choice(self.boards)
+        return self.request(reverse("plotboard:board_detail", kwargs={"pk": pk}))[0]
+
+    def do_log_work(self):
+        now = timezone.localtime()
+        minutes = self.rng.randint(10, 120)
+        return self.request(
+            reverse("wordtracker:log_work"),
+            {
+                "project": self.rng.choice(self.projects) if self.projects else "",
+                "activity": self.rng.choice(StandardActivityChoices.values),
+                "wordcount": self.rng.randint(0, 2000),
+                "duration": minutes,
+                "startdate": now.date().isoformat(),
+                "starttime": "09:00",
+                "enddate": now.date().isoformat(),
+                "endtime": "10:00",
+            },
+        )[0]
+
+    def do_timer(self):
+        # Starting a session redirects to the timer page, which is fetched too.
+        return self.request(reverse("wordtracker:session_timer"), {})[0]
+
+    def do_heartbeat(self):
+        if not self.projects:
+            return self.do_dashboard()
+        self.total += self.rng.randint(0, 60)
+        pk = self.rng.choice(self.projects)
+        return self.request(
+            reverse("wordtracker:record_total", kwargs={"pk": pk}),
+            {"total": self.total},
+        )[0]
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a mix of logged in user scenarios (dashboard, stats, board views, logging "
+        "work, session timers and word count heartbeats) against a running server, and "
+        "report latency percentiles and throughput. Uses the users made by "
+        "generate_data; point it at a server using the same database. Rate limited "
+        "responses (429) are counted separately: raise WORDTRACKER_RATE_LIMITS on the "
+        "server to measure raw capacity."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--url",
+            default="http://127.0.0.1:8000/",
+            help="Base URL of the server under test.",
+        )
+        parser.add_argument(
+            "--users", type=int, default=10, help="Concurrent virtual users."
+        )
+        parser.add_argument(
+            "--duration", type=float, default=30, help="Seconds to run for."
+        )
+        parser.add_argument(
+            "--think",
+            type=float,
+            default=0,
+            help="Seconds each virtual user pauses between requests.",
+        )
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--prefix", default="loadtest")
+        parser.add_argument("--password", default="loadtest")
+
+    def handle(self, *args, **options):
+        users = list(
+            get_user_model()
+            .objects.filter(username__startswith=options["prefix"])
+            .order_by("id")[: options["users"]]
+        )
+        if not users:
+            raise CommandError(
+                f"No {options['prefix']}* users found. Run generate_data first."
+            )
+        vusers = [
+            VirtualUser(
+                options["url"],
+                user,
+                list(Project.objects.filter(user=user).values_list("id", flat=True)),
+                list(Board.objects.filter(owner=user).values_list("id", flat=True)),
+                options["password"],
+                options["seed"] + n,
+            )
+            for n, user in enumerate(users)
+        ]
+        for vuser in vusers:
+            vuser.login()
+
+        results = {name: [] for name in SCENARIOS}
+        lock = threading.Lock()
+        deadline = time.monotonic() + options["duration"]
+
+        def worker(vuser):
+            names, weights = list(SCENARIOS), list(SCENARIOS.values())
+            while time.monotonic() < deadline:
+                scenario = vuser.rng.choices(names, weights)[0]
+                start = time.perf_counter()
+                try:
+                    status = vuser.run(scenario)
+                except (URLError, OSError):
+                    status = None
+                elapsed = time.perf_counter() - start
+                with lock:
+                    results[scenario].append((elapsed, status))
+                if options["think"]:
+                    time.sleep(options["think"])
+
+        started = time.monotonic()
+        threads = [threading.Thread(target=worker, args=(v,)) for v in vusers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.report(results, time.monotonic() - started)
+
+    def report(self, results, elapsed):
+        self.stdout.write(
+            f"{'scenario':<12}{'requests':>10}{'errors':>8}{'429':>6}"
+            f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+        )
+        everything = []
+        for scenario, samples in results.items():
+            everything.extend(samples)
+            self.stdout.write(self.row(scenario, samples))
+        self.stdout.write(self.row("all", everything))
+        self.stdout.write(
+            f"{len(everything)} requests in {elapsed:.1f}s: "
+            f"{len(everything) / elapsed:.1f} requests/s"
+        )
+
+    def row(self, name, samples):
+        times = sorted(t * 1000 for t, _ in samples)
+        limited = sum(1 for _, status in samples if status == 429)
+        errors = sum(
+            1 for _, status in samples if status is None or status >= 400
+        ) - limited
+        return (
+            f"{name:<12}{len(samples):>10}{errors:>8}{limited:>6}"
+            f"{percentile(times, 50):>10.1f}{percentile(times, 95):>10.1f}"
+            f"{percentile(times, 99):>10.1f}"
+        )
@@ -0,0 +1,266 @@
+"""
+Full-page cache for the public (genericsite) pages, for anonymous visitors.
+
+Cached pages are tagged with a content generation, a number that changes whenever a
+model in one of CONTENT_APPS is saved or deleted (see WritertoolsConfig.ready()).
+The generation is kept in the default cache, which must be shared by all the web
+processes: with a per-process cache, a process that didn't handle the change keeps
+serving old pages. The writertools.W001 deployment check warns about that, and without
+a CACHE_URL the timeouts below default to 0, which turns the cache off.
+Pages from an older generation, or older than PAGECACHE_TIMEOUT seconds, are stale.
+A stale page may still be served for up to PAGECACHE_STALE_TIMEOUT seconds more while
+one request, holding a lock, renders its replacement. So a publish costs a single
+render per page, even under heavy traffic.
+
+Only GET and HEAD requests from anonymous visitors are served from the cache. Only
+plain 200 responses are stored: nothing that sets cookies, uses the CSRF token or shows
+messages, and nothing marked private. Cache keys include the values of the request
+headers named in a page's Vary header (other than Cookie: none of the stored pages
+depend on cookies).
+
+Feeds are cached differently (see cache_feed()): for everyone, until the content
+generation changes or PAGECACHE_TIMEOUT seconds pass (so, like pages, they are never
+older than that, even if a process missed a change), with ETag and Last-Modified
+validators and a precompressed body.
+"""
+import gzip
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import (
+    cc_delim_re,
+    get_conditional_response,
+    get_max_age,
+    patch_vary_headers,
+)
+from django.utils.http import http_date
+
+from .middleware import accepted_encodings
+
+KEY_PREFIX = "pagecache:"
+GENERATION_KEY = f"{KEY_PREFIX}generation"
+CONTENT_APPS = {"genericsite", "taggit", "sites"}
+LOCK_TIMEOUT = 30
+# Never stored with a page, or replayed from the cache
+SKIP_HEADERS = {"set-cookie", "age", "x-cache"}
+
+
+def content_generation():
+    """Return the current content generation, a counter kept in the cache."""
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        # Start from the clock, so that losing the cached value never brings back a
+        # generation that pages were stored under before.
+        cache.add(GENERATION_KEY, int(timezone.now().timestamp() * 1000000), None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def bump_generation():
+    """Make all cached pages stale, once the current transaction commits."""
+
+    def bump():
+        try:
+            cache.incr(GENERATION_KEY)
+        except ValueError:
+            pass  # Not cached: the next content_generation() starts a new one
+
+    transaction.on_commit(bump)
+
+
+def content_changed(sender, **kwargs):
+    """Signal receiver for post_save, post_delete and m2m_changed."""
+    if sender._meta.app_label in CONTENT_APPS:
+        bump_generation()
+
+
+def _digest(*parts):
+    return hashlib.md5("\n".join(parts).encode(), usedforsecurity=False).hexdigest()
+
+
+def _vary_key(request):
+    return f"{KEY_PREFIX}vary:{_digest(request.build_absolute_uri())}"
+
+
+def _page_key(request, vary):
+    values = [request.headers.get(header, "") for header in vary]
+    return f"{KEY_PREFIX}page:{_digest(request.build_absolute_uri(), *vary, *values)}"
+
+
+def _vary_headers(response):
+    if not response.has_header("Vary"):
+        return []
+    headers = {h.strip().lower() for h in cc_delim_re.split(response.headers["Vary"])}
+    return sorted(headers - {"cookie", ""})
+
+
+def _has_messages(request):
+    return hasattr(request, "_messages") and len(messages.get_messages(request)) > 0
+
+
+def enabled():
+    return bool(settings.PAGECACHE_TIMEOUT or settings.PAGECACHE_STALE_TIMEOUT)
+
+
+def cacheable_request(request):
+    return (
+        enabled()
+        and request.method in ("GET", "HEAD")
+        and not request.user.is_authenticated
+        and not _has_messages(request)
+    )
+
+
+def cacheable_response(request, response):
+    cache_control = response.get("Cache-Control", "")
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        # Set by get_token(), e.g. for a form's {% csrf_token %}
+        and not request.META.get("CSRF_COOKIE_NEEDS_UPDATE")
+        and not _has_messages(request)
+        and not any(d in cache_control for d in ("private", "no-store", "no-cache"))
+        and get_max_age(response) != 0
+    )
+
+
+def _from_entry(entry, state):
+    response = HttpResponse(entry["content"], status=entry["status"])
+    for header, value in entry["headers"]:
+        response.headers[header] = value
+    response.headers["Age"] = str(max(int(time.time() - entry["created"]), 0))
+    response.headers["X-Cache"] = state
+    return response
+
+
+def _store(request, response, generation, lock):
+    if lock:
+        cache.delete(lock)
+    if not cacheable_response(request, response):
+        return
+    vary = _vary_headers(response)
+    fresh = settings.PAGECACHE_TIMEOUT
+    timeout = fresh + settings.PAGECACHE_STALE_TIMEOUT
+    now = time.time()
+    entry = {
+        "generation": generation,
+        "created": now,
+        "expires": now + fresh,
+        "status": response.status_code,
+        "headers": [
+            (h, v) for h, v in response.items() if h.lower() not in SKIP_HEADERS
+        ],
+        "content": response.content,
+    }
+    cache.set_many({_vary_key(request): vary, _page_key(request, vary): entry}, timeout)
+
+
+def cache_public_page(view):
+    """Decorator serving a view's pages to anonymous visitors from the cache, as
+    described above."""
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not cacheable_request(request):
+            return view(request, *args, **kwargs)
+
+        generation = content_generation()
+        vary = cache.get(_vary_key(request))
+        entry = cache.get(_page_key(request, vary)) if vary is not None else None
+        lock = None
+        if entry is not None:
+            if entry["generation"] == generation and time.time() < entry["expires"]:
+                return _from_entry(entry, "HIT")
+            lock = f"{_page_key(request, vary)}:lock"
+            if not cache.add(lock, 1, LOCK_TIMEOUT):
+                # Someone else is already rendering a fresh copy
+                return _from_entry(entry, "STALE")
+
+        response = view(request, *args, **kwargs)
+        response.headers["X-Cache"] = "MISS"
+        if callable(getattr(response, "render", None)):
+            response.add_post_render_callback(
+                lambda r: _store(request, r, generation, lock)
+            )
+        else:
+            _store(request, response, generation, lock)
+        return response
+
+    return wrapper
+
+
+def _feed_entry(request, response):
+    content = response.content
+    etag = f'W/"{hashlib.sha256(content).hexdigest()[:32]}"'
+    # Keep Last-Modified if a content change left this feed as it was
+    latest_key = f"{KEY_PREFIX}feed-latest:{_digest(request.build_absolute_uri())}"
+    latest = cache.get(latest_key)
+    if latest is not None and latest["etag"] == etag:
+        last_modified = latest["last_modified"]
+    else:
+        last_modified = int(time.time())
+    cache.set(latest_key, {"etag": etag, "last_modified": last_modified}, 30 * 86400)
+    return {
+        "content": content,
+        "gzip": gzip.compress(content, compresslevel=9, mtime=0),
+        "content_type": response["Content-Type"],
+        "etag": etag,
+        "last_modified": last_modified,
+    }
+
+
+def _feed_response(request, entry, state):
+    response = HttpResponse(content_type=entry["content_type"])
+    if "gzip" in accepted_encodings(request.headers.get("Accept-Encoding", "")):
+        response.content = entry["gzip"]
+        response.headers["Content-Encoding"] = "gzip"
+    else:
+        response.content = entry["content"]
+    response.headers["ETag"] = entry["etag"]
+    response.headers["Last-Modified"] = http_date(entry["last_modified"])
+    # Readers may keep a copy, but should check it's current every time they poll
+    response.headers["Cache-Control"] = "public, no-cache"
+    response.headers["X-Cache"] = state
+    patch_vary_headers(response, ["Accept-Encoding"])
+    return get_conditional_response(
+        request,
+        etag=entry["etag"],
+        last_modified=entry["last_modified"],
+        response=response,
+    )
+
+
+def cache_feed(feed):
+    """Decorator caching a feed view's output until the content generation changes,
+    for up to PAGECACHE_TIMEOUT seconds. Feeds don't vary by visitor, so they are
+    cached for everyone. Responses carry ETag and Last-Modified validators, for 304
+    Not Modified responses to conditional requests, and the body is stored gzipped
+    as well as plain."""
+
+    @wraps(feed)
+    def wrapper(request, *args, **kwargs):
+        if not settings.PAGECACHE_TIMEOUT or request.method not in ("GET", "HEAD"):
+            return feed(request, *args, **kwargs)
+        key = (
+            f"{KEY_PREFIX}feed:{content_generation()}:"
+            f"{_digest(request.build_absolute_uri())}"
+        )
+        entry = cache.get(key)
+        if entry is not None:
+            return _feed_response(request, entry, "HIT")
+        response = feed(request, *args, **kwargs)
+        if response.status_code != 200 or response.streaming:
+            return response
+        entry = _feed_entry(request, response)
+        cache.set(key, entry, settings.PAGECACHE_TIMEOUT)
+        return _feed_response(request, entry, "MISS")
+
+    return wrapper
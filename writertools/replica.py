@@ -0,0 +1,122 @@
+"""
+Send reporting reads to a read replica, when DATABASE_REPLICA_URL configures one.
+
+Only code running under reporting() (a decorator for views, or ReportingMixin for class
+based views) reads from the "replica" database; everything else, and every write, uses
+"default". A template response is rendered, and a streaming response is read, inside
+the reporting context too, so their lazy querysets also go to the replica.
+
+Replicas lag a little behind. So that users see their own changes, any successful
+unsafe request by a logged in user pins them to the primary database for
+REPLICA_PIN_TIMEOUT seconds (see PrimaryAfterWriteMiddleware). The pin is kept in
+their session, so it applies whichever process serves their next request.
+"""
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA = "replica"
+PIN_SESSION_KEY = "_replica_pin_until"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+SAME_DATABASE_KEYS = ("ENGINE", "HOST", "PORT", "NAME")
+
+_use_replica = ContextVar("use_replica", default=False)
+_done = object()
+
+
+def replica_configured():
+    """Whether there is a separate replica to read from. In tests the replica mirrors
+    the default database, so reads use the default connection, which can see the
+    test's uncommitted data."""
+    if REPLICA not in settings.DATABASES:
+        return False
+    replica = connections[REPLICA].settings_dict
+    default = connections[DEFAULT_DB_ALIAS].settings_dict
+    return any(replica[key] != default[key] for key in SAME_DATABASE_KEYS)
+
+
+def pin_to_primary(request):
+    request.session[PIN_SESSION_KEY] = time.time() + settings.REPLICA_PIN_TIMEOUT
+
+
+def pinned_to_primary(request):
+    session = getattr(request, "session", None)
+    pinned_until = session.get(PIN_SESSION_KEY) if session is not None else None
+    return pinned_until is not None and time.time() < pinned_until
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and replica_configured():
+            return REPLICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both databases hold the same data
+        return True
+
+
+def _in_replica(chunks):
+    chunks = iter(chunks)
+    while True:
+        # Set the context around each step, rather than across the yield
+        token = _use_replica.set(True)
+        try:
+            chunk = next(chunks, _done)
+        finally:
+            _use_replica.reset(token)
+        if chunk is _done:
+            return
+        yield chunk
+
+
+def reporting(view):
+    """Run a read-only view against the replica, unless the user is pinned to the
+    primary after a recent write."""
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not replica_configured() or pinned_to_primary(request):
+            return view(request, *args, **kwargs)
+        token = _use_replica.set(True)
+        try:
+            response = view(request, *args, **kwargs)
+            if callable(getattr(response, "render", None)):
+                response.render()
+        finally:
+            _use_replica.reset(token)
+        if response.streaming:
+            response.streaming_content = _in_replica(response.streaming_content)
+        return response
+
+    return wrapper
+
+
+class ReportingMixin:
+    """Class based view version of @reporting."""
+
+    def dispatch(self, request, *args, **kwargs):
+        return reporting(super().dispatch)(request, *args, **kwargs)
+
+
+class PrimaryAfterWriteMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            request.method not in SAFE_METHODS
+            and response.status_code < 400
+            and replica_configured()
+            and getattr(request, "user", None) is not None
+            and request.user.is_authenticated
+        ):
+            pin_to_primary(request)
+        return response
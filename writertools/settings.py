@@ -48,11 +48,55 @@ ALLOWED_HOSTS = env("ALLOWED_HOSTS", default=[])
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 SQLITE_DB = BASE_DIR / "var" / "db.sqlite3"
 DATABASES = {"default": env.db("DATABASE_URL", default=f"sqlite:///{SQLITE_DB}")}
+# Opt-in tuning for SQLite under concurrent writes: WAL journal, bigger caches, and
+# BEGIN IMMEDIATE transactions. Compare with `manage.py benchmark_sqlite`.
+SQLITE_TUNING = env("SQLITE_TUNING", default=False)
+if SQLITE_TUNING and DATABASES["default"]["ENGINE"] == "django.db.backends.sqlite3":
+    DATABASES["default"]["ENGINE"] = "writertools.sqlite"
+    DATABASES["default"].setdefault("OPTIONS", {}).setdefault("timeout", 20)
+# Optional read replica for reporting views (see writertools/replica.py). Users are read
+# from the primary for REPLICA_PIN_TIMEOUT seconds after they change anything.
+if env("DATABASE_REPLICA_URL", default=""):
+    DATABASES["replica"] = env.db("DATABASE_REPLICA_URL")
+    # Tests read the "replica" through the default test database's connection
+    DATABASES["replica"]["TEST"] = {"MIRROR": "default"}
+    DATABASE_ROUTERS = ["writertools.replica.ReplicaRouter"]
+REPLICA_PIN_TIMEOUT = env.int("REPLICA_PIN_TIMEOUT", default=10)
 CACHES = {"default": env.cache("CACHE_URL", default="locmemcache://")}
+# Sessions are stored per SESSION_BACKEND: "db" (the default), "cached_db", "cache" or
+# "signed_cookies". Cache sessions use the default cache, or their own if
+# SESSION_CACHE_URL is set; either way, it must be shared by all web processes (e.g.
+# Redis, memcached).
+SESSION_BACKEND = env("SESSION_BACKEND", default="db")
+SESSION_ENGINE = f"django.contrib.sessions.backends.{SESSION_BACKEND}"
+if env("SESSION_CACHE_URL", default=""):
+    CACHES["sessions"] = env.cache("SESSION_CACHE_URL")
+    SESSION_CACHE_ALIAS = "sessions"
+# Logged in users are cached too, in the sessions' cache, with cache sessions (see
+# writertools/auth.py and AUTHENTICATION_BACKENDS). 0 turns this off.
+AUTH_USER_CACHE_TIMEOUT = env.int(
+    "AUTH_USER_CACHE_TIMEOUT",
+    default=300 if SESSION_BACKEND in ("cache", "cached_db") else 0,
+)
+# Public pages are cached for anonymous visitors (see writertools/pagecache.py): fresh
+# for PAGECACHE_TIMEOUT seconds or until content changes, then served stale for up to
+# PAGECACHE_STALE_TIMEOUT more while a single request renders a new copy.
+# Needs a CACHE_URL shared by all web processes, so it is off (both 0) without one.
+PAGECACHE_TIMEOUT = env.int(
+    "PAGECACHE_TIMEOUT", default=300 if env("CACHE_URL", default="") else 0
+)
+PAGECACHE_STALE_TIMEOUT = env.int(
+    "PAGECACHE_STALE_TIMEOUT", default=3600 if env("CACHE_URL", default="") else 0
+)
 # Email settings don't use a dict. Add to local vars instead.
 # https://django-environ.readthedocs.io/en/latest/#email-settings
 EMAIL_CONFIG = env.email_url("EMAIL_URL", default="consolemail://")
 vars().update(EMAIL_CONFIG)
+# Mail is sent from a background thread by default, so that signups etc. don't wait on
+# the mail server. See writertools/mail.py.
+if env.bool("EMAIL_QUEUE", default=True):
+    QUEUED_EMAIL_BACKEND = EMAIL_CONFIG["EMAIL_BACKEND"]
+    EMAIL_BACKEND = "writertools.mail.QueuedEmailBackend"
 
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/3.2/howto/static-files/
@@ -65,14 +109,18 @@ MEDIA_ROOT = BASE_DIR / "var" / "media"
 if not MEDIA_ROOT.exists():
     MEDIA_ROOT.mkdir(parents=True, exist_ok=True)
 # ManifestStaticFilesStorage is recommended in production, to prevent outdated
-# Javascript / CSS assets being served from cache.
+# Javascript / CSS assets being served from cache. Ours also writes gzip (and brotli,
+# if installed) variants of each file.
 # See https://docs.djangoproject.com/en/3.2/ref/contrib/staticfiles/#manifeststaticfilesstorage
-STATICFILES_STORAGE = "django.contrib.staticfiles.storage.ManifestStaticFilesStorage"
+STATICFILES_STORAGE = "writertools.storage.CompressedManifestStaticFilesStorage"
 if env("TESTING_MODE", default=False):
     # Prevents errors with different test runs stomping on each other's manifests
     STATICFILES_STORAGE = "django.contrib.staticfiles.storage.StaticFilesStorage"
 # But for production, you almost certainly should be using a shared storage backend, like:
 # https://django-storages.readthedocs.io/en/latest/backends/amazon-S3.html
+# Or, with SERVE_STATIC=True, serve the precompressed files from STATIC_ROOT with
+# far-future cache headers, without a separate web server. See MIDDLEWARE below.
+SERVE_STATIC = env("SERVE_STATIC", default=False)
 
 # CELERY settings
 # If the environment has not provided settings, assume there is no broker
@@ -84,6 +132,20 @@ CELERY_BROKER_URL = env("CELERY_BROKER_URL", default="redis://localhost:6379/7")
 CELERY_RESULT_BACKEND = env("CELERY_RESULT_BACKEND", default="")
 CELERY_TIME_ZONE = TIME_ZONE
 CELERY_BEAT_SCHEDULER = "django_celery_beat.schedulers:DatabaseScheduler"
+# Background tasks: see writertools/tasks.py. Without a broker, run them on a thread
+# pool in the web process.
+TASKS_EXECUTOR = env(
+    "TASKS_EXECUTOR", default="thread" if CELERY_TASK_ALWAYS_EAGER else "celery"
+)
+TASKS_THREADS = env("TASKS_THREADS", default=4)
+TASKS_STATUS_TIMEOUT = 24 * 60 * 60
+# Periodic tasks, for Celery beat. Without Celery, run `manage.py clearsessions` daily.
+CELERY_BEAT_SCHEDULE = {
+    "clear-sessions": {
+        "task": "writertools.tasks.clear_sessions",
+        "schedule": 24 * 60 * 60,
+    },
+}
 
 
 #######################################################################
@@ -93,8 +155,10 @@ WSGI_APPLICATION = "writertools.wsgi.application"
 ROOT_URLCONF = "writertools.urls"
 
 INSTALLED_APPS = [
+    "writertools",
     "plotboard",
     "wordtracker",
+    "api",
     "genericsite",
     "django_bootstrap5",
     "allauth",
@@ -124,11 +188,21 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    # Activate the logged in user's time zone
+    "wordtracker.middleware.TimezoneMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     # https://docs.djangoproject.com/en/3.2/ref/clickjacking/
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "allauth.account.middleware.AccountMiddleware",
 ]
+if "replica" in DATABASES:
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index("django.contrib.auth.middleware.AuthenticationMiddleware") + 1,
+        "writertools.replica.PrimaryAfterWriteMiddleware",
+    )
+if SERVE_STATIC:
+    # Right after SecurityMiddleware, so static requests skip sessions, auth, etc.
+    MIDDLEWARE.insert(1, "writertools.middleware.StaticFilesMiddleware")
 
 TEMPLATES = [
     {
@@ -151,6 +225,14 @@ TEMPLATES = [
     },
 ]
 
+#######################################################################
+# WORDTRACKER
+#######################################################################
+# Per-user request limits, as "requests/period" where period is s, m, h or d, or None
+# for no limit. "read" applies to GET requests on any view; others to writes on that
+# view. Overrides wordtracker.ratelimit.DEFAULT_RATE_LIMITS scope by scope.
+WORDTRACKER_RATE_LIMITS = {}
+
 #######################################################################
 # AUTHENTICATION
 #######################################################################
@@ -160,6 +242,13 @@ AUTHENTICATION_BACKENDS = [
     # `allauth` specific authentication methods, such as login by e-mail
     "allauth.account.auth_backends.AuthenticationBackend",
 ]
+if AUTH_USER_CACHE_TIMEOUT:
+    # The same, caching users. Sessions record their backend's path, so turning the
+    # user cache on or off logs everyone out once.
+    AUTHENTICATION_BACKENDS = [
+        "writertools.auth.CachedModelBackend",
+        "writertools.auth.CachedAuthenticationBackend",
+    ]
 # https://django-allauth.readthedocs.io/en/latest/configuration.html
 ACCOUNT_ADAPTER = "writertools.auth.ProjectAuthAdapter"
 ACCOUNT_AUTHENTICATION_METHOD = "username_email"
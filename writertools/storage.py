@@ -0,0 +1,58 @@
+"""
+Static file storage that writes precompressed copies of collected assets.
+
+Alongside each file (original and hashed name) that is worth compressing, collectstatic
+writes a ``.gz`` variant and, when the optional ``brotli`` package is installed, a
+``.br`` variant. These are served by ``writertools.middleware.StaticFilesMiddleware``.
+"""
+import gzip
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    # Already-compressed formats (images, woff2, etc.) gain nothing from another pass.
+    compressible_extensions = (
+        ".css",
+        ".js",
+        ".json",
+        ".map",
+        ".svg",
+        ".txt",
+        ".xml",
+        ".html",
+        ".ico",
+        ".ttf",
+        ".otf",
+        ".eot",
+    )
+    # Skip tiny files, where headers cost more than the savings.
+    compress_min_size = 256
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        for name in {*paths, *self.hashed_files.values()}:
+            if name.endswith(self.compressible_extensions) and self.exists(name):
+                self.compress(name)
+
+    def compress(self, name):
+        """Write compressed variants of the named file, if they are smaller."""
+        path = self.path(name)
+        with open(path, "rb") as f:
+            content = f.read()
+        if len(content) < self.compress_min_size:
+            return
+        variants = {".gz": gzip.compress(content, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variants[".br"] = brotli.compress(content)
+        for suffix, compressed in variants.items():
+            if len(compressed) < len(content):
+                with open(path + suffix, "wb") as f:
+                    f.write(compressed)
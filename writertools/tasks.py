@@ -0,0 +1,156 @@
+"""
+A small background task layer, so that slow jobs (imports, exports, archiving) don't tie
+up web workers.
+
+Decorate a function with @task and start it with enqueue(). Task functions receive a Job
+as their first argument, which they can use to report progress; their other arguments
+and return value must be JSON serializable. Clients poll the job's status at
+``reverse("task_status", args=[job_id])``.
+
+Where tasks run depends on settings.TASKS_EXECUTOR:
+
+* "celery" sends them to the Celery broker (requires the celery package and workers).
+* "thread" runs them on a thread pool inside the web process. This is the default when
+  CELERY_TASK_ALWAYS_EAGER is set, so development needs no broker.
+* "inline" runs them immediately, in the caller. Useful in tests.
+
+Job status is kept in the default cache for TASKS_STATUS_TIMEOUT seconds, so unless
+tasks run inline the cache must be shared by every web and worker process (e.g. Redis):
+otherwise a poll that reaches another process finds no such job. The writertools.W001
+system check warns about a per-process cache.
+"""
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+
+try:
+    from celery import shared_task
+except ImportError:
+    shared_task = None
+
+logger = logging.getLogger(__name__)
+
+PENDING = "PENDING"
+RUNNING = "RUNNING"
+SUCCESS = "SUCCESS"
+FAILURE = "FAILURE"
+
+registry = {}
+_executor = None
+
+
+class Job:
+    """The status of one run of a task, stored in the cache."""
+
+    def __init__(self, job_id, status=None):
+        self.id = job_id
+        self.status = status or {}
+
+    @staticmethod
+    def key(job_id):
+        return f"tasks:job:{job_id}"
+
+    @classmethod
+    def get(cls, job_id):
+        status = cache.get(cls.key(job_id))
+        return cls(job_id, status) if status else None
+
+    def save(self, **changes):
+        self.status.update(changes)
+        cache.set(self.key(self.id), self.status, settings.TASKS_STATUS_TIMEOUT)
+
+    def progress(self, done, total=None):
+        """Report progress, as `done` out of `total` units of work."""
+        self.save(progress={"done": done, "total": total})
+
+
+def task(func):
+    """Register a function as a background task. Call it with enqueue()."""
+    name = f"{func.__module__}.{func.__name__}"
+    registry[name] = func
+    func.task_name = name
+    return func
+
+
+def enqueue(func, *args, user=None) -> str:
+    """Start a task in the background and return its job id. If `user` is given,
+    only that user can see the job's status."""
+    job = Job(uuid.uuid4().hex)
+    job.save(
+        id=job.id,
+        task=func.task_name,
+        state=PENDING,
+        user=user.pk if user else None,
+        progress=None,
+        result=None,
+        error=None,
+    )
+    executor = settings.TASKS_EXECUTOR
+    if executor == "celery" and run_celery_task is not None:
+        run_celery_task.delay(func.task_name, job.id, list(args))
+    elif executor == "inline":
+        run_task(func.task_name, job.id, args)
+    else:
+        get_executor().submit(run_thread_task, func.task_name, job.id, args)
+    return job.id
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.TASKS_THREADS, thread_name_prefix="tasks"
+        )
+    return _executor
+
+
+def run_task(name, job_id, args):
+    job = Job.get(job_id) or Job(job_id, {"id": job_id, "task": name})
+    job.save(state=RUNNING)
+    try:
+        result = registry[name](job, *args)
+    except Exception as e:
+        logger.exception("Task %s (%s) failed", name, job_id)
+        job.save(state=FAILURE, error=str(e))
+    else:
+        job.save(state=SUCCESS, result=result)
+
+
+def run_thread_task(name, job_id, args):
+    # Each pool thread has its own database connections. Treat each task like a
+    # request, so they are closed or recycled per CONN_MAX_AGE.
+    close_old_connections()
+    try:
+        run_task(name, job_id, args)
+    finally:
+        close_old_connections()
+
+
+if shared_task is not None:
+
+    @shared_task(name="writertools.tasks.run")
+    def run_celery_task(name, job_id, args):
+        if name not in registry:
+            # Worker processes haven't imported the task's module yet
+            import_module(name.rpartition(".")[0])
+        return run_task(name, job_id, args)
+
+else:
+    run_celery_task = None
+
+
+def clear_sessions():
+    """Delete expired sessions, like `manage.py clearsessions`. Cache and cookie
+    sessions expire on their own."""
+    import_module(settings.SESSION_ENGINE).SessionStore.clear_expired()
+
+
+if shared_task is not None:
+    # A plain Celery task for CELERY_BEAT_SCHEDULE, rather than a @task: periodic runs
+    # belong to no one, so there is no job status for anyone to poll.
+    shared_task(name="writertools.tasks.clear_sessions")(clear_sessions)
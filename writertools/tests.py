@@ -0,0 +1,675 @@
+import gzip
+import json
+import smtplib
+import tempfile
+import time
+from datetime import date
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock
+
+from allauth.account.models import EmailAddress
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.contrib.sites.models import Site
+from django.core import mail
+from django.core.cache import cache, caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.mail.backends.locmem import EmailBackend as LocmemEmailBackend
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connection, models
+from django.db.utils import ConnectionHandler
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from easy_thumbnails.alias import aliases
+from easy_thumbnails.files import get_thumbnailer
+from PIL import Image
+
+from plotboard.models import Board, Card
+from wordtracker.models import WorkSession
+from writertools import mail as mail_queue
+from writertools import pagecache, replica, thumbnails
+from writertools.auth import user_cache_key
+from writertools.checks import check_shared_cache
+from writertools.management.commands.loadtest import percentile
+from writertools.middleware import StaticFilesMiddleware, accepted_encodings
+from writertools.storage import CompressedManifestStaticFilesStorage
+from writertools.tasks import FAILURE, SUCCESS, Job, clear_sessions, enqueue, task
+
+
+@task
+def add(job, a, b):
+    job.progress(1, 1)
+    return a + b
+
+
+@task
+def fail(job):
+    raise RuntimeError("boom")
+
+
+class SQLiteTuningTest(SimpleTestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.handler = ConnectionHandler(
+            {
+                DEFAULT_DB_ALIAS: {
+                    "ENGINE": "writertools.sqlite",
+                    "NAME": str(Path(tmpdir.name) / "db.sqlite3"),
+                    "OPTIONS": {"timeout": 0},
+                }
+            }
+        )
+
+    def connect(self):
+        conn = self.handler.create_connection(DEFAULT_DB_ALIAS)
+        self.addCleanup(conn.close)
+        return conn
+
+    def test_pragmas_applied(self):
+        conn = self.connect()
+        with conn.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode")
+            self.assertEqual(cursor.fetchone()[0], "wal")
+            cursor.execute("PRAGMA synchronous")
+            # 1 == NORMAL
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    def test_transactions_take_write_lock_immediately(self):
+        first, second = self.connect(), self.connect()
+        first.ensure_connection()
+        second.ensure_connection()
+        first._start_transaction_under_autocommit()
+        self.addCleanup(first.rollback)
+        with self.assertRaisesMessage(OperationalError, "locked"):
+            second._start_transaction_under_autocommit()
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command(
+            "benchmark_sqlite", writers=2, transactions=5, profile="tuned", stdout=out
+        )
+        self.assertIn("tuned", out.getvalue())
+
+
+class PrecompressedStaticTest(SimpleTestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.root = Path(tmpdir.name) / "static"
+        source = Path(tmpdir.name) / "src"
+        source.mkdir()
+        source.joinpath("app.css").write_text("body { color: black; }\n" * 100)
+        source.joinpath("tiny.css").write_text("p {}")
+        storage = CompressedManifestStaticFilesStorage(location=self.root)
+        src = FileSystemStorage(location=source)
+        paths = {}
+        for name in ("app.css", "tiny.css"):
+            with src.open(name) as f:
+                storage.save(name, f)
+            paths[name] = (src, name)
+        list(storage.post_process(paths))
+        self.hashed = storage.hashed_files["app.css"]
+        self.storage, self.paths = storage, paths
+
+    def test_collect_writes_compressed_variants(self):
+        for name in ("app.css", self.hashed):
+            compressed = self.root / f"{name}.gz"
+            self.assertTrue(compressed.exists(), name)
+            self.assertEqual(
+                gzip.decompress(compressed.read_bytes()),
+                (self.root / name).read_bytes(),
+            )
+        self.assertFalse((self.root / "tiny.css.gz").exists())
+
+    def test_dry_run_keeps_manifest(self):
+        manifest = self.root / self.storage.manifest_name
+        before = manifest.read_text()
+        list(self.storage.post_process(self.paths, dry_run=True))
+        self.assertEqual(manifest.read_text(), before)
+
+    def get(self, path, **headers):
+        with override_settings(STATIC_ROOT=self.root):
+            middleware = StaticFilesMiddleware(lambda request: HttpResponse(status=404))
+        middleware.hashed_names = {self.hashed}
+        return middleware(RequestFactory().get(path, headers=headers))
+
+    def test_serves_precompressed_variant(self):
+        resp = self.get(f"/static/{self.hashed}", accept_encoding="deflate, gzip")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp["Content-Encoding"], "gzip")
+        self.assertEqual(resp["Content-Type"], "text/css")
+        self.assertIn("Accept-Encoding", resp["Vary"])
+        self.assertIn("immutable", resp["Cache-Control"])
+        body = gzip.decompress(b"".join(resp.streaming_content))
+        self.assertEqual(body, (self.root / self.hashed).read_bytes())
+
+    def test_serves_identity_and_short_cache_for_unhashed(self):
+        resp = self.get("/static/app.css", accept_encoding="gzip;q=0")
+        self.assertFalse(resp.has_header("Content-Encoding"))
+        self.assertNotIn("immutable", resp["Cache-Control"])
+
+    def test_missing_and_traversal_fall_through(self):
+        self.assertEqual(self.get("/static/nope.css").status_code, 404)
+        self.assertEqual(self.get("/static/../../etc/passwd").status_code, 404)
+
+    def test_accepted_encodings(self):
+        self.assertEqual(accepted_encodings("gzip, br;q=0.5, *;q=0"), {"gzip", "br"})
+
+
+class TaskTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create(username="writer")
+
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(TASKS_EXECUTOR="inline")
+    def test_inline_task_and_status(self):
+        job_id = enqueue(add, 2, 3, user=self.user)
+        self.client.force_login(self.user)
+        status = self.client.get(reverse("task_status", args=[job_id])).json()
+        self.assertEqual(status["state"], SUCCESS)
+        self.assertEqual(status["result"], 5)
+        self.assertEqual(status["progress"], {"done": 1, "total": 1})
+
+    @override_settings(TASKS_EXECUTOR="inline")
+    def test_failure_recorded(self):
+        with self.assertLogs("writertools.tasks", "ERROR"):
+            job_id = enqueue(fail)
+        self.assertEqual(Job.get(job_id).status["state"], FAILURE)
+        self.assertEqual(Job.get(job_id).status["error"], "boom")
+
+    @override_settings(TASKS_EXECUTOR="thread")
+    def test_thread_pool(self):
+        job_id = enqueue(add, 1, 1)
+        deadline = time.monotonic() + 5
+        while Job.get(job_id).status["state"] != SUCCESS:
+            self.assertLess(time.monotonic(), deadline, "Task did not finish")
+            time.sleep(0.01)
+        self.assertEqual(Job.get(job_id).status["result"], 2)
+
+    @override_settings(TASKS_EXECUTOR="inline")
+    def test_status_is_private(self):
+        job_id = enqueue(add, 1, 1, user=self.user)
+        other = get_user_model().objects.create(username="other")
+        self.client.force_login(other)
+        resp = self.client.get(reverse("task_status", args=[job_id]))
+        self.assertEqual(resp.status_code, 404)
+
+    def test_shared_cache_check(self):
+        local = {
+            "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+        }
+        with override_settings(CACHES=local, DEBUG=False, TASKS_EXECUTOR="thread"):
+            self.assertEqual(
+                [w.id for w in check_shared_cache(None)], ["writertools.W001"]
+            )
+        with override_settings(CACHES=local, DEBUG=False, TASKS_EXECUTOR="inline"):
+            self.assertEqual(check_shared_cache(None), [])
+
+
+class GenerateDataTest(TestCase):
+    def generate(self, prefix):
+        call_command(
+            "generate_data",
+            users=3,
+            days=60,
+            seed=42,
+            end_date=date(2024, 3, 1),
+            prefix=prefix,
+            stdout=StringIO(),
+        )
+        user = get_user_model().objects.get(username=f"{prefix}00002")
+        return (
+            list(
+                WorkSession.objects.filter(user=user)
+                .order_by("id")
+                .values_list("startdate", "wordcount", "duration")
+            ),
+            list(
+                Card.objects.filter(board__owner=user)
+                .order_by("id")
+                .values_list("name", "excerpt", "_order")
+            ),
+        )
+
+    def test_reproducible(self):
+        sessions, cards = self.generate("one")
+        self.assertTrue(sessions)
+        self.assertTrue(cards)
+        self.assertEqual((sessions, cards), self.generate("two"))
+        self.assertTrue(
+            EmailAddress.objects.filter(email="one00001@example.com", verified=True)
+        )
+        self.assertTrue(self.client.login(username="one00001", password="loadtest"))
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 95), 7)
+        self.assertEqual(percentile([], 95), 0)
+
+
+@override_settings(PAGECACHE_TIMEOUT=300, PAGECACHE_STALE_TIMEOUT=3600)
+class PageCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.renders = 0
+
+        @pagecache.cache_public_page
+        def view(request):
+            self.renders += 1
+            response = HttpResponse(f"render {self.renders}")
+            response.headers["Vary"] = "Accept-Language, Cookie"
+            if request.GET.get("cookie"):
+                response.set_cookie("seen", "1")
+            return response
+
+        self.view = view
+
+    def get(self, path="/article.html", user=None, **headers):
+        request = RequestFactory().get(path, headers=headers)
+        request.user = user or AnonymousUser()
+        return self.view(request)
+
+    @override_settings(DEBUG=False, TASKS_EXECUTOR="inline")
+    def test_shared_cache_check(self):
+        local = {
+            "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+        }
+        with override_settings(CACHES=local):
+            self.assertIn("PAGECACHE_TIMEOUT", check_shared_cache(None)[0].hint)
+        off = {"PAGECACHE_TIMEOUT": 0, "PAGECACHE_STALE_TIMEOUT": 0}
+        with override_settings(CACHES=local, **off):
+            self.assertEqual(check_shared_cache(None), [])
+
+    def test_serves_anonymous_from_cache(self):
+        self.assertEqual(self.get().headers["X-Cache"], "MISS")
+        resp = self.get()
+        self.assertEqual(resp.headers["X-Cache"], "HIT")
+        self.assertEqual(resp.content, b"render 1")
+        self.assertEqual(resp.headers["Vary"], "Accept-Language, Cookie")
+
+        user = get_user_model().objects.create(username="writer")
+        self.assertEqual(self.get(user=user).content, b"render 2")
+        self.get("/?cookie=1")
+        self.assertEqual(self.get("/?cookie=1").content, b"render 4")
+
+    def test_pages_with_csrf_token_not_stored(self):
+        @pagecache.cache_public_page
+        def form(request):
+            token = get_token(request)
+            return HttpResponse(f'<input name="csrfmiddlewaretoken" value="{token}">')
+
+        for _ in range(2):
+            request = RequestFactory().get("/contact.html")
+            request.user = AnonymousUser()
+            self.assertEqual(form(request).headers["X-Cache"], "MISS")
+
+    def test_vary(self):
+        self.get(accept_language="en")
+        self.assertEqual(self.get(accept_language="fr").content, b"render 2")
+        self.assertEqual(self.get(accept_language="en").content, b"render 1")
+
+    def test_content_change_revalidates(self):
+        self.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            Site.objects.get_current().save()
+        # While another request holds the lock to render a new copy, serve the old one
+        request = RequestFactory().get("/article.html")
+        lock = f"{pagecache._page_key(request, ['accept-language'])}:lock"
+        cache.add(lock, 1)
+        resp = self.get()
+        self.assertEqual(resp.headers["X-Cache"], "STALE")
+        self.assertEqual(resp.content, b"render 1")
+        cache.delete(lock)
+
+        self.assertEqual(self.get().content, b"render 2")
+        self.assertEqual(self.get().headers["X-Cache"], "HIT")
+
+
+@override_settings(PAGECACHE_TIMEOUT=300)
+class FeedCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.renders = 0
+
+        @pagecache.cache_feed
+        def feed(request):
+            self.renders += 1
+            return HttpResponse(
+                "<rss>items</rss>", content_type="application/rss+xml; charset=utf-8"
+            )
+
+        self.feed = feed
+
+    def get(self, **headers):
+        return self.feed(RequestFactory().get("/feed/", headers=headers))
+
+    def test_conditional_and_compressed(self):
+        resp = self.get()
+        self.assertEqual(resp.content, b"<rss>items</rss>")
+        self.assertEqual(resp.headers["Vary"], "Accept-Encoding")
+        resp = self.get(accept_encoding="gzip, br")
+        self.assertEqual(resp.headers["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(resp.content), b"<rss>items</rss>")
+        resp = self.get(if_none_match=resp.headers["ETag"])
+        self.assertEqual(resp.status_code, 304)
+        resp = self.get(if_modified_since=resp.headers["Last-Modified"])
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(self.renders, 1)
+
+    def test_regenerated_on_publish(self):
+        etag = self.get().headers["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            Site.objects.get_current().save()
+        # Regenerated, but unchanged, so pollers still get 304s
+        resp = self.get(if_none_match=etag)
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(self.renders, 2)
+
+    @override_settings(PAGECACHE_TIMEOUT=0)
+    def test_expires_with_pages(self):
+        self.get()
+        self.get()
+        self.assertEqual(self.renders, 2)
+
+
+class Upload(models.Model):
+    """A model with a file field, standing in for genericsite's in ThumbnailTest."""
+
+    id = models.AutoField(primary_key=True)
+    file = models.FileField(upload_to="uploads", blank=True, null=True)
+
+
+@override_settings(TASKS_EXECUTOR="inline")
+class ThumbnailTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # writertools has no models module, so the test database lacks this table.
+        # Create it outside the class transaction, as SQLite requires.
+        with connection.schema_editor() as editor:
+            editor.create_model(Upload)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        with connection.schema_editor() as editor:
+            editor.delete_model(Upload)
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = override_settings(MEDIA_ROOT=media.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        for patch in (
+            mock.patch.object(thumbnails, "THUMBNAIL_APPS", {"writertools"}),
+            mock.patch.object(aliases, "_aliases", {}),
+        ):
+            patch.start()
+            self.addCleanup(patch.stop)
+        aliases.set("small", {"size": (16, 16)}, target="writertools")
+
+    def image(self):
+        content = BytesIO()
+        Image.new("RGB", (64, 48), "teal").save(content, "PNG")
+        return ContentFile(content.getvalue(), name="cover.png")
+
+    def test_aliases_generated_on_save(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            upload = Upload.objects.create(file=self.image())
+        options = aliases.get("small", target=upload.file)
+        thumbnail = get_thumbnailer(upload.file).get_existing_thumbnail(options)
+        self.assertIsNotNone(thumbnail)
+        self.assertTrue(Path(thumbnail.path).exists())
+
+    def test_command_skips_empty_fields(self):
+        Upload.objects.create(file="")
+        # Saving a model stores a missing file as "", but NULLs can still get in
+        Upload.objects.filter(pk=Upload.objects.create().pk).update(file=None)
+        Upload.objects.create(file=self.image())
+        out = StringIO()
+        call_command("generate_thumbnails", workers=1, replace=True, stdout=out)
+        self.assertIn("1 thumbnails for 1 files", out.getvalue())
+        self.assertEqual(thumbnails.make_aliases("writertools.Upload", 999, "file"), 0)
+
+
+@override_settings(
+    SESSION_ENGINE="django.contrib.sessions.backends.cache",
+    AUTH_USER_CACHE_TIMEOUT=300,
+    AUTHENTICATION_BACKENDS=[
+        "writertools.auth.CachedModelBackend",
+        "writertools.auth.CachedAuthenticationBackend",
+    ],
+)
+class CachedSessionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user("writer", password="x")
+        self.client.force_login(self.user)
+
+    def test_no_session_or_user_queries(self):
+        board = Board.objects.create(name="Novel", owner=self.user)
+        self.client.get(reverse("wordtracker:dashboard"))
+        with self.assertNumQueries(1):  # The project list
+            self.client.get(reverse("wordtracker:dashboard"))
+        with self.assertNumQueries(3):  # Board, cards and sequences
+            self.client.get(board.get_absolute_url())
+
+    def test_saving_user_drops_cached_copy(self):
+        self.client.get(reverse("wordtracker:dashboard"))
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        resp = self.client.get(reverse("wordtracker:dashboard"))
+        self.assertEqual(resp.status_code, 302)
+
+    def test_users_cached_with_sessions(self):
+        locmem = "django.core.cache.backends.locmem.LocMemCache"
+        separate = {
+            "default": {"BACKEND": locmem},
+            "sessions": {"BACKEND": locmem, "LOCATION": "sessions"},
+        }
+        with override_settings(CACHES=separate, SESSION_CACHE_ALIAS="sessions"):
+            self.client.force_login(self.user)
+            self.client.get(reverse("wordtracker:dashboard"))
+            key = user_cache_key(self.user.pk)
+            self.assertIsNone(cache.get(key))
+            self.assertIsNotNone(caches["sessions"].get(key))
+            with self.captureOnCommitCallbacks(execute=True):
+                self.user.save()
+            self.assertIsNone(caches["sessions"].get(key))
+
+
+class ClearSessionsTest(TestCase):
+    def test_clears_expired_db_sessions(self):
+        session = SessionStore()
+        session.set_expiry(-1)
+        session.create()
+        clear_sessions()
+        self.assertFalse(Session.objects.exists())
+
+
+@mock.patch.object(replica, "replica_configured", return_value=True)
+class ReplicaTest(SimpleTestCase):
+    def request(self, method="get", user=None):
+        request = getattr(RequestFactory(), method)("/")
+        request.session = SessionStore()
+        request.user = user or AnonymousUser()
+        return request
+
+    def test_router_reads_replica_only_when_reporting(self, configured):
+        router = replica.ReplicaRouter()
+        read_from = []
+
+        @replica.reporting
+        def view(request):
+            read_from.append(router.db_for_read(WorkSession))
+            return HttpResponse()
+
+        self.assertIsNone(router.db_for_read(WorkSession))
+        view(self.request())
+        self.assertEqual(read_from, ["replica"])
+        self.assertIsNone(router.db_for_read(WorkSession))
+        self.assertEqual(router.db_for_write(WorkSession), "default")
+
+    def test_streaming_content_read_in_replica(self, configured):
+        def chunks():
+            yield str(replica._use_replica.get())
+            yield str(replica._use_replica.get())
+
+        self.assertEqual(list(replica._in_replica(chunks())), ["True", "True"])
+        self.assertFalse(replica._use_replica.get())
+
+    def test_pinned_after_write(self, configured):
+        user = get_user_model()(pk=1, username="writer")
+        for method, status, user, pinned in [
+            ("post", 200, user, True),
+            ("post", 302, user, True),
+            ("get", 200, user, False),
+            ("post", 400, user, False),
+            ("post", 200, None, False),
+        ]:
+            request = self.request(method, user)
+            middleware = replica.PrimaryAfterWriteMiddleware(
+                lambda request: HttpResponse(status=status)
+            )
+            middleware(request)
+            self.assertEqual(
+                replica.pinned_to_primary(request), pinned, (method, status, user)
+            )
+
+    def test_pinned_requests_read_primary(self, configured):
+        request = self.request("post", get_user_model()(pk=1, username="writer"))
+        replica.pin_to_primary(request)
+        view = replica.reporting(
+            lambda request: HttpResponse(str(replica._use_replica.get()))
+        )
+        self.assertEqual(view(request).content, b"False")
+        with override_settings(REPLICA_PIN_TIMEOUT=-1):
+            replica.pin_to_primary(request)
+        self.assertEqual(view(request).content, b"True")
+
+
+class FlakyEmailBackend(LocmemEmailBackend):
+    """Drops the connection on a message whose subject is in `flaky`, as many times as
+    it says; refuses messages with a subject in `refused`. Counts connections opened.
+    QueuedEmailTest resets this state for each test."""
+
+    opened = 0
+    flaky = {}
+    refused = set()
+
+    def open(self):
+        if not getattr(self, "connected", False):
+            self.connected = True
+            FlakyEmailBackend.opened += 1
+
+    def close(self):
+        self.connected = False
+
+    def send_messages(self, messages):
+        for message in messages:
+            if self.flaky.get(message.subject):
+                self.flaky[message.subject] -= 1
+                raise ConnectionError("try again")
+            if message.subject in self.refused:
+                raise smtplib.SMTPRecipientsRefused({})
+        return super().send_messages(messages)
+
+
+@override_settings(
+    EMAIL_BACKEND="writertools.mail.QueuedEmailBackend",
+    QUEUED_EMAIL_BACKEND="writertools.tests.FlakyEmailBackend",
+    TASKS_EXECUTOR="thread",
+)
+class QueuedEmailTest(SimpleTestCase):
+    def setUp(self):
+        for patch in (
+            mock.patch.object(FlakyEmailBackend, "opened", 0),
+            mock.patch.object(FlakyEmailBackend, "flaky", {}),
+            mock.patch.object(FlakyEmailBackend, "refused", set()),
+            mock.patch.object(mail_queue, "RETRY_DELAY", 0),
+        ):
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.messages = [
+            mail.EmailMessage(f"Message {n}", "Hi", to=["w@example.com"])
+            for n in range(3)
+        ]
+
+    def subjects(self):
+        return [m.subject for m in mail.outbox]
+
+    def test_sends_in_background(self):
+        sent = mail.send_mail("Confirm", "Hi", "site@example.com", ["w@example.com"])
+        self.assertEqual(sent, 1)
+        self.assertTrue(mail_queue.flush(5))
+        self.assertEqual(self.subjects(), ["Confirm"])
+
+    def test_batch_shares_connection(self):
+        self.assertEqual(mail_queue.deliver(self.messages), 3)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(FlakyEmailBackend.opened, 1)
+
+    def test_connection_kwargs_passed_on(self):
+        with mock.patch.object(
+            mail_queue, "get_connection", wraps=mail.get_connection
+        ) as get_connection:
+            mail.get_connection(timeout=5).send_messages(self.messages[:1])
+            mail.get_connection().send_messages(self.messages[1:])
+            self.assertTrue(mail_queue.flush(5))
+        self.assertEqual(len(mail.outbox), 3)
+        timeouts = {c.kwargs.get("timeout") for c in get_connection.call_args_list}
+        self.assertEqual(timeouts, {5, None})
+
+    def test_refused_message_dropped(self):
+        FlakyEmailBackend.refused.add("Message 1")
+        with self.assertLogs("writertools.mail", "ERROR"):
+            self.assertEqual(mail_queue.deliver(self.messages), 3)
+        self.assertEqual(self.subjects(), ["Message 0", "Message 2"])
+        self.assertEqual(FlakyEmailBackend.opened, 1)
+
+    def test_connection_failure_requeues_batch_once(self):
+        FlakyEmailBackend.flaky.update({"Message 1": 1, "Message 2": 2})
+        with self.assertLogs("writertools.mail", "WARNING") as logs:
+            mail.get_connection().send_messages(self.messages)
+            self.assertTrue(mail_queue.flush(5))
+        # Message 1 went on the retry; Message 2 failed that too, and was dropped
+        self.assertEqual(self.subjects(), ["Message 0", "Message 1"])
+        self.assertEqual(FlakyEmailBackend.opened, 2)
+        self.assertIn("Gave up sending 1 email messages", logs.output[-1])
+
+    def test_serialized_for_task_workers(self):
+        message = mail.EmailMessage(
+            "Café", "Hi", "site@example.com", ["w@example.com"], ["b@example.com"]
+        )
+        with mock.patch.object(mail_queue, "send_serialized_task") as task:
+            with override_settings(TASKS_EXECUTOR="celery"):
+                mail.get_connection(timeout=5).send_messages([message])
+        call = task.delay.call_args
+        # As a Celery worker would get them
+        args, kwargs = json.loads(json.dumps([call.args, call.kwargs]))
+        with mock.patch.object(
+            mail_queue, "get_connection", wraps=mail.get_connection
+        ) as get_connection:
+            mail_queue.send_serialized(*args, **kwargs)
+        self.assertEqual(get_connection.call_args.kwargs["timeout"], 5)
+        self.assertEqual(len(mail.outbox), 1)
+        sent = mail.outbox[0]
+        self.assertEqual(sent.subject, "Café")
+        self.assertEqual(sent.recipients(), ["w@example.com", "b@example.com"])
+        self.assertNotIn("Bcc", sent.message())
+        self.assertIn(b"Hi", sent.message().as_bytes())
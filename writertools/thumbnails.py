@@ -0,0 +1,72 @@
+"""
+Generate thumbnail aliases for uploaded images up front, rather than on first render.
+
+easy_thumbnails only sends its `saved_file` signal for its own field types, so the
+pre_save/post_save handlers it provides for plain FileFields are connected here for the
+models in THUMBNAIL_APPS (see WritertoolsConfig.ready()). When a file is saved, a
+background task (see writertools/tasks.py) generates all the aliases that apply to it,
+once the transaction commits. `manage.py generate_thumbnails` does the same for every
+existing file, in parallel.
+"""
+from django.apps import apps
+from django.db import models, transaction
+from easy_thumbnails.alias import aliases
+from easy_thumbnails.files import generate_all_aliases, get_thumbnailer
+from easy_thumbnails.signal_handlers import (
+    find_uncommitted_filefields,
+    signal_committed_filefields,
+)
+
+from .tasks import enqueue, task
+
+THUMBNAIL_APPS = {"genericsite"}
+
+
+def find_uncommitted(sender, instance, **kwargs):
+    """pre_save receiver."""
+    if sender._meta.app_label in THUMBNAIL_APPS:
+        find_uncommitted_filefields(sender, instance, **kwargs)
+
+
+def signal_committed(sender, instance, **kwargs):
+    """post_save receiver."""
+    if sender._meta.app_label in THUMBNAIL_APPS:
+        signal_committed_filefields(sender, instance, **kwargs)
+
+
+def queue_aliases(sender, fieldfile, **kwargs):
+    """saved_file receiver."""
+    instance = fieldfile.instance
+    if aliases.all(fieldfile, include_global=True):
+        args = (instance._meta.label, instance.pk, fieldfile.field.name)
+        transaction.on_commit(lambda: enqueue(generate_aliases, *args))
+
+
+def image_fields():
+    """Yield (model, field name) for each file field in THUMBNAIL_APPS models."""
+    for model in apps.get_models():
+        if model._meta.app_label in THUMBNAIL_APPS:
+            for field in model._meta.fields:
+                if isinstance(field, models.FileField):
+                    yield model, field.name
+
+
+def make_aliases(model_label, pk, field_name, replace=False) -> int:
+    """Generate the aliases for one object's file, returning how many apply. With
+    `replace`, delete its existing thumbnails first."""
+    model = apps.get_model(model_label)
+    instance = model._default_manager.filter(pk=pk).first()
+    fieldfile = getattr(instance, field_name, None)
+    if not fieldfile:
+        return 0
+    options = aliases.all(fieldfile, include_global=True)
+    if options:
+        if replace:
+            get_thumbnailer(fieldfile).delete_thumbnails()
+        generate_all_aliases(fieldfile, include_global=True)
+    return len(options)
+
+
+@task
+def generate_aliases(job, model_label, pk, field_name):
+    return make_aliases(model_label, pk, field_name)
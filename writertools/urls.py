@@ -18,9 +18,14 @@ from django.contrib import admin
 from django.urls import include, path
 
 from genericsite import views as generic
+from writertools import views
+from writertools.pagecache import cache_feed, cache_public_page
 
 urlpatterns = [
     path("wordtracker/", include("wordtracker.urls")),
+    path("plotboard/", include("plotboard.urls")),
+    path("api/", include("api.urls")),
+    path("tasks/<str:job_id>/", views.task_status, name="task_status"),
     # Genericsite accounts/profile
     path("accounts/profile/", generic.ProfileView.as_view(), name="account_profile"),
     # Use allauth views rather than Django defaults
@@ -29,17 +34,23 @@ urlpatterns = [
     path("admin/doc/", include("django.contrib.admindocs.urls")),
     path("admin/", admin.site.urls),
     path("tinymce/", include("tinymce.urls")),
-    path("feed/", generic.SiteFeed(), name="site_feed"),
+    path("feed/", cache_feed(generic.SiteFeed()), name="site_feed"),
     path(
         "<slug:section_slug>/<slug:article_slug>.html",
-        generic.ArticleDetailView.as_view(),
+        cache_public_page(generic.ArticleDetailView.as_view()),
         name="article_page",
     ),
     path(
-        "<slug:page_slug>.html", generic.PageDetailView.as_view(), name="landing_page"
+        "<slug:page_slug>.html",
+        cache_public_page(generic.PageDetailView.as_view()),
+        name="landing_page",
     ),
-    path("<slug:section_slug>/", generic.SectionView.as_view(), name="section_page"),
-    path("", generic.HomePageView.as_view(), name="home_page"),
+    path(
+        "<slug:section_slug>/",
+        cache_public_page(generic.SectionView.as_view()),
+        name="section_page",
+    ),
+    path("", cache_public_page(generic.HomePageView.as_view()), name="home_page"),
 ]
 
 if settings.DEBUG:
@@ -0,0 +1,13 @@
+from django.contrib.auth.decorators import login_required
+from django.http import Http404, JsonResponse
+
+from .tasks import Job
+
+
+@login_required
+def task_status(request, job_id):
+    """Report the state, progress and result of a background task as JSON."""
+    job = Job.get(job_id)
+    if job is None or job.status.get("user") != request.user.pk:
+        raise Http404("No such task")
+    return JsonResponse(job.status)